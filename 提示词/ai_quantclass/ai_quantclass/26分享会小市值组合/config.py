@@ -22,13 +22,18 @@ from core.utils.path_kit import get_folder_path
 start_date = '2014-01-01'
 # 回测数据的结束时间。可以设为 None，表示使用最新数据；也可以指定具体日期，例如 '2024-11-01'。
 end_date = None
-# 性能模式，BAL表示均衡，MAX表示快速，ECO表示节能
+# 性能模式，BAL表示均衡，MAX表示快速，ECO表示节能，AUTO表示按内存自动调整
 performance_mode = "MAX"
 # Performance Mode同时会修改 `n_jobs` 和 `factor_col_limit` 的值，不过需要的话，你依旧可以在下面修改她们。
 # - ECO: ♻️节能模式。n_jobs = CPU_COUNT / 4，factor_col_limit = 6
 # - BAL: ⚖️均衡模式，适合大部分情况。n_jobs = CPU_COUNT / 2，factor_col_limit = 8
 # - MAX: ⚡️性能模式。n_jobs = CPU_COUNT - 1，factor_col_limit = 12
-# 注意，不管你怎么修改，n_jobs 最小是4，并且Windows系统下，最大是61。
+# - AUTO: 🤖自适应模式。启动时按可用内存和 memory_ceiling 确定 n_jobs 与 factor_col_limit (保守估计，之后不再变化)
+#   运行中按实测内存调整需要调用方自己接入 factor_engine.autotune.AutoTuner：目前只有 iter_multi_signal 会读取 tuner，
+#   框架里没有任何地方调用 AutoTuner.calibrate，不接入时 AUTO 只是按内存算出的一组固定值
+# 注意，不管你怎么修改，n_jobs 最小是4 (AUTO 模式除外，内存不够时宁可少开进程)，并且Windows系统下，最大是61。
+# AUTO 模式的内存上限：小于等于 1 表示占物理内存的比例，大于 1 表示字节数
+memory_ceiling = 0.75
 
 # ====================================================================================================
 # 2️⃣ 数据配置
@@ -128,11 +133,25 @@ match performance_mode:
     case "ECO" | "ECONOMY": # 节能
         n_jobs = int(os.cpu_count() / 4)
         factor_col_limit = 6
+    case "AUTO": # 自适应
+        # 与 factor_engine.autotune.initial_plan 相同的估计 (这里不导入 factor_engine，框架内也能直接运行):
+        # 每个进程 1 GiB，每个因子列 256 MiB；每个进程至少放下 4 列，剩余内存平均分给各进程放更多列 (最多 64 列)
+        _gib = 1024 ** 3
+        try:
+            import psutil
+            _total, _available = psutil.virtual_memory().total, psutil.virtual_memory().available
+        except ImportError:  # 没有 psutil 时按物理内存估计，Windows 下没有 sysconf，按 16G 估计
+            _total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') if hasattr(os, 'sysconf') else 16 * _gib
+            _available = _total
+        _budget = min(_total * memory_ceiling if memory_ceiling <= 1 else memory_ceiling, _available)
+        n_jobs = int(min(max(_budget // (2 * _gib), 1), max(os.cpu_count() - 1, 1)))
+        factor_col_limit = int(min(max((_budget / n_jobs - _gib) // (_gib / 4), 1), 64))
     case _:
         raise ValueError(f"不支持的性能模式：{performance_mode}")
 
 # 限制进程数量范围是4->61，限制最少位4，不然要地久天长了
-n_jobs = max(n_jobs, 4)
+if performance_mode != "AUTO":
+    n_jobs = max(n_jobs, 4)
 # windows系统下，最大进程数量是61
 if os.name == "nt":
     n_jobs = min(n_jobs, 61)
@@ -0,0 +1,3 @@
+"""
+因子计算引擎：为 factors/ 与 ref_factors/ 中的因子提供共享的计算基础设施
+"""
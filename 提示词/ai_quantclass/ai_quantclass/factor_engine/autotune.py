@@ -0,0 +1,176 @@
+"""
+performance_mode = "AUTO"：按实测资源自动确定 n_jobs 与 factor_col_limit
+
+ECO/BAL/MAX 按 CPU 核数的固定比例取进程数、因子列数固定为 6/8/12，与机器内存无关：
+大内存机器上内存闲置，宽参数遍历时又可能超出内存被系统杀掉。AUTO 模式:
+
+    1. 配置阶段 initial_plan(memory_ceiling) 按可用内存给出保守的初始值
+    2. 运行开始时 AutoTuner.calibrate 用一小批因子列实测 每列每行字节数 (tracemalloc 峰值) 与 每个进程的基础内存 (RSS)
+    3. 每批计算前 limit_for(rows) 按当前可用内存重新计算列数，内存紧张时自动收缩、释放后再放大
+
+内存上限 memory_ceiling 小于等于 1 时表示占物理内存的比例，否则为字节数。
+第 2、3 步需要调用方自己接入：目前只有 iter_multi_signal 会读取 tuner，框架本身不会调用 calibrate。
+
+    tuner = AutoTuner(memory_ceiling=0.75)
+    tuner.calibrate('Volatility', df, range(5, 25, 5))
+    for block in iter_multi_signal('Volatility', df, n_list, factor_col_limit=tuner):
+        ...
+"""
+import os
+import time
+
+from factor_engine.harness import peak_memory
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，没有时读取 /proc 或 sysconf
+    psutil = None
+
+GiB = 1024 ** 3
+# 校准之前使用的保守估计：每个进程 (行情数据 + 解释器) 1 GiB，每个因子列 (含计算中的临时序列) 256 MiB
+DEFAULT_WORKER_BYTES = 1 * GiB
+DEFAULT_COLUMN_BYTES = 256 * 1024 ** 2
+MAX_COL_LIMIT = 64
+# Windows 下进程池最多 61 个进程
+MAX_JOBS_WINDOWS = 61
+
+
+def _meminfo(key):
+    try:
+        with open('/proc/meminfo', encoding='ascii') as f:
+            for line in f:
+                if line.startswith(key + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def total_memory():
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    value = _meminfo('MemTotal')
+    if value is None and hasattr(os, 'sysconf'):
+        value = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    return value
+
+
+def available_memory():
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    value = _meminfo('MemAvailable')
+    return value if value is not None else total_memory()
+
+
+def process_memory():
+    """
+    当前进程的常驻内存 (RSS)
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return DEFAULT_WORKER_BYTES
+
+
+def memory_budget(memory_ceiling):
+    """
+    内存上限 (字节)：memory_ceiling <= 1 为占物理内存的比例，否则为字节数
+    """
+    if memory_ceiling <= 0:
+        raise ValueError(f"memory_ceiling 必须大于 0：{memory_ceiling}")
+    return int(total_memory() * memory_ceiling) if memory_ceiling <= 1 else int(memory_ceiling)
+
+
+def plan_resources(budget, worker_bytes, column_bytes, cpu_count=None, max_col_limit=MAX_COL_LIMIT, min_col_limit=4):
+    """
+    在内存预算内选择 (n_jobs, factor_col_limit)
+
+    进程数优先 (CPU 核数 - 1 为上限)，但每个进程至少要能放下 min_col_limit 列；剩余内存平均分给各进程放更多列。
+    预算连一个进程都放不下时返回 (1, 1)。
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    max_jobs = max(cpu_count - 1, 1)
+    if os.name == 'nt':
+        max_jobs = min(max_jobs, MAX_JOBS_WINDOWS)
+    per_worker = worker_bytes + min_col_limit * column_bytes
+    n_jobs = int(min(max(budget // per_worker, 1), max_jobs))
+    factor_col_limit = int((budget / n_jobs - worker_bytes) // column_bytes)
+    return n_jobs, min(max(factor_col_limit, 1), max_col_limit)
+
+
+def initial_plan(memory_ceiling=0.75, cpu_count=None):
+    """
+    AUTO 模式的初始值 (未校准，按当前可用内存与保守的默认估计)
+
+    config.py 不导入 factor_engine，其中内联了相同的计算，修改默认估计时两边需要同步
+    """
+    budget = min(memory_budget(memory_ceiling), available_memory())
+    return plan_resources(budget, DEFAULT_WORKER_BYTES, DEFAULT_COLUMN_BYTES, cpu_count)
+
+
+class AutoTuner:
+    """
+    实测资源并在运行中持续调整 factor_col_limit
+
+    参数:
+        memory_ceiling (float): 内存上限 (比例或字节数)
+        n_jobs (int): 进程数，默认由校准结果决定；确定后运行中不再改变 (进程池已经建立)
+        refresh_seconds (float): 可用内存的重新读取间隔
+    """
+
+    def __init__(self, memory_ceiling=0.75, n_jobs=None, cpu_count=None, max_col_limit=MAX_COL_LIMIT,
+                 refresh_seconds=1.0):
+        self.memory_ceiling = memory_ceiling
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.max_col_limit = max_col_limit
+        self.refresh_seconds = refresh_seconds
+        self.worker_bytes = DEFAULT_WORKER_BYTES
+        self.column_row_bytes = None  # 每列每行的峰值字节数，校准前为 None
+        self.n_jobs = n_jobs
+        self.history = []  # (行数, 列数上限, 当时的预算)
+        self._available = (0.0, None)
+
+    def calibrate(self, factor, df, n_list):
+        """
+        用一小批参数实测内存：tracemalloc 峰值 / (行数 × 列数) 得到每列每行字节数，当前 RSS 作为每个进程的基础内存
+        """
+        from factor_engine.multi import multi_signal
+
+        n_list = list(n_list)
+        _, peak = peak_memory(multi_signal, factor, df, n_list)
+        self.column_row_bytes = peak / max(len(df) * len(n_list), 1)
+        self.worker_bytes = max(process_memory(), 1)
+        if self.n_jobs is None:
+            self.n_jobs, _ = plan_resources(self.budget(), self.worker_bytes, self.column_bytes(len(df)),
+                                            self.cpu_count, self.max_col_limit)
+        return self
+
+    def column_bytes(self, rows):
+        if self.column_row_bytes is None:
+            return DEFAULT_COLUMN_BYTES
+        return max(self.column_row_bytes * rows, 1.0)
+
+    def budget(self):
+        """
+        当前的内存预算：配置的上限与 (可用内存 + 本进程已占用) 中的较小者，可用内存按 refresh_seconds 缓存
+        """
+        checked_at, available = self._available
+        if available is None or time.monotonic() - checked_at > self.refresh_seconds:
+            available = available_memory()
+            self._available = (time.monotonic(), available)
+        return min(memory_budget(self.memory_ceiling), available + process_memory())
+
+    def limit_for(self, rows):
+        """
+        当前应使用的 factor_col_limit (每次调用都按最新的可用内存重新计算)
+        """
+        budget = self.budget()
+        n_jobs = self.n_jobs or 1
+        limit = int((budget / n_jobs - self.worker_bytes) // self.column_bytes(rows))
+        limit = min(max(limit, 1), self.max_col_limit)
+        self.history.append((rows, limit, budget))
+        return limit
+
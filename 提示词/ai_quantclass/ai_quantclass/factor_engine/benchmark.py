@@ -0,0 +1,863 @@
+"""
+因子计算引擎的性能基准 (只计时；与原实现的一致性校验在 tests/ 中，用小规模固定数据)
+
+在 ai_quantclass 目录下运行: python -m factor_engine.benchmark [rolling] [panel] [multi] [harness] [cache] [graph] [dsl] [extra] [corr] [listing] [symbols] [selection] [filters] [rebalance] [strategy] [autotune] [metrics]
+一致性测试: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from factor_engine import rolling
+from factor_engine.autotune import AutoTuner, initial_plan
+from factor_engine.cache import FactorCache
+from factor_engine.dsl import FusedKernel
+from factor_engine.extra_data import ExtraData
+from factor_engine.filters import compile_filters
+from factor_engine.graph import FactorGraph, KERNELS, topological_order
+from factor_engine.harness import peak_memory, run_factors
+from factor_engine.listing import ListingIndex, attach_listing_index, hours_since, listing_time, spot_and_swap
+from factor_engine.loader import FACTOR_DIRS, ROOT_DIR
+from factor_engine.multi import iter_multi_signal, multi_signal
+from factor_engine.panel import Panel, evaluate
+from factor_engine.perf_metrics import PERIODS_PER_YEAR, rolling_metrics
+from factor_engine.rebalance import approximate_calendar, calendar_from_positions, combined_weights, offset_holdings
+from factor_engine.selection import selection_frame, select
+from factor_engine.strategy import (StrategyCache, aggregate, data_digest, group_strategies, read_config_literals,
+                                    run_strategies)
+from factor_engine.symbols import load_symbols, symbol_mask
+from factor_engine.loader import load_factor
+from factor_engine import panel as P
+
+
+def make_fake_candles(n_rows=100_000, seed=42, nan_ratio=0.0):
+    """
+    生成模拟的币种K线 (含 quote_volume 与 circulating_supply)
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.005, n_rows)) * close
+    volume = rng.uniform(1, 1000, n_rows)
+    df = pd.DataFrame({
+        'candle_begin_time': pd.date_range('2021-01-01', periods=n_rows, freq='h'),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': volume,
+        'quote_volume': volume * close,
+        'circulating_supply': rng.uniform(1e6, 2e6, n_rows),
+    })
+    if nan_ratio:
+        mask = rng.random(n_rows) < nan_ratio
+        df.loc[mask, 'volume'] = np.nan
+    return df
+
+
+def feed(op, *columns):
+    """
+    把整列数据逐个喂给增量算子，返回每一步的输出
+    """
+    return [op.update(*values) for values in zip(*(np.asarray(c, dtype=np.float64).tolist() for c in columns))]
+
+
+def bench_rolling(n_rows=20_000):
+    """
+    增量滚动算子与由 expr 派生的增量计算：每根K线的耗时 vs 每来一根K线重算整段 signal()
+    """
+    df = make_fake_candles(n_rows, nan_ratio=0.02)
+    x = df['volume']
+
+    print("=" * 60)
+    print(f"增量滚动算子 ({n_rows:,} 行)")
+    print("=" * 60)
+    for name in ['RollingSum', 'RollingMean', 'RollingStd', 'RollingMax', 'RollingMin']:
+        start_time = time.time()
+        feed(getattr(rolling, name)(20), x)
+        print(f"  {name:<16} {(time.time() - start_time) / n_rows * 1e6:6.2f}us/candle")
+
+    print("-" * 60)
+    print("因子 stream(expr) vs 重算 signal()")
+    df = make_fake_candles(n_rows)
+    for name in ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate', 'Amplitude']:
+        mod = load_factor(name)
+        start_time = time.time()
+        mod.signal(df.copy(), 20, 'factor')
+        time_signal = time.time() - start_time
+        update = rolling.stream(mod.expr(20))
+        start_time = time.time()
+        for candle in df.to_dict('records'):
+            update(candle)
+        per_candle = (time.time() - start_time) / n_rows
+        print(f"  {name:<16} stream {per_candle * 1e6:6.1f}us/candle   重算整段 signal() {time_signal * 1e3:7.1f}ms")
+
+
+def make_fake_universe(n_symbols=200, n_rows=3000, seed=7):
+    """
+    生成多币种长表：各币种上市时间不同 (前段无K线)，部分币种提前下架
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(n_symbols):
+        start = int(rng.integers(0, n_rows // 2))
+        end = n_rows if rng.random() < 0.8 else int(rng.integers(start + 1, n_rows))
+        df = make_fake_candles(end - start, seed=seed + i)
+        df['candle_begin_time'] = pd.date_range('2021-01-01', periods=n_rows, freq='h')[start:end]
+        df['symbol'] = f"COIN{i:03d}-USDT"
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def bench_panel(n_symbols=200, n_rows=3000, n=20):
+    """
+    面板计算 (expr / panel_signal 一次算完所有币种) vs 逐币种调用 signal()
+    """
+    long_df = make_fake_universe(n_symbols, n_rows)
+    panel = Panel.from_long(long_df)
+    groups = [(symbol, df.reset_index(drop=True)) for symbol, df in long_df.groupby('symbol', sort=True)]
+
+    print("=" * 60)
+    print(f"面板因子计算 ({n_symbols} 个币种 × {n_rows:,} 根K线)")
+    print("=" * 60)
+    names = ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate', 'Amplitude',
+             'MarketCap', 'Momentum', 'PriceChange', 'VolumeRatio']
+    for name in names:
+        mod = load_factor(name)
+        start_time = time.time()
+        expected = np.full(panel.shape, np.nan)
+        for j, (symbol, df) in enumerate(groups):
+            rows = panel.index.get_indexer(df['candle_begin_time'])
+            expected[rows, j] = mod.signal(df.copy(), n, 'factor')['factor'].to_numpy(dtype=np.float64)
+        time_loop = time.time() - start_time
+
+        start_time = time.time()
+        evaluate(mod, panel, n)
+        time_panel = time.time() - start_time
+
+        path = 'panel' if hasattr(mod, 'panel_signal') else 'expr' if hasattr(mod, 'expr') else 'adapter'
+        print(f"  {name:<16} {path:<7} loop {time_loop:6.3f}s  panel {time_panel:6.3f}s")
+
+
+def bench_multi(n_rows=200_000, n_list=tuple(range(5, 105, 5)), factor_col_limit=8):
+    """
+    多参数因子：n_list 的 expr 放进同一张图一次算完 vs 逐个 n 调用 signal()
+    """
+    df = make_fake_candles(n_rows)
+
+    print("=" * 60)
+    print(f"多参数因子计算 ({n_rows:,} 行 × {len(n_list)} 个参数, factor_col_limit={factor_col_limit})")
+    print("=" * 60)
+    for name in ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate', 'Amplitude',
+                 'VolumeRatio']:
+        mod = load_factor(name)
+        work = df.copy()
+        start_time = time.time()
+        for n in n_list:
+            work = mod.signal(work, n, f"{name}_{n}")
+        time_loop = time.time() - start_time
+        scratch = work.shape[1] - df.shape[1] - len(n_list)
+
+        start_time = time.time()
+        for _ in iter_multi_signal(mod, df, n_list, factor_col_limit):
+            pass
+        time_multi = time.time() - start_time
+
+        path = 'expr' if hasattr(mod, 'expr') else 'fallback'
+        print(f"  {name:<16} {path:<8} loop {time_loop:6.3f}s (+{scratch} scratch)  multi {time_multi:6.3f}s")
+
+    block = multi_signal('Volatility', df, n_list)
+    print(f"  multi_signal 输出为单个内存块: {block._mgr.nblocks == 1}, F-contiguous: "
+          f"{block.to_numpy().flags['F_CONTIGUOUS']}")
+
+
+def _run_in_place(df, factor_list):
+    """
+    原有用法：所有因子依次写入同一个单币种 DataFrame
+    """
+    for name, n in factor_list:
+        df = load_factor(name).signal(df, n, f"{name}_{n}")
+    return df
+
+
+def bench_harness(n_rows=500_000, n=20):
+    """
+    factors/ 中全部因子的峰值内存：在共享 DataFrame 上原地运行 vs 隔离执行 (只保留因子列)
+    """
+    df = make_fake_candles(n_rows)
+    names = sorted(f[:-3] for f in os.listdir(FACTOR_DIRS[0]) if f.endswith('.py'))
+    factor_list = [(name, n) for name in names]
+    for name in names:
+        load_factor(name)
+
+    print("=" * 60)
+    print(f"因子隔离执行 ({n_rows:,} 行, {len(names)} 个因子, 输入 {df.memory_usage(deep=True).sum() / 1024 ** 2:.0f} MB)")
+    print("=" * 60)
+    legacy, legacy_peak = peak_memory(_run_in_place, df.copy(), factor_list)
+    isolated, isolated_peak = peak_memory(run_factors, df, factor_list)
+
+    scratch = legacy.shape[1] - df.shape[1] - len(names)
+    legacy_size = (legacy.memory_usage().sum() - df.memory_usage().sum()) / 1024 ** 2
+    isolated_size = isolated.memory_usage().sum() / 1024 ** 2
+    print(f"  原地运行: 峰值 {legacy_peak / 1024 ** 2:7.1f} MB, 常驻新增 {legacy_size:6.1f} MB, "
+          f"DataFrame 增加 {legacy.shape[1] - df.shape[1]} 列 (其中 {scratch} 列临时列)")
+    print(f"  隔离执行: 峰值 {isolated_peak / 1024 ** 2:7.1f} MB, 常驻新增 {isolated_size:6.1f} MB, "
+          f"输出 {isolated.shape[1]} 列因子, 输入 DataFrame 不变")
+
+
+def bench_cache(n_rows=200_000, n_new=24, n=20):
+    """
+    因子磁盘缓存：整体计算 vs 命中缓存 vs 追加新K线后的尾部增量计算
+    """
+    full = make_fake_candles(n_rows + n_new)
+    old = full.iloc[:n_rows]
+    names = ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate', 'Amplitude',
+             'Momentum', '资金流因子', 'VolumeRatio']
+
+    print("=" * 60)
+    print(f"因子磁盘缓存 ({n_rows:,} 行, 追加 {n_new} 根新K线)")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = FactorCache(tmp)
+        for name in names:
+            start_time = time.time()
+            cache.get(name, old, n, 'BTC-USDT')
+            time_miss = time.time() - start_time
+
+            start_time = time.time()
+            cache.get(name, old, n, 'BTC-USDT')
+            time_hit = time.time() - start_time
+
+            start_time = time.time()
+            cache.get(name, full, n, 'BTC-USDT')
+            time_tail = time.time() - start_time
+
+            print(f"  {name:<16} miss {time_miss:6.3f}s  hit {time_hit:6.4f}s  tail {time_tail:6.4f}s")
+        print(f"  stats: {cache.stats}")
+
+
+def bench_graph(n_rows=200_000, n_list=(10, 20)):
+    """
+    因子依赖图：合并共享中间结果后一次求值 vs 逐个因子运行 signal()
+    """
+    df = make_fake_candles(n_rows)
+    df['btc_close'] = make_fake_candles(n_rows, seed=1)['close']
+    names = sorted(f[:-3] for f in os.listdir(FACTOR_DIRS[0]) if f.endswith('.py')) + ['CorrBTC', 'VolumeRatio']
+    factor_list = [(name, n) for n in n_list for name in names]
+
+    print("=" * 60)
+    print(f"因子依赖图 ({n_rows:,} 行, {len(factor_list)} 个因子列)")
+    print("=" * 60)
+    start_time = time.time()
+    run_factors(df, factor_list)
+    time_signal = time.time() - start_time
+
+    graph = FactorGraph()
+    for name, n in factor_list:
+        graph.add(name, n)
+    start_time = time.time()
+    graph.evaluate(df)
+    time_graph = time.time() - start_time
+
+    print(f"  逐个 signal(): {time_signal:.3f}s   依赖图: {time_graph:.3f}s")
+    print(f"  {graph.report()}")
+
+    # 面板上同样适用
+    panel = Panel.from_long(make_fake_universe(50, 2000))
+    names = ['Volatility', 'VolumePriceCorr', 'PriceChange', '涨跌幅因子', 'Momentum', '动量因子']
+    start_time = time.time()
+    for name in names:
+        evaluate(name, panel, 20)
+    time_each = time.time() - start_time
+    graph = FactorGraph()
+    for name in names:
+        graph.add(name, 20)
+    start_time = time.time()
+    graph.evaluate(panel)
+    time_graph = time.time() - start_time
+    print(f"  面板 ({panel.shape[1]} 个币种): 逐个因子 {time_each:.3f}s   依赖图 {time_graph:.3f}s   {graph.report()}")
+
+
+def pandas_chain(node, df):
+    """
+    不做融合，逐个节点用 pandas/NumPy 求值 (与计算图的单因子求值相同)
+    """
+    values = {}
+    for item in topological_order([node]):
+        if item.op == 'field':
+            values[item.key] = df[item.args[0]].to_numpy(dtype=np.float64)
+        elif item.op == 'const':
+            values[item.key] = item.args[0]
+        else:
+            args = [values[arg.key] if hasattr(arg, 'key') else arg for arg in item.args]
+            values[item.key] = KERNELS[item.op](*args)
+    return values[node.key]
+
+
+def bench_dsl(n_rows=1_000_000, n=20):
+    """
+    因子表达式编译为融合内核 vs 原有 signal() 与逐节点 pandas 计算
+    """
+    df = make_fake_candles(n_rows)
+    df['btc_close'] = make_fake_candles(n_rows, seed=1)['close']
+
+    print("=" * 60)
+    print(f"因子表达式融合内核 ({n_rows:,} 行, n={n})")
+    print("=" * 60)
+    print(f"  {'因子':<16}{'signal()':>10}{'pandas 链':>11}{'融合内核':>10}{'加速':>8}")
+    total_signal = total_chain = total_fused = 0.0
+    graph = FactorGraph()
+    names = sorted(f[:-3] for f in os.listdir(FACTOR_DIRS[0]) if f.endswith('.py')) + ['CorrBTC', 'VolumeRatio']
+    for name in names:
+        node = load_factor(name).expr(n)
+        graph.add_node(f"{name}_{n}", node)
+
+        start_time = time.time()
+        run_factors(df, [(name, n)])
+        time_signal = time.time() - start_time
+        with np.errstate(all='ignore'):
+            start_time = time.time()
+            pandas_chain(node, df)
+            time_chain = time.time() - start_time
+        kernel = FusedKernel({name: node})  # 编译不计入耗时
+        start_time = time.time()
+        kernel(df)
+        time_fused = time.time() - start_time
+        print(f"  {name:<16}{time_signal:>10.3f}{time_chain:>11.3f}{time_fused:>10.3f}{time_signal / time_fused:>7.1f}x")
+        total_signal += time_signal
+        total_chain += time_chain
+        total_fused += time_fused
+    print(f"  {'合计 (逐个)':<16}{total_signal:>10.3f}{total_chain:>11.3f}{total_fused:>10.3f}"
+          f"{total_signal / total_fused:>7.1f}x")
+    print("  (滚动标准差/相关系数在融合内核中仍调用 pandas，含这两个算子的因子与 signal() 基本持平)")
+
+    # 全部因子编译成一个内核：公共子表达式只算一次
+    kernel = graph.compile()
+    start_time = time.time()
+    kernel(df)
+    time_all = time.time() - start_time
+    start_time = time.time()
+    graph.evaluate(df)
+    time_graph = time.time() - start_time
+    print(f"  全部因子: 依赖图 {time_graph:.3f}s   单一融合内核 {time_all:.3f}s "
+          f"({kernel.stats['nodes']} 个节点, {kernel.stats['inplace']} 次原地运算)")
+
+
+def make_fake_extra(n_symbols=200, n_rows=3000, seed=3):
+    """
+    与 make_fake_universe 对应的额外数据 (cap_df, btc_df)：coin-cap 为按天更新、时间不齐的流通量记录，
+    coin-btc 为全市场共用的 BTC 收盘价
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2020-12-25', periods=n_rows // 24 + 10, freq='D')
+    cap_df = pd.DataFrame({
+        'candle_begin_time': np.tile(days, n_symbols) + pd.to_timedelta(rng.integers(0, 3600, len(days) * n_symbols), 's'),
+        'symbol': np.repeat([f"COIN{i:03d}-USDT" for i in range(n_symbols)], len(days)),
+        'circulating_supply': rng.uniform(1e6, 2e6, len(days) * n_symbols),
+    }).sample(frac=0.9, random_state=1)
+    btc_df = pd.DataFrame({'candle_begin_time': pd.date_range('2021-01-01', periods=n_rows, freq='h'),
+                           'btc_close': make_fake_candles(n_rows, seed=1)['close']})
+    return cap_df, btc_df
+
+
+def bench_extra(n_symbols=200, n_rows=3000):
+    """
+    额外数据 as-of 合并：索引后 searchsorted + 合并缓存 vs 每个因子每个币种各自 merge_asof
+    """
+    long_df = make_fake_universe(n_symbols, n_rows).drop(columns='circulating_supply')
+    cap_df, btc_df = make_fake_extra(n_symbols, n_rows)
+    factors = ['MarketCap', 'TurnoverRate', '市值因子', '换手率因子', 'CorrBTC']
+    frames = {symbol: df.reset_index(drop=True) for symbol, df in long_df.groupby('symbol')}
+
+    print("=" * 60)
+    print(f"额外数据 as-of 合并 ({n_symbols} 个币种, {len(factors)} 个因子)")
+    print("=" * 60)
+    def merge_asof(df, symbol, source):
+        right = btc_df if source == 'coin-btc' else cap_df[cap_df['symbol'] == symbol].drop(columns='symbol')
+        return pd.merge_asof(df, right.sort_values('candle_begin_time'), on='candle_begin_time')
+
+    # 原有方式：每个因子都把所需数据合并进每个币种的K线
+    start_time = time.time()
+    for symbol, df in frames.items():
+        for factor in factors:
+            for source in load_factor(factor).extra_data_dict:
+                merge_asof(df, symbol, source)
+    time_naive = time.time() - start_time
+
+    start_time = time.time()
+    extra = ExtraData({'coin-cap': cap_df, 'coin-btc': btc_df})
+    for symbol, df in frames.items():
+        extra.attach(df, symbol, factors)
+    time_indexed = time.time() - start_time
+
+    # 面板：额外字段直接以 (T, S) 矩阵加入
+    panel = Panel.from_long(long_df)
+    start_time = time.time()
+    extra.attach_panel(panel, factors)
+    time_panel = time.time() - start_time
+    print(f"  逐因子 merge_asof: {time_naive:.3f}s   索引 + 缓存: {time_indexed:.3f}s   面板: {time_panel:.3f}s   "
+          f"合并 {extra.stats['join']} 次 (命中缓存 {extra.stats['hit']} 次)")
+
+
+def bench_market_corr(n_symbols=300, n_rows=3000, n=20):
+    """
+    CorrBTC：BTC 收益率与滚动矩只算一次的截面相关 vs 逐币种 signal() 与 pandas 面板 rolling corr
+    """
+    long_df = make_fake_universe(n_symbols, n_rows)
+    _, btc_df = make_fake_extra(0, n_rows)
+    extra = ExtraData({'coin-btc': btc_df})
+    panel = extra.attach_panel(Panel.from_long(long_df), ['CorrBTC'])
+    mod = load_factor('CorrBTC')
+
+    print("=" * 60)
+    print(f"CorrBTC 截面相关 ({n_symbols} 个币种 × {n_rows:,} 根K线, n={n})")
+    print("=" * 60)
+    start_time = time.time()
+    for symbol, df in long_df.groupby('symbol', sort=True):
+        mod.signal(extra.attach(df.reset_index(drop=True), symbol, ['CorrBTC']), n, 'factor')
+    time_loop = time.time() - start_time
+
+    start_time = time.time()
+    with np.errstate(all='ignore'):
+        btc_ret = P.fill_finite(P.pct_change(panel['btc_close']))
+        np.where(panel.listed(), P.rolling_corr(P.pct_change(panel['close']), btc_ret, n), np.nan)
+    time_pandas = time.time() - start_time
+
+    start_time = time.time()
+    evaluate(mod, panel, n)
+    time_moments = time.time() - start_time
+
+    print(f"  逐币种 signal(): {time_loop:.3f}s   pandas 面板: {time_pandas:.3f}s   共享滚动矩: {time_moments:.3f}s")
+
+
+def hours_since_reference(df, factor_name):
+    """
+    HoursSinceSpotAndSwap 原来的实现 (pd.to_datetime + Timedelta.dt.total_seconds)，作为一致性基准
+    """
+    candle_series = pd.to_datetime(pd.Series(df['candle_begin_time']))
+    cond = (df['symbol_swap'] != '') & (df['symbol_spot'] != '')
+    if cond.any():
+        first_time = candle_series.iloc[cond[cond].index[0]]
+        hours_since_first = (candle_series - first_time).dt.total_seconds() / 3600
+        df[factor_name] = np.where(cond, hours_since_first, np.nan)
+    else:
+        df[factor_name] = np.nan
+    return df
+
+
+def make_fake_listings(long_df, seed=5):
+    """
+    给多币种长表加上 symbol_spot / symbol_swap：每个币种先有合约，随机一段时间后上现货 (部分币种始终没有现货)
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = long_df.groupby('symbol').size().max()
+    spot_start = {s: rng.integers(0, n_rows) if rng.random() < 0.9 else n_rows * 2 for s in long_df['symbol'].unique()}
+    pos = long_df.groupby('symbol').cumcount().to_numpy()
+    long_df['symbol_swap'] = long_df['symbol']
+    long_df['symbol_spot'] = np.where(pos >= long_df['symbol'].map(spot_start).to_numpy(), long_df['symbol'], '')
+    return long_df
+
+
+def bench_listing(n_symbols=300, n_rows=3000):
+    """
+    上市时长因子：int64 纳秒运算 + 上市时间索引 vs 原有的 to_datetime / total_seconds
+    """
+    long_df = make_fake_listings(make_fake_universe(n_symbols, n_rows))
+    frames = {symbol: df.reset_index(drop=True) for symbol, df in long_df.groupby('symbol')}
+    mod = load_factor('HoursSinceSpotAndSwap')
+
+    print("=" * 60)
+    print(f"上市时长因子 ({n_symbols} 个币种 × {n_rows:,} 根K线)")
+    print("=" * 60)
+    start_time = time.time()
+    for df in frames.values():
+        hours_since_reference(df.copy(), 'f')
+    time_reference = time.time() - start_time
+
+    start_time = time.time()
+    for df in frames.values():
+        mod.signal(df.copy(), 0, 'f')
+    time_int64 = time.time() - start_time
+
+    start_time = time.time()
+    index = ListingIndex.from_long(long_df)
+    time_build = time.time() - start_time
+    start_time = time.time()
+    for df in frames.values():
+        hours_since(df['candle_begin_time'], listing_time(df, index), spot_and_swap(df['symbol_spot'], df['symbol_swap']))
+    time_indexed = time.time() - start_time
+    panel = attach_listing_index(Panel.from_long(long_df), index)
+    start_time = time.time()
+    evaluate(mod, panel, 0)
+    time_panel = time.time() - start_time
+
+    print(f"  原实现: {time_reference:.3f}s   int64: {time_int64:.3f}s   索引 (建立 {time_build:.3f}s): "
+          f"{time_indexed:.3f}s   面板: {time_panel:.3f}s   ({len(index)} 个币种已上市)")
+
+
+def select_coin_reference(df, target):
+    """
+    SelectCoin 原来的实现 (每行 str.replace)，作为一致性基准
+    """
+    symbol_normalized = df['symbol'].str.replace('-', '', regex=False)
+    return np.where(symbol_normalized == target.replace('-', ''), 1, np.nan)
+
+
+def bench_symbols(n_symbols=300, n_rows=3000, target='COIN042USDT'):
+    """
+    SelectCoin：币种整数代码 + 归一化查找表 vs 每行 str.replace
+    """
+    long_df = make_fake_universe(n_symbols, n_rows)[['candle_begin_time', 'symbol', 'close']]
+    mod = load_factor('SelectCoin')
+
+    print("=" * 60)
+    print(f"币种筛选 ({n_symbols} 个币种, {len(long_df):,} 行)")
+    print("=" * 60)
+
+    start_time = time.time()
+    select_coin_reference(long_df, target)
+    time_reference = time.time() - start_time
+
+    start_time = time.time()
+    mod.signal(long_df.copy(), target, 'f')
+    time_object = time.time() - start_time
+
+    start_time = time.time()
+    loaded = load_symbols(long_df)
+    time_load = time.time() - start_time
+    start_time = time.time()
+    mod.signal(loaded.copy(), target, 'f')
+    time_loaded = time.time() - start_time
+    start_time = time.time()
+    symbol_mask(loaded['symbol'], target, loaded.attrs['symbol_table'])
+    time_mask = time.time() - start_time
+    print(f"  str.replace: {time_reference:.3f}s   object 列: {time_object:.3f}s   "
+          f"查找表 (因子): {time_loaded:.4f}s   symbol_mask: {time_mask:.4f}s (加载时建表与转换 {time_load:.3f}s)")
+
+
+def make_fake_stock_factors(n_stocks=5000, n_dates=3000, seed=11, dates=None):
+    """
+    生成 (日期 × 股票) 的模拟因子矩阵：选股因子与过滤因子 (含停牌/未上市的 NaN 与大量同分)
+
+    dates 给出时 (如 load_positions 中的真实交易日) 以其为交易日，n_dates 取其长度
+    """
+    n_dates = n_dates if dates is None else len(dates)
+    rng = np.random.default_rng(seed)
+    listed = np.arange(n_dates)[:, None] >= rng.integers(0, n_dates // 2, n_stocks)[None, :]
+    tradable = listed & (rng.random((n_dates, n_stocks)) > 0.03)
+    factors = {
+        '市值_': np.where(listed, np.exp(rng.normal(22, 1, (n_dates, n_stocks))), np.nan),
+        'Ret_20': np.where(listed, np.round(rng.normal(0, 0.1, (n_dates, n_stocks)), 3), np.nan),
+        '成交额Std_5': np.where(listed, rng.lognormal(16, 1, (n_dates, n_stocks)), np.nan),
+        'ROE_单季': np.where(listed, np.round(rng.normal(0.02, 0.05, (n_dates, n_stocks)), 3), np.nan),
+        '成交额Mean_5': np.where(listed, rng.lognormal(17, 1.5, (n_dates, n_stocks)), np.nan),
+        '一级风险标签_250': np.where(listed, (rng.random((n_dates, n_stocks)) < 0.05).astype(np.float64), np.nan),
+        '归母净利润同比增速_60': np.where(listed, np.round(rng.normal(0.1, 0.5, (n_dates, n_stocks)), 2), np.nan),
+        '当前回撤_20': np.where(listed, -np.abs(rng.normal(0, 0.1, (n_dates, n_stocks))), np.nan),
+    }
+    dates = pd.bdate_range('2014-01-01', periods=n_dates) if dates is None else pd.DatetimeIndex(dates)
+    codes = np.array([f"sz{300000 + i:06d}" for i in range(n_stocks)], dtype=object)
+    return dates, codes, factors, tradable
+
+
+def stock_long_frame(dates, codes, factors, tradable, columns):
+    """
+    (日期 × 股票) 因子矩阵转为原流程使用的长表 (只保留可交易的行)
+    """
+    long_df = pd.DataFrame({'交易日期': np.repeat(dates, len(codes)), '股票代码': np.tile(codes, len(dates))})
+    for col in columns:
+        long_df[col] = factors[col].ravel()
+    return long_df[tradable.ravel()].reset_index(drop=True)
+
+
+def select_reference(long_df, factor_list, select_num):
+    """
+    原流程的选股：长表上逐个因子 groupby 排名，复合因子再整体排名后取前 select_num
+    """
+    long_df['复合因子'] = 0.0
+    for name, ascending, param, weight in factor_list:
+        col = f"{name}_{param}"
+        long_df['复合因子'] += long_df.groupby('交易日期')[col].rank(ascending=ascending, method='min') * weight
+    long_df['选股因子排名'] = long_df.groupby('交易日期')['复合因子'].rank(method='first')
+    return long_df[long_df['选股因子排名'] <= select_num].sort_values(['交易日期', '选股因子排名'])
+
+
+def filter_reference(factors, tradable, filter_list):
+    """
+    原流程的过滤：长表上逐条规则 groupby rank，结果取交集 (返回 (T, N) 布尔矩阵)
+    """
+    n_dates, n_stocks = tradable.shape
+    long_df = pd.DataFrame({'交易日期': np.repeat(np.arange(n_dates), n_stocks)})
+    keep = np.ones(len(long_df), dtype=bool)
+    for name, param, how, ascending in filter_list:
+        col = f"{name}_{param}"
+        long_df[col] = np.where(tradable, factors[col], np.nan).ravel()
+        kind, condition = how.split(':')
+        if kind in ('pct', 'rank'):
+            values = long_df.groupby('交易日期')[col].rank(ascending=ascending, method='min', pct=kind == 'pct')
+        else:
+            values = long_df[col]
+        keep &= values.to_frame('v').eval(f"v {condition}").to_numpy()
+    return keep.reshape(n_dates, n_stocks)
+
+
+def bench_selection(n_stocks=5000, n_dates=3000, select_num=5):
+    """
+    复合因子选股：(日期 × 股票) 矩阵 + argpartition 取前 k vs 长表 groupby rank
+    """
+    factor_list = [['Ret', True, 20, 1], ['市值', True, '', 1], ['成交额Std', True, 5, 1]]
+    dates, codes, factors, tradable = make_fake_stock_factors(n_stocks, n_dates)
+
+    print("=" * 60)
+    print(f"复合因子选股 ({n_stocks:,} 只股票 × {n_dates:,} 个交易日, 每日选 {select_num} 只)")
+    print("=" * 60)
+    # 原流程：长表上逐个因子 groupby 排名，复合因子再整体排名后取前 select_num
+    long_df = stock_long_frame(dates, codes, factors, tradable, ['市值_', 'Ret_20', '成交额Std_5'])
+    start_time = time.time()
+    select_reference(long_df, factor_list, select_num)
+    time_groupby = time.time() - start_time
+    del long_df
+
+    start_time = time.time()
+    cols, score = select(factors, factor_list, select_num, mask=tradable)
+    time_matrix = time.time() - start_time
+    actual = selection_frame(dates, codes, cols, score)
+    print(f"  groupby rank: {time_groupby:.3f}s   矩阵 + argpartition: {time_matrix:.3f}s   "
+          f"({len(actual):,} 条选股结果)")
+
+
+def bench_filters(n_stocks=5000, n_dates=3000):
+    """
+    filter_list 编译为布尔矩阵运算 vs 长表上逐条规则 groupby rank
+    """
+    filter_list = [['ROE', '单季', 'pct:<=0.8', False], ['成交额Mean', 5, 'pct:>=0.05', True],
+                   ['一级风险标签', 250, 'val:==0', True]]
+    dates, codes, factors, tradable = make_fake_stock_factors(n_stocks, n_dates)
+
+    print("=" * 60)
+    print(f"过滤条件编译 ({n_stocks:,} 只股票 × {n_dates:,} 个交易日, {len(filter_list)} 条规则)")
+    print("=" * 60)
+    start_time = time.time()
+    filter_reference(factors, tradable, filter_list)
+    time_groupby = time.time() - start_time
+
+    plan = compile_filters(filter_list)
+    start_time = time.time()
+    mask = plan.apply(factors, universe=tradable)
+    time_plan = time.time() - start_time
+    print(f"  groupby rank: {time_groupby:.3f}s   编译后的布尔矩阵: {time_plan:.3f}s   "
+          f"(保留 {mask.sum() / tradable.sum():.1%}，各规则参与计算的日期数 {plan.stats['evaluated_rows']})")
+    print("  执行顺序:\n    " + plan.describe().replace('\n', '\n    '))
+
+    start_time = time.time()
+    cols, _ = select(factors, [['Ret', True, 20, 1], ['市值', True, '', 1], ['成交额Std', True, 5, 1]], 5, mask=mask)
+    print(f"  过滤后选股: {time.time() - start_time:.3f}s")
+
+
+def load_positions():
+    """
+    26分享会小市值组合 中框架输出的 分批进场仓位 表：策略名 -> DataFrame (含各 offset 的调仓点)
+    """
+    folder = os.path.join(ROOT_DIR, '26分享会小市值组合')
+    positions = {}
+    for file in sorted(os.listdir(folder)):
+        if file.startswith('分批进场仓位#') and file.endswith('.csv'):
+            name = file[:-len('.csv')].split('.', 1)[1]
+            positions.setdefault(name, pd.read_csv(os.path.join(folder, file), encoding='utf-8-sig'))
+    return positions
+
+
+def bench_rebalance(n_stocks=2000, select_num=5):
+    """
+    多 offset 调仓 (框架输出的调仓日历)：每个交易日选股一次再按 offset 索引 vs 每个 offset 各自重新选股
+    """
+    factor_list = [['Ret', True, 20, 1], ['市值', True, '', 1], ['成交额Std', True, 5, 1]]
+    position_df = next(iter(load_positions().values()))
+    dates, codes, factors, tradable = make_fake_stock_factors(n_stocks, dates=pd.to_datetime(position_df['选股日期']))
+    calendar = calendar_from_positions(position_df, dates=dates)
+    n_offsets = calendar.shape[1]
+    mismatch = (approximate_calendar(dates, 'W', range(n_offsets)) != calendar).any(axis=1).mean()
+
+    print("=" * 60)
+    print(f"多 offset 调仓 ({n_stocks:,} 只股票 × {len(dates):,} 个交易日, {n_offsets} 个 offset)")
+    print("=" * 60)
+    # 原流程：每个 offset 作为独立子组合完整跑一遍选股，再取自己的调仓日
+    start_time = time.time()
+    for j in range(n_offsets):
+        cols, _ = select(factors, factor_list, select_num, mask=tradable)
+        offset_holdings(cols, calendar[:, [j]])
+    time_per_offset = time.time() - start_time
+
+    start_time = time.time()
+    cols, _ = select(factors, factor_list, select_num, mask=tradable)
+    offset_holdings(cols, calendar)
+    time_shared = time.time() - start_time
+    print(f"  每个 offset 重新选股: {time_per_offset:.3f}s   每日选股一次 + 索引: {time_shared:.3f}s")
+    print(f"  (approximate_calendar 与框架调仓点不同的交易日: {mismatch:.1%})")
+
+
+def bench_strategy(n_stocks=1000):
+    """
+    回测组去重：26分享会小市值组合 的 strategy_list 按指纹只计算不同的子策略，并跨回测复用
+    """
+    config = read_config_literals(os.path.join(ROOT_DIR, '26分享会小市值组合', 'config.py'),
+                                  ('strategy_list', 'start_date', 'end_date', 'excluded_boards', 'days_listed'))
+    strategy_list = config.pop('strategy_list')
+    positions = load_positions()
+    dates = pd.to_datetime(next(iter(positions.values()))['选股日期'])
+    dates, codes, factors, tradable = make_fake_stock_factors(n_stocks, dates=dates)
+    n_dates = len(dates)
+    start_time = time.time()
+    context = dict(config, data_version=data_digest(dates, codes, factors, tradable, positions))
+    time_digest = time.time() - start_time
+
+    def compute(strategy):
+        mask = compile_filters(strategy['filter_list']).apply(factors, universe=tradable)
+        cols, score = select(factors, strategy['factor_list'], strategy['select_num'], mask=mask)
+        offset_names = [f"{strategy['hold_period']}_{offset}" for offset in strategy['offset_list']]
+        holdings = offset_holdings(cols, calendar_from_positions(positions[strategy['name']], offset_names, dates))
+        return {'selection': selection_frame(dates, codes, cols, score), 'weights': combined_weights(holdings, dates, codes)}
+
+    print("=" * 60)
+    print(f"回测组去重 ({len(strategy_list)} 个子策略, {n_stocks:,} 只股票 × {n_dates:,} 个交易日)")
+    print("=" * 60)
+    cap_weights = [strategy['cap_weight'] for strategy in strategy_list]
+    start_time = time.time()
+    aggregate([compute(strategy) for strategy in strategy_list], cap_weights)
+    time_each = time.time() - start_time
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = StrategyCache(os.path.join(tmp_dir, 'strategy_cache'))
+        start_time = time.time()
+        aggregate(run_strategies(strategy_list, compute, context, cache), cap_weights)
+        time_dedup = time.time() - start_time
+        first_stats = dict(cache.stats)
+
+        # 另一次回测：换一个策略名、调整 cap_weight，指纹不变，直接读取磁盘缓存
+        renamed = [dict(strategy, name=f"{strategy['name']}_复用", cap_weight=0.5) for strategy in strategy_list]
+        cache = StrategyCache(os.path.join(tmp_dir, 'strategy_cache'))
+        start_time = time.time()
+        aggregate(run_strategies(renamed, compute, context, cache), [0.5] * len(renamed))
+        time_reuse = time.time() - start_time
+        reuse_stats = dict(cache.stats)
+
+    print(f"  指纹分组: {list(group_strategies(strategy_list, context).values())}   数据哈希 {time_digest:.3f}s")
+    print(f"  逐个计算: {time_each:.3f}s   指纹去重: {time_dedup:.3f}s ({first_stats['computed']} 次计算)   "
+          f"下次回测复用: {time_reuse:.3f}s (磁盘命中 {reuse_stats['disk']} 次)")
+
+
+def bench_autotune(n_rows=200_000, n_list=tuple(range(5, 105, 5))):
+    """
+    AUTO 性能模式：校准后的 n_jobs / factor_col_limit，以及内存上限变小时 factor_col_limit 随之收缩
+    """
+    df = make_fake_candles(n_rows)
+    cpu_count = os.cpu_count() or 1
+
+    print("=" * 60)
+    print(f"AUTO 性能模式 ({n_rows:,} 行 × {len(n_list)} 个参数, {cpu_count} 核)")
+    print("=" * 60)
+    print(f"  固定模式 BAL: n_jobs={max(int(cpu_count / 2), 4)}, factor_col_limit=8   "
+          f"MAX: n_jobs={max(cpu_count - 1, 4)}, factor_col_limit=12")
+    print(f"  AUTO 初始值 (未校准): n_jobs, factor_col_limit = {initial_plan(0.75)}")
+
+    start_time = time.time()
+    tuner = AutoTuner(memory_ceiling=0.75).calibrate('Volatility', df, n_list[:4])
+    time_calibrate = time.time() - start_time
+    print(f"  校准 {time_calibrate:.3f}s: 每列每行 {tuner.column_row_bytes:.1f} 字节, "
+          f"进程基础内存 {tuner.worker_bytes / 1024 ** 2:.0f} MiB, n_jobs={tuner.n_jobs}, "
+          f"factor_col_limit={tuner.limit_for(n_rows)}")
+
+    # 内存上限只比进程基础内存多出几列的空间：factor_col_limit 自动收缩
+    for extra_cols in (64, 12, 3):
+        tuner.memory_ceiling = tuner.worker_bytes * tuner.n_jobs + extra_cols * tuner.column_bytes(n_rows) * tuner.n_jobs
+        print(f"  memory_ceiling={tuner.memory_ceiling / 1024 ** 2:,.0f} MiB -> factor_col_limit={tuner.limit_for(n_rows)}")
+
+    tuner.memory_ceiling = tuner.worker_bytes * tuner.n_jobs + 3 * tuner.column_bytes(n_rows) * tuner.n_jobs
+    start_time = time.time()
+    blocks = list(iter_multi_signal('Volatility', df, n_list, factor_col_limit=tuner))
+    time_auto = time.time() - start_time
+    start_time = time.time()
+    multi_signal('Volatility', df, n_list)
+    time_once = time.time() - start_time
+    print(f"  AUTO 分批: {len(blocks)} 批 {time_auto:.3f}s   一次计算: {time_once:.3f}s")
+
+
+def rolling_metrics_loop(returns, window, periods_per_year, stop=None):
+    """
+    策略分析脚本原来的逐窗口循环 (iloc 切片 + prod/std/cumprod/cummax)，加上同样写法的波动率与索提诺
+    """
+    rows = []
+    for i in range(window, (stop or len(returns)) + 1):
+        window_data = returns.iloc[i - window:i]
+        cum_ret = (1 + window_data).prod() - 1
+        mean_ret = window_data.mean()
+        std_ret = window_data.std()
+        sharpe = (mean_ret * periods_per_year) / (std_ret * np.sqrt(periods_per_year)) if std_ret > 0 else 0
+        downside = np.sqrt((window_data.clip(upper=0) ** 2).mean())
+        sortino = (mean_ret * periods_per_year) / (downside * np.sqrt(periods_per_year)) if downside > 0 else np.nan
+        cum_nav = (1 + window_data).cumprod()
+        max_dd = (cum_nav / cum_nav.cummax() - 1).min()
+        rows.append([cum_ret, std_ret * np.sqrt(periods_per_year), sharpe, sortino, max_dd])
+    return np.array(rows)
+
+
+def bench_perf_metrics(n_hours=50_000, hour_window=24 * 30, loop_windows=2_000):
+    """
+    滚动绩效指标：策略分析脚本的逐窗口循环 vs perf_metrics.rolling_metrics (月度真实数据 + 小时级模拟曲线)
+    """
+    monthly = pd.read_csv(os.path.join(ROOT_DIR, '策略_coin', '月度账户收益.csv'), encoding='utf-8-sig')
+    monthly = monthly['涨跌幅'].str.rstrip('%').astype(float) / 100
+
+    print("=" * 60)
+    print(f"滚动绩效指标 (月度 {len(monthly)} 期 × 12 个月窗口, 小时级 {n_hours:,} 期 × {hour_window} 小时窗口)")
+    print("=" * 60)
+    start_time = time.time()
+    rolling_metrics_loop(monthly, 12, 12)
+    time_loop = time.time() - start_time
+    start_time = time.time()
+    rolling_metrics(monthly, 12, periods_per_year='M')
+    time_vec = time.time() - start_time
+    print(f"  月度: 循环 {time_loop:.3f}s   rolling_metrics {time_vec:.4f}s")
+
+    rng = np.random.default_rng(7)
+    hourly = pd.Series(rng.normal(1e-4, 5e-3, n_hours))
+    stop = hour_window - 1 + loop_windows
+    start_time = time.time()
+    rolling_metrics_loop(hourly, hour_window, PERIODS_PER_YEAR['H'], stop=stop)
+    time_loop = time.time() - start_time
+    start_time = time.time()
+    rolling_metrics(hourly, hour_window, periods_per_year='H')
+    time_vec = time.time() - start_time
+    n_windows = n_hours - hour_window + 1
+    print(f"  小时级 {n_windows:,} 个窗口: 循环 {time_loop:.3f}s / {loop_windows:,} 个窗口 "
+          f"(全部约 {time_loop * n_windows / loop_windows:.1f}s)   rolling_metrics {time_vec:.3f}s")
+
+
+BENCHMARKS = {
+    'rolling': bench_rolling,
+    'panel': bench_panel,
+    'multi': bench_multi,
+    'harness': bench_harness,
+    'cache': bench_cache,
+    'graph': bench_graph,
+    'dsl': bench_dsl,
+    'extra': bench_extra,
+    'corr': bench_market_corr,
+    'listing': bench_listing,
+    'symbols': bench_symbols,
+    'selection': bench_selection,
+    'filters': bench_filters,
+    'rebalance': bench_rebalance,
+    'strategy': bench_strategy,
+    'autotune': bench_autotune,
+    'metrics': bench_perf_metrics,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,160 @@
+"""
+因子值磁盘缓存
+
+每个 (因子源码, n, 币种) 对应一个缓存目录，因子列以 .npy 列式存储:
+
+    <cache_root>/<因子名>/<源码哈希>/<币种>/n=<n>/
+        meta.json      源码哈希、参数、行数、首/末根K线时间
+        times.npy      K线时间 (int64 纳秒)
+        values.npy     因子值 (float64)
+
+因子源码变化时哈希随之变化，旧缓存自然失效。K线数据只在末尾追加新K线时，
+只对新增部分 (加上足够的预热K线) 重新计算并追加到缓存中，不必重算整段历史。
+
+预热行数由因子模块的 warmup(n) 决定，未提供时对数值参数按 rolling(n) / shift(n) / pct_change
+的依赖范围取 n + 1 行；warmup(n) 返回 None 或参数非数值时，因子值依赖整段历史，只能整体重算。
+
+    cache = FactorCache()
+    values = cache.get('Volatility', df, 20, 'BTC-USDT')    # 与 df 逐行对齐的 np.ndarray
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from factor_engine.harness import factor_column
+from factor_engine.loader import factor_label, load_factor
+
+DEFAULT_CACHE_ROOT = '.factor_cache'
+
+_source_hashes = {}
+
+
+def source_hash(mod):
+    """
+    因子模块源码的 sha256 (同一进程内按文件缓存)
+    """
+    path = os.path.abspath(mod.__file__)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _source_hashes:
+        with open(path, 'rb') as f:
+            _source_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return _source_hashes[key]
+
+
+def warmup_rows(mod, n):
+    """
+    增量计算需要的预热行数，None 表示必须整体重算
+    """
+    if hasattr(mod, 'warmup'):
+        return mod.warmup(n)
+    if isinstance(n, (int, float, np.integer, np.floating)) and not isinstance(n, bool):
+        return int(n) + 1
+    return None
+
+
+def _safe_name(value):
+    return re.sub(r'[^\w.=\-]', '_', str(value))
+
+
+def _time_values(df, time_col):
+    times = df[time_col] if time_col in df.columns else df.index
+    return np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+
+
+class FactorCache:
+    """
+    因子值磁盘缓存，stats 记录命中 (hit)、尾部增量计算 (tail) 与整体计算 (miss) 的次数
+    """
+
+    def __init__(self, cache_root=DEFAULT_CACHE_ROOT, time_col='candle_begin_time'):
+        self.cache_root = cache_root
+        self.time_col = time_col
+        self.stats = {'hit': 0, 'tail': 0, 'miss': 0}
+
+    def entry_dir(self, mod, n, symbol):
+        return os.path.join(self.cache_root, _safe_name(factor_label(mod)), source_hash(mod)[:16],
+                            _safe_name(symbol), _safe_name(f"n={n}"))
+
+    def _load(self, entry, mod, n, symbol, times):
+        """
+        读取与当前数据前缀一致的缓存，返回缓存的因子值 (不可用时返回 None)
+        """
+        try:
+            with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        rows = meta.get('rows', 0)
+        if (meta.get('source_hash') != source_hash(mod) or meta.get('n') != repr(n) or meta.get('symbol') != str(symbol)
+                or rows == 0 or rows > len(times) or meta.get('last_time') != int(times[rows - 1])):
+            return None
+        # 数据被改写 (而不只是追加) 时整体失效
+        if not np.array_equal(np.load(os.path.join(entry, 'times.npy'), mmap_mode='r'), times[:rows]):
+            return None
+        return np.load(os.path.join(entry, 'values.npy'))
+
+    def _save(self, entry, mod, n, symbol, times, values):
+        tmp_dir = f"{entry}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, 'times.npy'), times)
+        np.save(os.path.join(tmp_dir, 'values.npy'), values)
+        meta = {
+            'factor': factor_label(mod),
+            'source_hash': source_hash(mod),
+            'n': repr(n),
+            'symbol': str(symbol),
+            'rows': len(values),
+            'first_time': int(times[0]),
+            'last_time': int(times[-1]),
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_dir, entry)
+
+    def get(self, factor, df, n, symbol, factor_name=None):
+        """
+        返回因子值 (与 df 逐行对齐的 float64 数组)，优先使用缓存
+
+        参数:
+            factor (str | module): 因子名或已加载的因子模块
+            df (pd.DataFrame): 单币种K线数据，按时间升序，包含 time_col 列 (或以时间为索引)
+            n: 因子参数
+            symbol (str): 币种
+            factor_name (str): 计算时使用的因子列名
+        """
+        mod = load_factor(factor) if isinstance(factor, str) else factor
+        times = _time_values(df, self.time_col)
+        if len(times) == 0:
+            return np.empty(0)
+        entry = self.entry_dir(mod, n, symbol)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        cached = self._load(entry, mod, n, symbol, times)
+        if cached is not None and len(cached) == len(times):
+            self.stats['hit'] += 1
+            return cached
+
+        warmup = warmup_rows(mod, n) if cached is not None else None
+        if warmup is not None:
+            # 只计算新增K线，从缓存末尾往前预留 warmup 行作为滚动窗口的预热
+            rows = len(cached)
+            start = max(rows - warmup, 0)
+            tail_df = df.iloc[start:]
+            if self.time_col in df.columns:
+                tail_df = tail_df.reset_index(drop=True)
+            tail = factor_column(mod, tail_df, n, factor_name).to_numpy(dtype=np.float64)[rows - start:]
+            values = np.concatenate([cached, tail])
+            self.stats['tail'] += 1
+        else:
+            values = factor_column(mod, df, n, factor_name).to_numpy(dtype=np.float64)
+            self.stats['miss'] += 1
+
+        self._save(entry, mod, n, symbol, times, values)
+        return values
@@ -0,0 +1,255 @@
+"""
+因子表达式语言与融合编译器
+
+factors/ 中的大多数因子都是"一行滚动表达式 + 相同的样板代码"，可以直接写成表达式：
+
+    volatility = compile_expression("fill_finite(rolling_std(pct_change(close, 1), n))")
+    values = volatility(df, n=20)
+
+语法是 Python 表达式的一个子集：
+    - 标识符：表达式参数 (如 n) 或行情字段 (close、volume、quote_volume ...)
+    - 数字常量，+ - * / 与一元负号，单个比较 > < >= <= (结果为 1.0 / 0.0)
+    - 函数：shift、pct_change、rolling_sum、rolling_mean、rolling_std、rolling_corr、where、fillna、fill_finite
+参数之间的运算 (如 2 * n) 在解析时直接求值。
+
+表达式解析为 factor_engine.graph 的节点 (与因子文件中的 expr(n) 完全相同)，
+FusedKernel 再把一个或多个表达式编译成一个 Python 函数：
+    - 共享的中间结果只计算一次 (公共子表达式消除)
+    - 逐元素运算链在最后一次使用的临时数组上原地计算 (out=)，不产生新的临时数组
+    - fill_finite 等收尾操作原地完成，不再经过 replace / fillna 的 pandas 链
+    - 滚动求和/均值使用 kernels 中的 NumPy 分块前缀和内核，标准差/相关系数使用 pandas 的 Cython 实现
+生成的源码可以通过 FusedKernel.source 查看。
+
+收益集中在逐元素运算链与滚动求和/均值上 (100 万行约 2~3 倍)；耗时以滚动标准差/相关系数为主的因子
+(Volatility、VolumePriceCorr、CorrBTC 等) 融合后与 signal() 基本持平。用前缀和计算标准差/相关系数试过：
+标准差比 pandas 慢；直接对原始序列做前缀和的相关系数与 pandas 的差异超出一致性校验的容差 (rtol 1e-7、atol 1e-9)。
+按块中心化后 (factor_engine.market_corr) 误差回到容差之内，但中心化的开销抵消了大部分速度优势，
+只在一侧序列 (基准收益率) 的滚动矩能被所有币种共用的面板 CorrBTC 中采用，这里仍使用 pandas。
+
+已有因子的公式以因子文件中的 expr(n) 为准 (FactorGraph.compile 直接编译)，表达式文本用于临时编写的新因子，
+不再另外维护一份与 expr 对应的文本。
+"""
+import ast
+
+import numpy as np
+import pandas as pd
+
+from factor_engine import graph, kernels
+from factor_engine.graph import Node, topological_order
+
+FUNCTIONS = {name: getattr(graph, name) for name in [
+    'shift', 'pct_change', 'rolling_sum', 'rolling_mean', 'rolling_std', 'rolling_corr',
+    'where', 'fillna', 'fill_finite',
+]}
+
+_BINARY = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+           ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b}
+
+
+def _compare(op, a, b):
+    if isinstance(op, ast.Gt):
+        return graph.gt(_as_node(a), b)
+    if isinstance(op, ast.Lt):
+        return graph.lt(_as_node(a), b)
+    if isinstance(op, ast.GtE):
+        return graph.ge(_as_node(a), b)
+    if isinstance(op, ast.LtE):
+        return graph.ge(_as_node(b), a)
+    raise ValueError(f"不支持的比较运算：{type(op).__name__}")
+
+
+def _as_node(value):
+    return value if isinstance(value, Node) else graph.const(value)
+
+
+def parse(text, **params):
+    """
+    把表达式解析为计算图节点
+
+    参数:
+        text (str): 表达式
+        **params: 表达式参数，如 n=20
+
+    返回:
+        Node
+    """
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, ast.Name):
+            return params[node.id] if node.id in params else graph.field(node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            return _BINARY[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = visit(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            return _compare(node.ops[0], visit(node.left), visit(node.comparators[0]))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            args = [visit(arg) for arg in node.args]
+            kwargs = {kw.arg: visit(kw.value) for kw in node.keywords}
+            return FUNCTIONS[node.func.id](*args, **kwargs)
+        raise ValueError(f"不支持的表达式语法：{ast.unparse(node)}")
+
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"表达式语法错误：{text}") from e
+    return _as_node(visit(tree))
+
+
+# ====== 编译 ======
+_UFUNCS = {'add': 'np.add', 'sub': 'np.subtract', 'mul': 'np.multiply', 'div': 'np.divide',
+           'gt': 'np.greater', 'lt': 'np.less', 'ge': 'np.greater_equal'}
+_NUMPY_ROLLING = {'rolling_sum': 'K.rolling_sum', 'rolling_mean': 'K.rolling_mean'}
+_PANDAS_ROLLING = {'rolling_std': "G['rolling_std']", 'rolling_corr': "G['rolling_corr']"}
+
+
+class FusedKernel:
+    """
+    把若干表达式 (因子列名 -> Node) 编译成一个融合的 NumPy 函数
+
+    调用时传入单币种 DataFrame 返回只含因子列的 DataFrame，传入 panel.Panel 返回 因子名 -> (T, S) 矩阵。
+    """
+
+    def __init__(self, outputs):
+        self.outputs = dict(outputs)
+        self.fields = []
+        self.stats = {}
+        self.source = self._generate()
+        namespace = {'np': np, 'K': kernels, 'G': graph.KERNELS}
+        exec(compile(self.source, '<fused factor kernel>', 'exec'), namespace)
+        self._kernel = namespace['kernel']
+
+    def _generate(self):
+        order = topological_order(self.outputs.values())
+        # 剩余使用次数：被多少个唯一父节点引用，因子输出额外 +1 (输出永远不会被原地改写)
+        uses = {}
+        for node in order:
+            for key in {child.key for child in node.children}:
+                uses[key] = uses.get(key, 0) + 1
+        for node in self.outputs.values():
+            uses[node.key] = uses.get(node.key, 0) + 1
+
+        names, writable = {}, set()  # 节点键 -> 变量名 / 字面量；可原地改写的变量
+        lines = ['def kernel(get):']
+        inplace = 0
+
+        def ref(arg):
+            return names[arg.key] if isinstance(arg, Node) else repr(arg)
+
+        def reusable(arg):
+            # 当前是该临时数组的最后一次使用，可以作为输出缓冲区
+            return isinstance(arg, Node) and names[arg.key] in writable and uses[arg.key] == 1
+
+        for i, node in enumerate(order):
+            var = f"t{i}"
+            op, args = node.op, node.args
+            if op == 'field':
+                var = f"f_{len(self.fields)}"
+                self.fields.append(args[0])
+                lines.append(f"    {var} = get({args[0]!r})")
+            elif op == 'const':
+                var = repr(args[0])
+            elif op in _UFUNCS or op == 'neg':
+                ufunc = _UFUNCS.get(op, 'np.negative')
+                operands = ', '.join(ref(arg) for arg in args)
+                target = next((arg for arg in args if reusable(arg)), None)
+                if target is not None:
+                    var = names[target.key]
+                    lines.append(f"    {ufunc}({operands}, out={var})")
+                    inplace += 1
+                elif op in ('gt', 'lt', 'ge'):
+                    lines.append(f"    {var} = {ufunc}({operands}).astype(np.float64)")
+                else:
+                    lines.append(f"    {var} = {ufunc}({operands})")
+                writable.add(var)
+            elif op in ('fillna', 'fill_finite'):
+                x = args[0]
+                mask = f"np.isnan({ref(x)})" if op == 'fillna' else f"~np.isfinite({ref(x)})"
+                value = args[1] if op == 'fillna' else 0.0
+                if reusable(x):
+                    var = names[x.key]
+                    lines.append(f"    {var}[{mask}] = {value!r}")
+                    inplace += 1
+                else:
+                    lines.append(f"    {var} = np.where({mask}, {value!r}, {ref(x)})")
+                writable.add(var)
+            elif op == 'where':
+                cond, x, y = args
+                lines.append(f"    {var} = np.where({ref(cond)} != 0, {ref(x)}, {ref(y)})")
+                writable.add(var)
+            elif op == 'shift':
+                lines.append(f"    {var} = K.shift({ref(args[0])}, {args[1]!r})")
+                writable.add(var)
+            elif op in _NUMPY_ROLLING:
+                lines.append(f"    {var} = {_NUMPY_ROLLING[op]}({', '.join(ref(arg) for arg in args)})")
+                writable.add(var)
+            elif op in _PANDAS_ROLLING:
+                # pandas 返回的数组可能是只读视图，不参与原地运算
+                lines.append(f"    {var} = {_PANDAS_ROLLING[op]}({', '.join(ref(arg) for arg in args)})")
+            else:
+                raise ValueError(f"算子 {op} 无法编译 (因子需要提供 expr 才能参与融合计算)")
+            names[node.key] = var
+            for key in {child.key for child in node.children}:
+                uses[key] -= 1
+
+        result = ', '.join(f"{name!r}: {names[node.key]}" for name, node in self.outputs.items())
+        lines.append(f"    return {{{result}}}")
+        self.stats = {'nodes': len(order), 'inplace': inplace}
+        return '\n'.join(lines) + '\n'
+
+    def __call__(self, source):
+        if isinstance(source, pd.DataFrame):
+            def get(name):
+                return source[name].to_numpy(dtype=np.float64)
+            shape = len(source)
+        else:
+            get = source.__getitem__
+            shape = source.shape
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            results = self._kernel(get)
+        results = {name: np.full(shape, value) if np.isscalar(value) else value for name, value in results.items()}
+        if isinstance(source, pd.DataFrame):
+            return pd.DataFrame(results, index=source.index, copy=False)
+        listed = source.listed()
+        return {name: np.where(listed, value, np.nan) for name, value in results.items()}
+
+
+class Expression:
+    """
+    编译后的因子表达式，按参数缓存融合内核
+
+        expr = compile_expression("fill_finite(rolling_mean(quote_volume, n))")
+        df['Volume_20'] = expr(df, n=20)
+    """
+
+    def __init__(self, text, name='factor'):
+        self.text = text
+        self.name = name
+        self._kernels = {}
+        parse(text, **{param: 1 for param in _parameter_names(text)})  # 提前暴露语法错误
+
+    def kernel(self, **params):
+        key = tuple(sorted(params.items()))
+        if key not in self._kernels:
+            self._kernels[key] = FusedKernel({self.name: parse(self.text, **params)})
+        return self._kernels[key]
+
+    def __call__(self, source, **params):
+        result = self.kernel(**params)(source)
+        return result[self.name].to_numpy() if isinstance(source, pd.DataFrame) else result[self.name]
+
+
+def _parameter_names(text):
+    """
+    表达式中作为窗口长度等整数参数出现的标识符 (目前约定为 n)
+    """
+    names = {node.id for node in ast.walk(ast.parse(text.strip(), mode='eval')) if isinstance(node, ast.Name)}
+    return names & {'n'}
+
+
+def compile_expression(text, name='factor'):
+    return Expression(text, name)
@@ -0,0 +1,180 @@
+"""
+额外数据 (extra_data_dict) 的索引与 as-of 合并
+
+因子通过 extra_data_dict 声明需要的额外数据，例如:
+
+    extra_data_dict = {'coin-cap': ['circulating_supply']}     # MarketCap、TurnoverRate、市值因子、换手率因子
+    extra_data_dict = {'coin-btc': ['btc_close']}              # CorrBTC
+
+ExtraData 把每个数据源只加载一次，按 (symbol, candle_begin_time) 排序后按币种切分成
+(时间数组, 数值矩阵)，合并时对K线时间做 np.searchsorted 的向量化 as-of 查找
+(取不晚于该K线时间的最近一条记录)。没有币种列的数据源 (如 coin-btc) 对所有币种共用一条时间序列。
+
+合并结果按 (数据源, 字段, 币种, K线时间) 缓存，多个因子需要同一个 circulating_supply 时只合并一次:
+
+    extra = ExtraData({'coin-cap': cap_df, 'coin-btc': btc_df})
+    df = extra.attach(df, 'BTC-USDT', ['MarketCap', 'TurnoverRate', 'CorrBTC'])
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from factor_engine.loader import load_factor
+
+
+def required_columns(factors):
+    """
+    汇总多个因子的 extra_data_dict
+
+    参数:
+        factors (list): 因子名或因子模块
+
+    返回:
+        dict: 数据源 -> 字段列表 (去重，保持声明顺序)
+    """
+    merged = {}
+    for factor in factors:
+        mod = load_factor(factor) if isinstance(factor, str) else factor
+        for source, columns in getattr(mod, 'extra_data_dict', {}).items():
+            merged.setdefault(source, [])
+            merged[source] += [col for col in columns if col not in merged[source]]
+    return merged
+
+
+def _time_values(times):
+    return np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+
+
+class _Source:
+    """
+    一个已排序、按币种切分的数据源
+    """
+
+    def __init__(self, df, time_col, symbol_col):
+        self.columns = [col for col in df.columns if col not in (time_col, symbol_col)]
+        if symbol_col in df.columns:
+            df = df.sort_values([symbol_col, time_col], kind='stable')
+            codes, symbols = pd.factorize(df[symbol_col], sort=True)
+            bounds = np.searchsorted(codes, np.arange(len(symbols) + 1))
+            self.slices = {symbol: slice(bounds[i], bounds[i + 1]) for i, symbol in enumerate(symbols)}
+        else:
+            df = df.sort_values(time_col, kind='stable')
+            self.slices = None
+        self.times = _time_values(df[time_col])
+        self.values = {col: df[col].to_numpy() for col in self.columns}
+
+    def lookup(self, symbol, column, times):
+        """
+        times 中每个时刻不晚于它的最近一条记录，没有记录 (或该币种没有数据) 时为 NaN
+        """
+        if self.slices is None:
+            part = slice(0, len(self.times))
+        elif symbol in self.slices:
+            part = self.slices[symbol]
+        else:
+            return np.full(len(times), np.nan)
+        source_times = self.times[part]
+        values = self.values[column][part]
+        pos = np.searchsorted(source_times, times, side='right') - 1
+        found = pos >= 0
+        if values.dtype.kind in 'biuf':
+            out = np.full(len(times), np.nan)
+        else:
+            out = np.full(len(times), None, dtype=object)
+        out[found] = values[pos[found]]
+        return out
+
+
+class ExtraData:
+    """
+    额外数据源集合，stats 记录合并 (join) 与缓存命中 (hit) 的次数
+
+    参数:
+        sources (dict): 数据源名 -> DataFrame (含 time_col 列，按币种区分的数据源还含 symbol_col 列)
+    """
+
+    def __init__(self, sources=None, time_col='candle_begin_time', symbol_col='symbol'):
+        self.time_col = time_col
+        self.symbol_col = symbol_col
+        self._sources = {}
+        self._cache = {}
+        self.stats = {'join': 0, 'hit': 0}
+        for name, df in (sources or {}).items():
+            self.add_source(name, df)
+
+    def add_source(self, name, df):
+        """
+        注册 (或替换) 一个数据源，替换时清除该数据源的合并缓存
+        """
+        self._sources[name] = _Source(df, self.time_col, self.symbol_col)
+        self._cache = {key: value for key, value in self._cache.items() if key[0] != name}
+
+    def __contains__(self, name):
+        return name in self._sources
+
+    def column(self, source, column, symbol, times):
+        """
+        将数据源的一个字段 as-of 合并到给定的K线时间上
+
+        参数:
+            source (str): 数据源名，如 'coin-cap'
+            column (str): 字段名，如 'circulating_supply'
+            symbol (str): 币种 (对没有币种列的数据源不起作用)
+            times: K线时间 (升序)
+
+        返回:
+            np.ndarray: 与 times 逐个对齐
+        """
+        if source not in self._sources:
+            raise KeyError(f"额外数据源未注册：{source}")
+        data = self._sources[source]
+        if column not in data.values:
+            raise KeyError(f"额外数据源 {source} 中没有字段：{column}")
+        times = _time_values(times)
+        digest = hashlib.blake2b(times.tobytes(), digest_size=16).hexdigest()
+        key = (source, column, None if data.slices is None else symbol, digest)
+        if key in self._cache:
+            self.stats['hit'] += 1
+            return self._cache[key]
+        values = data.lookup(symbol, column, times)
+        values.flags.writeable = False  # 多个因子共用同一份合并结果
+        self._cache[key] = values
+        self.stats['join'] += 1
+        return values
+
+    def attach(self, df, symbol, factors):
+        """
+        返回带有因子所需额外字段的 DataFrame (浅拷贝，不修改原 df)；df 中已有的字段不会被覆盖
+
+        参数:
+            df (pd.DataFrame): 单币种K线数据，含 time_col 列 (或以时间为索引)
+            symbol (str): 币种
+            factors (list): 因子名或因子模块，按其 extra_data_dict 决定合并哪些字段
+        """
+        times = df[self.time_col] if self.time_col in df.columns else df.index
+        out = df.copy(deep=False)
+        for source, columns in required_columns(factors).items():
+            for col in columns:
+                if col not in out.columns:
+                    out[col] = self.column(source, col, symbol, times)
+        return out
+
+    def attach_panel(self, panel, factors):
+        """
+        把因子所需的额外字段以 (T, S) 矩阵加入面板 (原地修改 panel.fields)，未上市的格子为 NaN
+        """
+        listed = panel.listed()
+        for source, columns in required_columns(factors).items():
+            for col in columns:
+                if col in panel:
+                    continue
+                mat = np.column_stack([self.column(source, col, symbol, panel.index) for symbol in panel.symbols]) \
+                    if panel.symbols else np.empty(panel.shape)
+                if mat.dtype.kind in 'biuf':
+                    mat = np.where(listed, mat, np.nan)
+                panel.fields[col] = mat
+        return panel
+
+    def clear_cache(self):
+        self._cache.clear()
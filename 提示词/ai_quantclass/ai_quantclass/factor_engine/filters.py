@@ -0,0 +1,188 @@
+"""
+strategy_list 中 filter_list 的编译与向量化执行
+
+filter_list 的每一项为 [因子名, 参数, 条件, 是否升序]，例如:
+
+    ['ROE', '单季', 'pct:<=0.8', False]         # 按 ROE 降序的截面百分位 <= 0.8
+    ['成交额Mean', 5, 'pct:>=0.05', True]       # 按 5 日成交额均值升序的截面百分位 >= 0.05
+    ['一级风险标签', 250, 'val:==0', True]       # 数值条件
+    ['市值', '', 'rank:<=100', True]            # 截面排名条件
+
+条件中的 pct 为 rank(method='min', pct=True)，rank 为 rank(method='min')，val 直接比较因子值；
+因子值为 NaN 或不在股票池中的股票不满足任何条件。所有规则都在同一个过滤前的股票池上计算，结果取交集。
+
+compile_filters 把规则解析一次得到 FilterPlan，apply 在整个 (日期 × 股票) 矩阵上用布尔数组完成过滤，
+不逐日期循环。百分位/排名条件不需要完整排名：每行排序后由条件反解出临界位置，取出该位置的因子值作为阈值，
+再做一次比较。执行顺序为 数值条件 (一次比较) 在前，百分位/排名条件按预计通过比例从小到大。
+
+每条规则的百分位/排名都以过滤前的股票池为分母，结果与其他规则无关，所以调整顺序不能减少排序的工作量：
+唯一能跳过的是已经没有股票剩下的日期 (stats['evaluated_rows'] 为每条规则实际参与计算的日期数)，
+常见的过滤条件下每天都有股票剩下，各规则仍要在全部日期上排序。
+
+    plan = compile_filters(strategy['filter_list'])
+    mask = plan.apply(factors, universe=tradable)      # factors: 因子列名 -> (T, N) 矩阵
+"""
+import operator
+import re
+
+import numpy as np
+
+from factor_engine.selection import factor_col_name, rank_matrix
+
+_OPERATORS = {
+    '<=': operator.le, '<': operator.lt, '>=': operator.ge, '>': operator.gt,
+    '==': operator.eq, '!=': operator.ne,
+}
+_RULE_PATTERN = re.compile(r'^\s*(pct|rank|val)\s*:\s*(<=|>=|==|!=|<|>)\s*([-+0-9.eE]+)\s*$')
+
+
+class FilterRule:
+    """
+    一条解析后的过滤规则
+    """
+
+    def __init__(self, name, param, how, ascending=True):
+        match = _RULE_PATTERN.match(str(how))
+        if match is None:
+            raise ValueError(f"无法解析的过滤条件：{how!r} (格式为 pct|rank|val:<比较符><数值>)")
+        self.name = name
+        self.param = param
+        self.how = how
+        self.kind, self.op, value = match.groups()
+        self.value = float(value)
+        self.ascending = bool(ascending)
+
+    @property
+    def column(self):
+        return factor_col_name(self.name, self.param)
+
+    @property
+    def cost(self):
+        """
+        执行代价：数值条件只需一次比较，百分位/排名条件需要按行排序
+        """
+        return 0 if self.kind == 'val' else 1
+
+    def expected_pass(self):
+        """
+        预计通过比例 (只对百分位条件可事先估计)，用于确定执行顺序
+        """
+        if self.kind != 'pct':
+            return 1.0
+        if self.op in ('<=', '<'):
+            return min(max(self.value, 0.0), 1.0)
+        if self.op in ('>=', '>'):
+            return 1.0 - min(max(self.value, 0.0), 1.0)
+        return 0.0 if self.op == '==' else 1.0
+
+    def __repr__(self):
+        return f"[{self.name!r}, {self.param!r}, {self.how!r}, {self.ascending}]"
+
+    def evaluate(self, values, universe, rows=None):
+        """
+        规则在 rows 这些日期上的布尔结果 (universe 为过滤前股票池，百分位以其中的有效股票为分母)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if rows is not None:
+            values, universe = values[rows], universe[rows]
+        valid = universe & ~np.isnan(values)
+        compare = _OPERATORS[self.op]
+        if self.kind == 'val':
+            with np.errstate(invalid='ignore'):
+                return valid & compare(values, self.value)
+
+        key = values if self.ascending else -values
+        key = np.where(valid, key, np.nan)
+        count = valid.sum(axis=1)
+        if self.op in ('==', '!='):
+            # 非单调条件需要完整排名
+            rank = rank_matrix(key, ascending=True, method='min')
+            score = rank / count[:, None] if self.kind == 'pct' else rank
+            with np.errstate(invalid='ignore'):
+                return valid & compare(score, self.value)
+
+        # 排名 = 1 + 严格更小的股票数 L，条件对 L 单调：反解出 L 的临界值，再取排序后该位置的值作为阈值
+        sorted_key = np.sort(key, axis=1)  # NaN 在末尾
+        target = self.value * count - 1 if self.kind == 'pct' else np.full(len(count), self.value - 1)
+
+        def holds(less):
+            rank = less + 1.0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return compare(rank / count if self.kind == 'pct' else rank, self.value)
+
+        # 临界值的估计：按有理数精确求解 (L + 1) / count 与 value 的比较。pct 条件实际比较的是浮点数
+        # (L + 1) / count (与 rank(pct=True) 一致)，value * count 与 (L + 1) / count 的舍入误差都远小于
+        # 1 / count (count < 2**50)，估计值与浮点比较下的临界值最多相差 1，向上、向下各校正一次即为精确结果；
+        # rank 条件比较的是整数，估计值本身就是精确的
+        if self.op in ('<=', '<'):
+            # 最大的 L (<= count - 1) 使条件成立，-1 表示没有
+            estimate = np.floor(target) if self.op == '<=' else np.ceil(target) - 1
+            limit = np.clip(estimate, -1, count - 1).astype(np.int64)
+            limit = np.where((limit + 1 <= count - 1) & holds(limit + 1), limit + 1, limit)
+            limit = np.where((limit >= 0) & ~holds(limit), limit - 1, limit)
+            threshold = np.take_along_axis(sorted_key, np.clip(limit, 0, None)[:, None], axis=1)
+            with np.errstate(invalid='ignore'):
+                passed = key <= threshold
+            return valid & passed & (limit >= 0)[:, None]
+
+        # >= / >：最小的 L 使条件成立，等于 count 表示没有
+        estimate = np.ceil(target) if self.op == '>=' else np.floor(target) + 1
+        limit = np.clip(estimate, 0, count).astype(np.int64)
+        limit = np.where((limit - 1 >= 0) & holds(limit - 1), limit - 1, limit)
+        limit = np.where((limit <= count - 1) & ~holds(limit), limit + 1, limit)
+        threshold = np.take_along_axis(sorted_key, np.clip(limit - 1, 0, None)[:, None], axis=1)
+        with np.errstate(invalid='ignore'):
+            passed = (key > threshold) | (limit <= 0)[:, None]
+        return valid & passed & (limit <= count - 1)[:, None]
+
+
+class FilterPlan:
+    """
+    编译后的过滤计划，rules 为执行顺序
+    """
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: (rule.cost, rule.expected_pass()))
+        self.stats = {}
+
+    @property
+    def columns(self):
+        return [rule.column for rule in self.rules]
+
+    def apply(self, factors, universe=None):
+        """
+        参数:
+            factors (dict): 因子列名 -> (T, N) 矩阵
+            universe (np.ndarray): (T, N) 布尔矩阵，过滤前的股票池，默认全部
+
+        返回:
+            np.ndarray: (T, N) 布尔矩阵，满足全部规则的股票
+        """
+        if not self.rules:
+            if universe is None:
+                raise ValueError("没有过滤规则时需要提供 universe")
+            return np.asarray(universe, dtype=bool).copy()
+        shape = np.shape(factors[self.rules[0].column])
+        universe = np.ones(shape, dtype=bool) if universe is None else np.asarray(universe, dtype=bool)
+        alive = universe.copy()
+        self.stats = {'rows': shape[0], 'evaluated_rows': []}
+        for rule in self.rules:
+            rows = np.flatnonzero(alive.any(axis=1))
+            self.stats['evaluated_rows'].append(len(rows))
+            if len(rows) == 0:
+                break
+            if len(rows) == shape[0]:
+                alive &= rule.evaluate(factors[rule.column], universe)
+            else:
+                alive[rows] &= rule.evaluate(factors[rule.column], universe, rows)
+        return alive
+
+    def describe(self):
+        return '\n'.join(f"{i + 1}. {rule!r}" for i, rule in enumerate(self.rules))
+
+
+def compile_filters(filter_list):
+    """
+    解析 filter_list，返回 FilterPlan (解析失败时抛出 ValueError)
+    """
+    return FilterPlan([FilterRule(*item) for item in filter_list])
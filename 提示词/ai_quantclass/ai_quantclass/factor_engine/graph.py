@@ -0,0 +1,371 @@
+"""
+因子依赖图：识别多个因子之间共享的中间序列，每个中间序列每个币种只计算一次
+
+因子可以提供 expr(n)，用本模块的算子描述计算过程 (返回 Node)，例如 Volatility:
+
+    def expr(n):
+        from factor_engine.graph import field, fill_finite, pct_change, rolling_std
+        return fill_finite(rolling_std(pct_change(field('close'), 1), n))
+
+同一个 (算子, 参数) 组合在图中只有一个节点：Volatility、VolumePriceCorr、CorrBTC 中的
+pct_change(close, 1)，Momentum 与 动量因子 中的 close / close.shift(n) - 1 都会被合并。
+没有提供 expr 的因子作为一个整体节点，通过 harness.factor_column 运行原有的 signal()。
+
+    graph = FactorGraph()
+    graph.add('Volatility', 20)
+    graph.add('VolumePriceCorr', 20)
+    factors = graph.evaluate(df)      # 只包含因子列的 DataFrame
+    print(graph.report())
+
+计算对象既可以是单币种 DataFrame，也可以是 panel.Panel (此时每个节点都是 (T, S) 矩阵)。
+
+expr(n) 是因子公式的唯一写法，其余计算方式都由它派生，因子文件中不再手写：
+    - 面板：panel.evaluate 在 (T, S) 矩阵上求值 expr
+    - 多参数：multi.multi_signal 把 n_list 中的每个 expr 放进同一张图，与 n 无关的中间结果只算一次
+    - 增量：rolling.stream(expr) 为每个节点建立标量状态机，每根K线 O(1)
+"""
+import numpy as np
+import pandas as pd
+
+from factor_engine import kernels
+from factor_engine.harness import factor_column
+from factor_engine.loader import factor_label, load_factor
+
+
+class Node:
+    """
+    计算图节点：op 为算子名，args 为子节点或常量参数；(op, args) 相同的节点视为同一个中间结果
+    """
+
+    __slots__ = ('op', 'args', 'key')
+
+    def __init__(self, op, *args):
+        self.op = op
+        self.args = args
+        self.key = (op, tuple(arg.key if isinstance(arg, Node) else arg for arg in args))
+
+    @property
+    def children(self):
+        return [arg for arg in self.args if isinstance(arg, Node)]
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.key == other.key
+
+    def __repr__(self):
+        if self.op == 'field':
+            return self.args[0]
+        if self.op == 'const':
+            return repr(self.args[0])
+        return f"{self.op}({', '.join(map(repr, self.args))})"
+
+    def __add__(self, other):
+        return Node('add', self, _node(other))
+
+    def __radd__(self, other):
+        return Node('add', _node(other), self)
+
+    def __sub__(self, other):
+        return Node('sub', self, _node(other))
+
+    def __rsub__(self, other):
+        return Node('sub', _node(other), self)
+
+    def __mul__(self, other):
+        return Node('mul', self, _node(other))
+
+    def __rmul__(self, other):
+        return Node('mul', _node(other), self)
+
+    def __truediv__(self, other):
+        return Node('div', self, _node(other))
+
+    def __rtruediv__(self, other):
+        return Node('div', _node(other), self)
+
+    def __neg__(self):
+        return Node('neg', self)
+
+
+def _node(value):
+    return value if isinstance(value, Node) else Node('const', float(value))
+
+
+# ====== 算子 ======
+def field(name):
+    return Node('field', name)
+
+
+def const(value):
+    return Node('const', float(value))
+
+
+def shift(x, n=1):
+    if int(n) < 0:
+        raise ValueError(f"shift 的 n 不能为负数 (会用到未来数据)：{n}")
+    return Node('shift', x, int(n))
+
+
+def pct_change(x, n=1):
+    # 展开为 x / shift(x, n) - 1，与动量类因子的写法共享同一组节点
+    return x / shift(x, n) - 1
+
+
+def rolling_sum(x, n, min_periods=1):
+    return Node('rolling_sum', x, int(n), int(min_periods))
+
+
+def rolling_mean(x, n, min_periods=1):
+    return Node('rolling_mean', x, int(n), int(min_periods))
+
+
+def rolling_std(x, n, min_periods=1):
+    return Node('rolling_std', x, int(n), int(min_periods))
+
+
+def rolling_corr(x, y, n, min_periods=1):
+    return Node('rolling_corr', x, y, int(n), int(min_periods))
+
+
+def gt(x, y):
+    return Node('gt', x, _node(y))
+
+
+def lt(x, y):
+    return Node('lt', x, _node(y))
+
+
+def ge(x, y):
+    return Node('ge', x, _node(y))
+
+
+def where(cond, x, y):
+    return Node('where', cond, _node(x), _node(y))
+
+
+def fillna(x, value=0.0):
+    return Node('fillna', x, float(value))
+
+
+def fill_finite(x):
+    """
+    因子文件中统一的 replace([inf, -inf], nan).fillna(0) 收尾
+    """
+    return Node('fill_finite', x)
+
+
+def signal_node(mod, n):
+    """
+    不可分解的因子：整体作为一个节点运行原有的 signal()
+    """
+    return Node('signal', factor_label(mod), repr(n), _Opaque(mod, n))
+
+
+class _Opaque:
+    """
+    携带因子模块与参数，但在节点键中只以因子名 + 参数参与比较
+    """
+
+    __slots__ = ('mod', 'n')
+
+    def __init__(self, mod, n):
+        self.mod = mod
+        self.n = n
+
+    def __hash__(self):
+        return hash((factor_label(self.mod), repr(self.n)))
+
+    def __eq__(self, other):
+        return isinstance(other, _Opaque) and factor_label(self.mod) == factor_label(other.mod) and \
+            repr(self.n) == repr(other.n)
+
+    def __repr__(self):
+        return f"<{factor_label(self.mod)}>"
+
+
+# ====== 节点求值 ======
+def _pandas(a):
+    return pd.Series(a, copy=False) if a.ndim == 1 else pd.DataFrame(a, copy=False)
+
+
+def _rolling(name):
+    def run(a, n, min_periods):
+        return getattr(_pandas(a).rolling(n, min_periods=min_periods), name)().to_numpy()
+    return run
+
+
+def _rolling_corr(a, b, n, min_periods):
+    return _pandas(a).rolling(n, min_periods=min_periods).corr(_pandas(b)).to_numpy()
+
+
+KERNELS = {
+    'shift': kernels.shift,
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'div': np.divide,
+    'neg': np.negative,
+    'gt': lambda a, b: (a > b).astype(np.float64),
+    'lt': lambda a, b: (a < b).astype(np.float64),
+    'ge': lambda a, b: (a >= b).astype(np.float64),
+    'where': lambda c, a, b: np.where(c != 0, a, b),
+    'fillna': lambda a, value: np.where(np.isnan(a), value, a),
+    'fill_finite': lambda a: np.where(np.isfinite(a), a, 0.0),
+    'rolling_sum': _rolling('sum'),
+    'rolling_mean': _rolling('mean'),
+    'rolling_std': _rolling('std'),
+    'rolling_corr': _rolling_corr,
+}
+
+
+def topological_order(nodes):
+    """
+    nodes 及其全部子节点去重后的拓扑顺序 (子节点在前)
+    """
+    order, seen = [], set()
+
+    def visit(node):
+        if node.key in seen:
+            return
+        for child in node.children:
+            visit(child)
+        seen.add(node.key)
+        order.append(node)
+
+    for node in nodes:
+        visit(node)
+    return order
+
+
+def is_leaf(node):
+    """
+    行情字段与常量只是取值，不计为一次计算
+    """
+    return node.op in ('field', 'const')
+
+
+def tree_size(node):
+    """
+    不做任何合并时，计算该表达式需要的算子求值次数 (不含行情字段与常量)
+    """
+    return (not is_leaf(node)) + sum(tree_size(child) for child in node.children)
+
+
+class FactorGraph:
+    """
+    一次运行中请求的全部因子组成的计算图
+
+    evaluate 按拓扑顺序求值，每个唯一节点只计算一次；中间结果在最后一个使用者计算完成后立即释放。
+    """
+
+    def __init__(self):
+        self.outputs = {}  # 因子列名 -> Node
+        self.stats = {}
+
+    def add(self, factor, n, factor_name=None):
+        """
+        加入一个因子，因子模块提供 expr(n) 时展开为算子节点，否则作为整体节点
+        """
+        mod = load_factor(factor) if isinstance(factor, str) else factor
+        factor_name = factor_name or f"{factor_label(mod)}_{n}"
+        node = mod.expr(n) if hasattr(mod, 'expr') else signal_node(mod, n)
+        self.outputs[factor_name] = node
+        return node
+
+    def add_node(self, factor_name, node):
+        self.outputs[factor_name] = node
+        return node
+
+    def order(self):
+        """
+        所有唯一节点的拓扑顺序
+        """
+        return topological_order(self.outputs.values())
+
+    def compile(self):
+        """
+        把整张图编译成一个融合内核 (见 factor_engine.dsl)，所有因子都必须提供 expr
+        """
+        from factor_engine.dsl import FusedKernel
+        return FusedKernel(self.outputs)
+
+    def _value(self, node, source, values):
+        if node.op == 'field':
+            return _source_field(source, node.args[0])
+        if node.op == 'const':
+            return node.args[0]
+        if node.op == 'signal':
+            opaque = node.args[2]
+            if isinstance(source, pd.DataFrame):
+                return factor_column(opaque.mod, source, opaque.n).to_numpy(dtype=np.float64)
+            from factor_engine.panel import evaluate
+            return evaluate(opaque.mod, source, opaque.n)
+        args = [values[arg.key] if isinstance(arg, Node) else arg for arg in node.args]
+        return KERNELS[node.op](*args)
+
+    def evaluate(self, source):
+        """
+        求值所有因子
+
+        参数:
+            source (pd.DataFrame | Panel): 单币种K线数据或多币种面板
+
+        返回:
+            pd.DataFrame (单币种) 或 dict 因子名 -> (T, S) 矩阵 (面板)
+        """
+        results = self.arrays(source)
+        if isinstance(source, pd.DataFrame):
+            return pd.DataFrame(results, index=source.index)
+        return results
+
+    def arrays(self, source):
+        """
+        求值所有因子，返回 因子名 -> 数组 (单币种为一维，面板为 (T, S) 且无K线的位置为 NaN)
+        """
+        order = self.order()
+        # 每个节点被多少个唯一父节点引用，降为 0 时释放
+        consumers = {}
+        for node in order:
+            for key in {child.key for child in node.children}:
+                consumers[key] = consumers.get(key, 0) + 1
+        output_keys = {node.key for node in self.outputs.values()}
+
+        values = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for node in order:
+                values[node.key] = self._value(node, source, values)
+                for key in {child.key for child in node.children}:
+                    consumers[key] -= 1
+                    if consumers[key] == 0 and key not in output_keys:
+                        del values[key]
+
+        requested = sum(tree_size(node) for node in self.outputs.values())
+        computed = sum(not is_leaf(node) for node in order)
+        self.stats = {'factors': len(self.outputs), 'requested': requested, 'computed': computed,
+                      'eliminated': requested - computed}
+
+        results = {name: _as_array(values[node.key], source) for name, node in self.outputs.items()}
+        if isinstance(source, pd.DataFrame):
+            return results
+        listed = source.listed()
+        return {name: np.where(listed, value, np.nan) for name, value in results.items()}
+
+    def report(self):
+        s = self.stats
+        return (f"{s['factors']} 个因子共需 {s['requested']} 次算子求值，合并共享中间结果后实际计算 "
+                f"{s['computed']} 次，消除 {s['eliminated']} 次重复计算")
+
+
+def _source_field(source, name):
+    if isinstance(source, pd.DataFrame):
+        return source[name].to_numpy(dtype=np.float64)
+    return source[name]
+
+
+def _as_array(value, source):
+    if np.isscalar(value):
+        shape = len(source) if isinstance(source, pd.DataFrame) else source.shape
+        return np.full(shape, value)
+    return value
@@ -0,0 +1,80 @@
+"""
+隔离执行因子：因子只能看到调用方 DataFrame 的浅拷贝，计算结束后只保留声明的 factor_name 列
+
+原有的因子文件会把中间结果写成临时列 (df['ret']、df['ma']、df['turnover'] ...)，
+直接在共享的单币种 DataFrame 上逐个运行因子时，这些列会一直留在内存中并越积越多。
+这里每个因子都在浅拷贝上运行：新增的列只属于拷贝，原有列与调用方共享内存 (pandas 3 的
+Copy-on-Write 下改写原有列也不会影响调用方)，取出因子列后拷贝连同临时列一起被回收。
+
+    factors = run_factors(df, [('Volatility', 20), ('Bias', 20), ('资金流因子', 10)])
+"""
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from factor_engine.loader import factor_label, load_factor
+
+
+def empty_block(n_rows, n_cols):
+    """
+    (n_rows, n_cols) 的列优先矩阵，逐列写入连续，可零拷贝构造 DataFrame
+    """
+    return np.empty((n_cols, n_rows)).T
+
+
+def factor_column(factor, df, n, factor_name=None):
+    """
+    在 df 的隔离视图上运行因子，只返回因子列 (pd.Series)，df 本身不会增加任何列
+
+    参数:
+        factor (str | module): 因子名或已加载的因子模块
+        df (pd.DataFrame): 单币种K线数据
+        n: 因子参数
+        factor_name (str): 因子列名，默认为 '<因子名>_<n>'
+    """
+    mod = load_factor(factor) if isinstance(factor, str) else factor
+    factor_name = factor_name or f"{factor_label(mod)}_{n}"
+    result = mod.signal(df.copy(deep=False), n, factor_name)
+    return result[factor_name].rename(factor_name)
+
+
+def run_factors(df, factor_list):
+    """
+    依次计算多个因子，返回只包含因子列的 DataFrame (与 df 同索引)
+
+    参数:
+        df (pd.DataFrame): 单币种K线数据 (不会被修改)
+        factor_list (list): [(因子, n), ...] 或 [(因子, n, factor_name), ...]
+    """
+    block = empty_block(len(df), len(factor_list))
+    columns = []
+    for i, item in enumerate(factor_list):
+        factor, n = item[0], item[1]
+        factor_name = item[2] if len(item) > 2 else None
+        column = factor_column(factor, df, n, factor_name)
+        block[:, i] = column.to_numpy(dtype=np.float64)
+        columns.append(column.name)
+    # 因子列直接写入预分配的连续内存块，不再整体复制一次
+    return pd.DataFrame(block, index=df.index, columns=columns, copy=False)
+
+
+def peak_memory(fn, *args, **kwargs):
+    """
+    运行 fn 并统计其间的峰值内存分配 (tracemalloc，NumPy/pandas 的数组内存也会被计入)
+
+    返回:
+        (fn 的返回值, 峰值字节数)
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        result = fn(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    return result, peak
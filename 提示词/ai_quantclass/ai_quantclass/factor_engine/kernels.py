@@ -0,0 +1,77 @@
+"""
+纯 NumPy 的滚动窗口内核 (沿第 0 轴，支持一维序列与 (T, S) 面板)
+
+窗口和用"分块前缀和"计算：把序列切成长度为 n 的块，块内做 cumsum，
+窗口 (t-n, t] 最多跨两个块，等于 本块前缀 + (上一块总和 - 上一块前缀)。
+误差只与 2n 个样本的量级有关，不随序列长度增长；全部为有限值时样本数按位置直接得出，不再额外累加。
+
+语义与 pandas rolling(n, min_periods) 一致：NaN 与 ±inf 都不计入样本，样本数不足时输出 NaN。
+滚动标准差与相关系数仍使用 pandas (Cython 单次遍历，比多次数组运算更快)。
+"""
+import numpy as np
+
+
+def shift(a, n=1):
+    """
+    沿第 0 轴后移 n 行，前 n 行为 NaN；n 为负数 (读取未来数据) 时报错
+    """
+    if n < 0:
+        raise ValueError(f"shift 的 n 不能为负数 (会用到未来数据)：{n}")
+    out = np.full_like(a, np.nan)
+    if n < len(a):
+        out[n:] = a[:len(a) - n]
+    return out
+
+
+def window_sum(v, n):
+    """
+    长度为 n 的滚动窗口和 (前 n-1 行为部分窗口)，v 中不能含 NaN/inf
+    """
+    rows = len(v)
+    pad = (-rows) % n
+    if pad:
+        v = np.concatenate([v, np.zeros((pad,) + v.shape[1:])])
+    local = np.cumsum(v.reshape((-1, n) + v.shape[1:]), axis=1)
+    local[1:] += local[:-1, -1:] - local[:-1]
+    return local.reshape(v.shape)[:rows]
+
+
+def _sum_and_count(a, n):
+    """
+    窗口和与窗口内有效样本数；全部有效时样本数返回 None (等于 min(t + 1, n))
+    """
+    valid = np.isfinite(a)
+    if valid.all():
+        return window_sum(a, n), None
+    return window_sum(np.where(valid, a, 0.0), n), window_sum(valid.astype(np.float64), n)
+
+
+def _head_count(n, rows, ndim):
+    """
+    前 n - 1 行的样本数 1, 2, ..., 其后均为 n
+    """
+    head = min(n - 1, rows)
+    return np.arange(1, head + 1, dtype=np.float64).reshape((head,) + (1,) * (ndim - 1))
+
+
+def rolling_sum(a, n, min_periods=1):
+    out, count = _sum_and_count(a, n)
+    if count is None:
+        out[:max(min_periods, 1) - 1] = np.nan
+    else:
+        out[count < max(min_periods, 1)] = np.nan
+    return out
+
+
+def rolling_mean(a, n, min_periods=1):
+    out, count = _sum_and_count(a, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if count is None:
+            head = _head_count(n, len(out), out.ndim)
+            out[len(head):] /= n
+            out[:len(head)] /= head
+            out[:max(min_periods, 1) - 1] = np.nan
+        else:
+            out /= count
+            out[count < max(min_periods, 1)] = np.nan
+    return out
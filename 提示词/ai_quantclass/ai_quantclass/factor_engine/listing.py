@@ -0,0 +1,160 @@
+"""
+币种上市时间索引：每个币种首次同时有现货与合约 (symbol_spot、symbol_swap 均非空) 的K线时间
+
+上市时长类因子 (HoursSinceSpotAndSwap 等) 不必每次都对整段K线做 pd.to_datetime、布尔筛选
+和 Timedelta.dt.total_seconds()：先对全部数据建一次索引 (币种 -> int64 纳秒时间戳) 并保存在数据旁边，
+因子值就是 int64 纳秒相减:
+
+    index = ListingIndex.from_long(all_candle_df)
+    index.save(os.path.join(data_dir, 'listing_index.json'))
+
+    panel = attach_listing_index(Panel.from_long(all_candle_df), ListingIndex.load(path))
+    first_ns = listing_time(df, index)             # 单币种计算时显式传入索引
+
+索引在数据加载时附加到数据上 (DataFrame 或 Panel 的 attrs['listing_index'])，面板因子 (panel_signal)
+与 listing_time 从数据本身读取，没有全局状态。单币种因子的 signal() 只依赖传入的 df
+(因子文件需要脱离 factor_engine 独立运行)。没有索引 (或索引中没有该币种) 时，
+listing_time 退化为在传入的 df 上直接查找。
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+NS_PER_HOUR = 3_600_000_000_000
+
+
+def time_ns(times):
+    """
+    K线时间转为 int64 纳秒 (datetime64[ns] 列直接视图转换，不做解析)
+    """
+    values = np.asarray(times)
+    if values.dtype == 'datetime64[ns]':
+        return values.view(np.int64)
+    return pd.DatetimeIndex(times).as_unit('ns').asi8
+
+
+def spot_and_swap(symbol_spot, symbol_swap):
+    """
+    同时有现货与合约的布尔数组
+    """
+    return (np.asarray(symbol_swap) != '') & (np.asarray(symbol_spot) != '')
+
+
+def first_listing_ns(df, time_col='candle_begin_time'):
+    """
+    df 中首次同时有现货与合约的K线时间 (int64 纳秒)，从未满足时返回 None
+    """
+    cond = spot_and_swap(df['symbol_spot'], df['symbol_swap'])
+    if not cond.any():
+        return None
+    return int(time_ns(df[time_col].iloc[[int(cond.argmax())]])[0])
+
+
+class ListingIndex:
+    """
+    币种 -> 首次同时有现货与合约的时间 (int64 纳秒)
+    """
+
+    def __init__(self, first_ns=None):
+        self.first_ns = dict(first_ns or {})
+
+    @classmethod
+    def from_long(cls, df, time_col='candle_begin_time', symbol_col='symbol'):
+        """
+        由长表一次性建立索引 (向量化，不逐币种循环)
+        """
+        cond = spot_and_swap(df['symbol_spot'], df['symbol_swap'])
+        times = pd.Series(time_ns(df[time_col])[cond])
+        first = times.groupby(df[symbol_col].to_numpy()[cond]).min()
+        return cls({symbol: int(value) for symbol, value in first.items()})
+
+    @classmethod
+    def from_frames(cls, frames, time_col='candle_begin_time'):
+        """
+        由 {symbol: 单币种 DataFrame} 建立索引
+        """
+        first_ns = {}
+        for symbol, df in frames.items():
+            value = first_listing_ns(df, time_col)
+            if value is not None:
+                first_ns[symbol] = value
+        return cls(first_ns)
+
+    def __deepcopy__(self, memo):
+        # 附加到数据上之后视为只读：DataFrame.attrs 在切片、拷贝时会被深拷贝，这里共享同一个对象
+        return self
+
+    def get(self, symbol):
+        return self.first_ns.get(symbol)
+
+    def __contains__(self, symbol):
+        return symbol in self.first_ns
+
+    def __len__(self):
+        return len(self.first_ns)
+
+    def update(self, other):
+        """
+        合并另一个索引 (例如新数据建立的索引)，同一币种取较早的时间
+        """
+        for symbol, value in other.first_ns.items():
+            self.first_ns[symbol] = min(value, self.first_ns.get(symbol, value))
+        return self
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.first_ns, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls({symbol: int(value) for symbol, value in json.load(f).items()})
+
+
+def attach_listing_index(source, index):
+    """
+    把上市时间索引附加到数据上 (数据加载时调用一次)
+
+    参数:
+        source (pd.DataFrame | Panel): 单币种 / 多币种K线数据或面板
+        index (ListingIndex): 上市时间索引
+
+    返回:
+        DataFrame 时为浅拷贝 (不修改原 df)；Panel 时原地修改 panel.attrs 并返回 panel
+    """
+    if isinstance(source, pd.DataFrame):
+        source = source.copy(deep=False)
+    source.attrs['listing_index'] = index
+    return source
+
+
+def listing_time(df, index=None, time_col='candle_begin_time', symbol_col='symbol'):
+    """
+    df 所属币种首次同时有现货与合约的时间 (int64 纳秒)，从未满足时返回 None
+
+    优先查询传入的索引，其次是附加在 df 上的索引 (attach_listing_index)，都没有时在 df 上直接查找
+    """
+    if index is None:
+        index = df.attrs.get('listing_index')
+    if index is not None and symbol_col in df.columns and len(df):
+        symbol = df[symbol_col].iloc[0]
+        if symbol in index:
+            return index.get(symbol)
+    return first_listing_ns(df, time_col)
+
+
+def hours_since(times, first_ns, mask=None):
+    """
+    各K线距 first_ns 的小时数 (float64)；first_ns 为 None 或 mask 为 False 的位置为 NaN
+    """
+    times = time_ns(times)
+    if first_ns is None:
+        return np.full(len(times), np.nan)
+    hours = (times - first_ns) / NS_PER_HOUR
+    if mask is not None:
+        hours[~np.asarray(mask)] = np.nan
+    return hours
@@ -0,0 +1,42 @@
+"""
+按文件路径加载 factors/ 与 ref_factors/ 中的因子模块
+"""
+import importlib.util
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FACTOR_DIRS = [os.path.join(ROOT_DIR, 'factors'), os.path.join(ROOT_DIR, 'ref_factors')]
+
+
+def factor_path(name):
+    """
+    因子名 (文件名，不含 .py) 对应的文件路径，依次在 factors/、ref_factors/ 中查找
+    """
+    for folder in FACTOR_DIRS:
+        path = os.path.join(folder, f"{name}.py")
+        if os.path.exists(path):
+            return path
+    raise ModuleNotFoundError(f"Factor not found: {name}")
+
+
+def load_factor(name):
+    """
+    加载因子模块 (同一进程内只加载一次)
+    """
+    module_name = f"factor_{name}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, factor_path(name))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def factor_label(mod):
+    """
+    因子模块对应的因子名 (load_factor 加载的模块去掉 factor_ 前缀)
+    """
+    name = getattr(mod, '__name__', 'factor')
+    return name[len('factor_'):] if name.startswith('factor_') else name
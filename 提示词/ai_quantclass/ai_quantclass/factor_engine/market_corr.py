@@ -0,0 +1,201 @@
+"""
+全市场与基准 (BTC) 的滚动相关系数 / beta
+
+CorrBTC 原来在每个币种的 DataFrame 里各算一遍 btc_close.pct_change()，再各做一次 pandas rolling corr，
+300 个币种就是 300 条相同的 BTC 收益率和 300 次滚动相关。这里基准收益率及其滚动矩 (Σy、Σy²)
+只计算一次，所有币种的 (T, S) 收益率矩阵用分块前缀和 (与 kernels.window_sum 相同的分块) 一次求出 Σx、Σx²、Σxy:
+
+    moments = MarketMoments(market_returns(btc_close), n)
+    corr = moments.corr(returns)       # (T, S)
+    beta = moments.beta(returns)
+
+语义与 pandas rolling(n, min_periods).corr 一致：只使用两边都有效的样本 (pairwise)，
+样本数不足或任一方窗口内方差为 0 时为 NaN。
+"""
+import numpy as np
+
+# 窗口内离差平方和相对于 Σx² 小于该比例时视为方差为 0 (消除前缀和相减的舍入噪声)
+_ZERO_VARIANCE = 1e-12
+
+
+def market_returns(close):
+    """
+    基准收益率 close.pct_change()，缺失值填 0 (与 CorrBTC.signal 中的指数涨跌幅一致)
+    """
+    close = np.asarray(close, dtype=np.float64)
+    ret = np.full_like(close, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret[1:] = close[1:] / close[:-1] - 1
+    ret[~np.isfinite(ret)] = 0.0
+    return ret
+
+
+def row_values(mat):
+    """
+    (T, S) 矩阵中每行第一个非 NaN 的值，用于从面板中取回各币种共用的基准序列 (如合并进来的 btc_close)
+    """
+    valid = ~np.isnan(mat)
+    first = valid.argmax(axis=1)
+    values = mat[np.arange(len(mat)), first]
+    values[~valid.any(axis=1)] = np.nan
+    return values
+
+
+def _blocks(v, n):
+    """
+    v 补齐到 n 的整数倍后按 n 行分块 (与 kernels.window_sum 相同的分块)，形状为 (块数, n, ...)
+    """
+    pad = (-len(v)) % n
+    if pad:
+        v = np.concatenate([v, np.zeros((pad,) + v.shape[1:], dtype=v.dtype)])
+    return v.reshape((-1, n) + v.shape[1:])
+
+
+def _split_sums(v):
+    """
+    分块数组的 (块内前缀和, 上一块落在窗口内的尾部和)，二者相加即长度为 n 的窗口和
+    """
+    local = np.cumsum(v, axis=1)
+    tail = np.empty_like(local)
+    tail[0] = 0.0
+    np.subtract(local[:-1, -1:], local[:-1], out=tail[1:])
+    return local, tail
+
+
+def _center(v, valid):
+    """
+    按块中心化：(减去块内有效样本均值的 v (无效处为 0), 块均值, 上一块均值 - 本块均值)，块均值形状为 (块数, 1, ...)
+    """
+    count = valid.sum(axis=1, keepdims=True)
+    total = np.where(valid, v, 0.0).sum(axis=1, keepdims=True)
+    center = np.divide(total, count, out=np.zeros(total.shape), where=count > 0)
+    shift = np.zeros_like(center)
+    shift[1:] = center[:-1] - center[1:]
+    return np.where(valid, v - center, 0.0), center, shift
+
+
+class MarketMoments:
+    """
+    基准收益率 y 的滚动矩，只计算一次，供所有币种共用
+
+    窗口矩以窗口末端所在块的均值为中心累加 (上一块的尾部按两块均值之差平移)，
+    窗口和不再含有均值带来的大数，协方差与方差相减时的抵消误差很小，误差在一致性校验的容差
+    (rtol 1e-7、atol 1e-9) 之内。
+
+    参数:
+        market_ret (np.ndarray): 基准收益率 (T,)，不含 NaN
+        n (int): 窗口长度
+        min_periods (int): 最少样本数
+    """
+
+    def __init__(self, market_ret, n, min_periods=1):
+        y = np.asarray(market_ret, dtype=np.float64)
+        if not np.isfinite(y).all():
+            raise ValueError("基准收益率中不能有 NaN/inf，请先用 market_returns 处理")
+        self.y = y
+        self.n = int(n)
+        self.min_periods = max(int(min_periods), 1)
+        self._y_valid = _blocks(np.ones(len(y), dtype=bool), self.n)
+        self._uy, self._cy, self._dy = _center(_blocks(y, self.n), self._y_valid)
+        # 币种全部有效时共用的样本数与 y 的窗口矩
+        self._count = _split_sums(self._y_valid.astype(np.float64))
+        self._sy = _split_sums(self._uy)
+        self._syy = _split_sums(self._uy * self._uy)
+
+    def _moments(self, x):
+        """
+        两边都有效的样本上的 (样本数, Σx, Σy, Σx², Σy², Σxy, x 与 y 判断方差为 0 的尺度)，
+        窗口矩相对窗口末端所在块的中心，形状为 (块数, n, ...)
+        """
+        extra = (1,) * (x.ndim - 1)
+        valid = np.isfinite(x)
+        if valid.all():
+            xb_valid = self._y_valid.reshape(self._y_valid.shape + extra)
+            uy = self._uy.reshape(self._uy.shape + extra)
+            count, sy, syy = ((local.reshape(local.shape + extra), tail.reshape(tail.shape + extra))
+                              for local, tail in (self._count, self._sy, self._syy))
+        else:
+            # 币种无效的格子不计入 y 的窗口矩
+            xb_valid = _blocks(valid, self.n)
+            uy = np.where(xb_valid, self._uy.reshape(self._uy.shape + extra), 0.0)
+            count = _split_sums(xb_valid.astype(np.float64))
+            sy = _split_sums(uy)
+            syy = _split_sums(uy * uy)
+        ux, cx, dx = _center(_blocks(x, self.n), xb_valid)
+        cy, dy = self._cy.reshape(self._cy.shape + extra), self._dy.reshape(self._dy.shape + extra)
+        sx, sxx, sxy = _split_sums(ux), _split_sums(ux * ux), _split_sums(ux * uy)
+
+        # 窗口 = 本块前缀 + 上一块尾部；尾部的 u 以上一块均值为中心，平移 d 后以本块均值为中心:
+        #   Σ(u + d) = Σu + d·k，Σ(u + d)² = Σu² + d·(2Σu + d·k)，Σ(ux + dx)(uy + dy) = Σux·uy + dx·Σuy + dy·Σux + dx·dy·k
+        k = count[1]
+        sxy_w = sxy[0] + sxy[1]
+        sxy_w += dx * sy[1]
+        sxy_w += dy * sx[1]
+        sxy_w += dx * dy * k
+        sxx_w = sxx[0] + sxx[1]
+        syy_w = syy[0] + syy[1]
+        # 各项非负部分之和 (≈ 未中心化的 Σx²)：常数窗口的方差只剩平移 d 的舍入误差，相对它判断是否为 0
+        count_w = np.rint(count[0] + k)
+        scale_x = dx * dx * k + count_w * cx * cx
+        scale_x += sxx_w
+        scale_y = syy_w + dy * dy * k + count_w * cy * cy
+        sxx_w += dx * (2 * sx[1] + dx * k)
+        syy_w += dy * (2 * sy[1] + dy * k)
+        sx_w = sx[0] + sx[1]
+        sx_w += dx * k
+        sy_w = sy[0] + sy[1] + dy * k
+        return count_w, sx_w, sy_w, sxx_w, syy_w, sxy_w, scale_x, scale_y
+
+    def _centered(self, returns):
+        """
+        (协方差, x 的方差, y 的方差, 样本不足) 各乘以样本数，形状为 (块数, n, ...)
+        """
+        x = np.asarray(returns, dtype=np.float64)
+        if len(x) != len(self.y):
+            raise ValueError(f"收益率行数 {len(x)} 与基准收益率长度 {len(self.y)} 不一致")
+        count, sx, sy, sxx, syy, sxy, scale_x, scale_y = self._moments(x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_x = sx / count
+            cov = sxy
+            cov -= mean_x * sy
+            var_x = sxx
+            var_x -= mean_x * sx
+            var_y = syy - sy * sy / count
+        var_x[var_x <= _ZERO_VARIANCE * scale_x] = 0.0
+        var_y[var_y <= _ZERO_VARIANCE * scale_y] = 0.0
+        too_few = count < max(self.min_periods, 2)
+        return cov, var_x, var_y, too_few
+
+    def _unblock(self, out, returns):
+        """
+        (块数, n, ...) 还原为与 returns 相同的行数
+        """
+        return out.reshape((-1,) + np.shape(returns)[1:])[:len(self.y)]
+
+    def corr(self, returns):
+        """
+        returns (T,) 或 (T, S) 与基准收益率的滚动相关系数
+        """
+        cov, var_x, var_y, too_few = self._centered(returns)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = cov / np.sqrt(var_x * var_y)
+        out[too_few | (var_x == 0) | (var_y == 0)] = np.nan
+        return self._unblock(np.clip(out, -1.0, 1.0, out=out), returns)
+
+    def beta(self, returns):
+        """
+        returns 对基准收益率的滚动回归系数 cov(x, y) / var(y)
+        """
+        cov, var_x, var_y, too_few = self._centered(returns)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = cov / var_y
+        out[too_few | (var_y == 0)] = np.nan
+        return self._unblock(out, returns)
+
+
+def rolling_corr(returns, market_ret, n, min_periods=1):
+    return MarketMoments(market_ret, n, min_periods).corr(returns)
+
+
+def rolling_beta(returns, market_ret, n, min_periods=1):
+    return MarketMoments(market_ret, n, min_periods).beta(returns)
@@ -0,0 +1,68 @@
+"""
+多参数因子计算：一次调用算出同一因子在多个 n 下的所有列
+
+提供 expr(n) 的因子把每个 n 的计算图放进同一张 FactorGraph，与 n 无关的中间序列 (收益率、换手率等)
+只计算一次；没有提供的因子退化为逐个 n 调用 signal()。
+结果以单个连续内存块构造 DataFrame (列优先布局，与 pandas 内部存储一致，不再复制)。
+
+按 factor_col_limit 分批计算，每批最多 factor_col_limit 列，控制峰值内存：
+
+    for block in iter_multi_signal('Volatility', df, range(5, 105, 5), factor_col_limit=config.factor_col_limit):
+        ...
+
+factor_col_limit 也可以是 autotune.AutoTuner (performance_mode = "AUTO")，此时每批之前按当前可用内存重新确定列数。
+"""
+import numpy as np
+import pandas as pd
+
+from factor_engine.graph import FactorGraph
+from factor_engine.harness import empty_block, factor_column
+from factor_engine.loader import factor_label, load_factor
+
+# 与 config.py 中 BAL (均衡) 模式一致，16G 内存的推荐配置
+DEFAULT_FACTOR_COL_LIMIT = 8
+
+
+def multi_signal(factor, df, n_list, factor_name=None):
+    """
+    计算因子在 n_list 中每个参数下的值
+
+    参数:
+        factor (str | module): 因子名或已加载的因子模块
+        df (pd.DataFrame): 单币种K线数据 (不会被修改)
+        n_list (list): 参数列表
+        factor_name (str): 列名前缀，默认为因子名；列名为 '<前缀>_<n>'
+
+    返回:
+        pd.DataFrame: 与 df 同索引，每个 n 一列 (单个连续内存块)
+    """
+    mod = load_factor(factor) if isinstance(factor, str) else factor
+    n_list = list(n_list)
+    prefix = factor_name or factor_label(mod)
+    columns = [f"{prefix}_{n}" for n in n_list]
+
+    block = empty_block(len(df), len(n_list))
+    if hasattr(mod, 'expr'):
+        graph = FactorGraph()
+        for n, col in zip(n_list, columns):
+            graph.add(mod, n, col)
+        values = graph.arrays(df)
+        for i, col in enumerate(columns):
+            block[:, i] = values[col]
+    else:
+        for i, (n, col) in enumerate(zip(n_list, columns)):
+            block[:, i] = factor_column(mod, df, n, col).to_numpy(dtype=np.float64)
+    return pd.DataFrame(block, index=df.index, columns=columns, copy=False)
+
+
+def iter_multi_signal(factor, df, n_list, factor_col_limit=DEFAULT_FACTOR_COL_LIMIT, factor_name=None):
+    """
+    按 factor_col_limit 分批计算多参数因子，每批产出一个最多 factor_col_limit 列的 DataFrame
+    """
+    n_list = list(n_list)
+    i = 0
+    while i < len(n_list):
+        limit = factor_col_limit.limit_for(len(df)) if hasattr(factor_col_limit, 'limit_for') else factor_col_limit
+        step = max(int(limit), 1)
+        yield multi_signal(factor, df, n_list[i:i + step], factor_name)
+        i += step
@@ -0,0 +1,183 @@
+"""
+面板 (时间 × 币种) 因子计算
+
+每个字段 (close、volume、quote_volume ...) 存成一个 (T, S) 的二维矩阵，行是对齐后的时间轴，
+列是币种，某币种在某时刻没有K线时为 NaN。提供 expr(n) 的因子直接在整个矩阵上求值其计算图
+(需要面板专用算法的因子可以另外提供 panel_signal(panel, n))；两者都没有的因子通过 evaluate() 的适配器
+逐币种调用原来的 signal()。
+
+    panel = Panel.from_long(all_candle_df)
+    values = evaluate('Volume', panel, 20)     # (T, S) 因子矩阵
+    factor_df = panel.to_long(values, 'Volume_20')
+
+滚动窗口按面板的行计数：上市前 / 下架后的 NaN 行不影响结果 (与逐币种计算一致)，
+但币种中途缺失的K线会被当作 NaN 样本占据窗口位置，而逐币种计算会把前后K线视为相邻。
+"""
+import numpy as np
+import pandas as pd
+
+from factor_engine import kernels
+from factor_engine.loader import factor_label, load_factor
+
+
+class Panel:
+    """
+    对齐到同一时间轴的多币种行情
+
+    参数:
+        index (pd.DatetimeIndex): 时间轴 (升序)
+        symbols (list): 币种列表，与矩阵的列一一对应
+        fields (dict): 字段名 -> (T, S) 矩阵；数值字段为 float64，其余为 object
+        attrs (dict): 数据加载时附加的元数据 (如 listing.attach_listing_index 的上市时间索引)，
+                      与 DataFrame.attrs 相同，from_long 从长表继承，symbol_frame 传给单币种 DataFrame
+    """
+
+    def __init__(self, index, symbols, fields, time_col='candle_begin_time', symbol_col='symbol', attrs=None):
+        self.index = index
+        self.symbols = list(symbols)
+        self.fields = fields
+        self.time_col = time_col
+        self.symbol_col = symbol_col
+        self.attrs = dict(attrs or {})
+
+    @classmethod
+    def from_long(cls, df, fields=None, time_col='candle_begin_time', symbol_col='symbol'):
+        """
+        由长表 (每行一根K线，含时间列与币种列) 构建面板
+        """
+        time_codes, times = pd.factorize(df[time_col], sort=True)
+        symbol_codes, symbols = pd.factorize(df[symbol_col], sort=True)
+        shape = (len(times), len(symbols))
+        if fields is None:
+            fields = [col for col in df.columns if col not in (time_col, symbol_col)]
+
+        matrices = {}
+        for col in fields:
+            values = df[col].to_numpy()
+            if values.dtype.kind in 'biuf':
+                mat = np.full(shape, np.nan)
+            else:
+                mat = np.full(shape, None, dtype=object)
+            mat[time_codes, symbol_codes] = values
+            matrices[col] = mat
+        return cls(pd.DatetimeIndex(times, name=time_col), list(symbols), matrices, time_col, symbol_col, df.attrs)
+
+    @classmethod
+    def from_frames(cls, frames, fields=None, time_col='candle_begin_time', symbol_col='symbol'):
+        """
+        由 {symbol: 单币种 DataFrame} 构建面板
+        """
+        long_df = pd.concat([df.assign(**{symbol_col: symbol}) for symbol, df in frames.items()], ignore_index=True)
+        return cls.from_long(long_df, fields, time_col, symbol_col)
+
+    @property
+    def shape(self):
+        return len(self.index), len(self.symbols)
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def listed(self, field='close'):
+        """
+        (T, S) 布尔矩阵：该币种在该时刻是否有K线
+        """
+        values = self.fields[field]
+        return ~pd.isna(values) if values.dtype == object else ~np.isnan(values)
+
+    def symbol_frame(self, j, mask=None):
+        """
+        还原第 j 个币种的单币种 DataFrame (只包含有K线的行，RangeIndex)
+        """
+        rows = np.flatnonzero(self.listed()[:, j] if mask is None else mask[:, j])
+        data = {self.time_col: self.index[rows]}
+        data.update({name: values[rows, j] for name, values in self.fields.items()})
+        df = pd.DataFrame(data)
+        df[self.symbol_col] = self.symbols[j]
+        df.attrs.update(self.attrs)
+        return df, rows
+
+    def to_long(self, values, name):
+        """
+        将 (T, S) 因子矩阵还原成长表 (只保留有K线的行)
+        """
+        t, s = np.nonzero(self.listed())
+        return pd.DataFrame({
+            self.time_col: self.index[t],
+            self.symbol_col: np.asarray(self.symbols, dtype=object)[s],
+            name: values[t, s],
+        })
+
+
+# ====== 面板滚动算子：按列 (币种) 滚动，所有币种一次完成 ======
+def _frame(a):
+    return pd.DataFrame(a, copy=False)
+
+
+shift = kernels.shift
+
+
+def pct_change(a, n=1):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return a / shift(a, n) - 1
+
+
+def rolling_sum(a, n, min_periods=1):
+    return _frame(a).rolling(n, min_periods=min_periods).sum().to_numpy()
+
+
+def rolling_mean(a, n, min_periods=1):
+    return _frame(a).rolling(n, min_periods=min_periods).mean().to_numpy()
+
+
+def rolling_std(a, n, min_periods=1):
+    return _frame(a).rolling(n, min_periods=min_periods).std().to_numpy()
+
+
+def rolling_corr(a, b, n, min_periods=1):
+    return _frame(a).rolling(n, min_periods=min_periods).corr(_frame(b)).to_numpy()
+
+
+def fill_finite(a, value=0.0):
+    """
+    面板版 replace([inf, -inf], nan).fillna(0)
+    """
+    return np.where(np.isfinite(a), a, value)
+
+
+def evaluate(factor, panel, n, factor_name=None):
+    """
+    在面板上计算因子，返回 (T, S) 矩阵
+
+    因子模块提供 panel_signal(panel, n) (面板专用的算法) 时直接调用；提供 expr(n) 时在矩阵上求值其计算图；
+    否则逐币种调用 signal(df, n, factor_name) 并把结果写回矩阵 (适配器路径，结果与原有逐币种流程一致)。
+    无K线的位置为 NaN。
+
+    参数:
+        factor (str | module): 因子名 (factors/ 或 ref_factors/ 中的文件名) 或已加载的因子模块
+        panel (Panel): 面板数据
+        n: 因子参数
+        factor_name (str): 逐币种路径下的因子列名，默认为 '<因子名>_<n>'
+    """
+    mod = load_factor(factor) if isinstance(factor, str) else factor
+    listed = panel.listed()
+    if hasattr(mod, 'panel_signal'):
+        values = np.asarray(mod.panel_signal(panel, n), dtype=np.float64)
+        return np.where(listed, values, np.nan)
+    if hasattr(mod, 'expr'):
+        from factor_engine.graph import FactorGraph
+
+        graph = FactorGraph()
+        graph.add(mod, n, 'factor')
+        return graph.arrays(panel)['factor']
+
+    factor_name = factor_name or f"{factor_label(mod)}_{n}"
+    out = np.full(panel.shape, np.nan)
+    for j in range(len(panel.symbols)):
+        df, rows = panel.symbol_frame(j, listed)
+        if len(rows) == 0:
+            continue
+        out[rows, j] = mod.signal(df, n, factor_name)[factor_name].to_numpy(dtype=np.float64)
+    return out
@@ -0,0 +1,124 @@
+"""
+滚动窗口绩效指标：累计收益、年化波动率、夏普、索提诺、最大回撤，一次调用算完所有窗口
+
+策略分析脚本 (策略_coin/strategy_analysis*.py) 原来逐个窗口 iloc[i-12:i] 切片后做 prod/std/cumprod/cummax，
+窗口数一多 (小时级资金曲线上几万个窗口) 就很慢。这里:
+    - 累计收益、均值、标准差、下行偏差都是窗口和，用 kernels.window_sum (分块前缀和) 整列一次算出
+      (累计收益 = exp(窗口内 log(1 + r) 之和) - 1；方差先减去全样本均值再求和，避免大数相消)
+    - 最大回撤与顺序有关，不能拆成窗口和：对对数净值取步长视图 (sliding_window_view，不复制数据)，
+      按块做 maximum.accumulate，块大小按 CHUNK_ELEMENTS 控制内存
+
+    metrics = rolling_metrics(df['涨跌幅'], window=12, periods_per_year=12)
+    metrics = rolling_metrics(df_curve['涨跌幅'], window=24 * 30, periods_per_year=PERIODS_PER_YEAR['H'])
+
+与原循环的对应关系：标准差为样本标准差 (ddof=1)，夏普 = 均值 × 年化周期数 / (标准差 × sqrt(年化周期数))，
+标准差为 0 时夏普为 0；最大回撤只看窗口内的净值点 (窗口第一期的亏损不计入回撤)。
+索提诺的下行偏差为 sqrt(mean(min(r, 0)²))，窗口内没有亏损时索提诺为 NaN。
+收益率中的 NaN 与原循环 (pandas 的 prod/mean/std/cummax 默认 skipna) 一样跳过：不计入累计收益与回撤，
+均值、标准差按窗口内的有效期数计算 (有效期数不足 2 时标准差为 NaN、夏普为 0)。
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from factor_engine.kernels import window_sum
+
+# 币圈 7×24 小时交易，按自然日折算
+PERIODS_PER_YEAR = {'H': 24 * 365, 'D': 365, 'W': 52, 'M': 12, 'Q': 4, 'Y': 1}
+# 最大回撤每块处理的元素个数 (窗口数 × 窗口长度)
+CHUNK_ELEMENTS = 1 << 22
+METRIC_COLUMNS = ['累计收益', '年化波动率', '夏普比率', '索提诺比率', '最大回撤']
+
+
+def _returns_array(returns):
+    values = np.asarray(returns, dtype=np.float64)
+    if values.ndim != 1:
+        raise ValueError("收益率需要是一维序列")
+    if np.isinf(values).any():
+        raise ValueError("收益率序列中不能有 inf")
+    if (values <= -1).any():
+        raise ValueError("收益率必须大于 -100% (净值需要保持为正)")
+    return values
+
+
+def rolling_return(returns, window):
+    """
+    窗口内的累计收益 prod(1 + r) - 1 (跳过 NaN)，前 window - 1 期为 NaN
+    """
+    values = _returns_array(returns)
+    out = np.expm1(window_sum(np.log1p(np.nan_to_num(values, nan=0.0)), window))
+    out[:window - 1] = np.nan
+    return out
+
+
+def rolling_max_drawdown(returns, window):
+    """
+    窗口内净值的最大回撤 (<= 0，跳过 NaN)，前 window - 1 期为 NaN，窗口内全是 NaN 时也为 NaN
+    """
+    values = _returns_array(returns)
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    missing = np.isnan(values)
+    log_nav = np.cumsum(np.log1p(np.where(missing, 0.0, values)))
+    # NaN 所在的期既不能作为高点也不能作为低点 (与 cumprod/cummax/min 跳过 NaN 一致)
+    peaks = sliding_window_view(np.where(missing, -np.inf, log_nav), window)  # (窗口数, window)，只是视图
+    troughs = sliding_window_view(np.where(missing, np.inf, log_nav), window)
+    chunk = max(CHUNK_ELEMENTS // window, 1)
+    for start in range(0, len(peaks), chunk):
+        drawdown = (troughs[start:start + chunk] - np.maximum.accumulate(peaks[start:start + chunk], axis=1)).min(axis=1)
+        out[window - 1 + start:window - 1 + start + len(drawdown)] = drawdown
+    out[np.isinf(out)] = np.nan  # 窗口内全是 NaN
+    return np.expm1(out)
+
+
+def rolling_metrics(returns, window, periods_per_year=12):
+    """
+    滚动窗口绩效指标
+
+    参数:
+        returns (pd.Series | np.ndarray): 每期收益率 (小数，如 0.05 表示 5%)
+        window (int): 窗口长度 (期数)
+        periods_per_year (float | str): 每年期数，或 PERIODS_PER_YEAR 中的频率 ('H', 'D', 'W', 'M', 'Q', 'Y')
+
+    返回:
+        pd.DataFrame: 列为 METRIC_COLUMNS，索引与 returns 一致 (ndarray 时为 RangeIndex)，前 window - 1 行为 NaN
+    """
+    window = int(window)
+    if window < 2:
+        raise ValueError(f"窗口长度至少为 2：{window}")
+    if isinstance(periods_per_year, str):
+        periods_per_year = PERIODS_PER_YEAR[periods_per_year]
+    values = _returns_array(returns)
+    index = returns.index if isinstance(returns, pd.Series) else None
+
+    # NaN 按 0 参与窗口和，再除以窗口内的有效期数
+    missing = np.isnan(values)
+    center = values[~missing].mean() if (~missing).any() else 0.0
+    centered = np.where(missing, 0.0, values - center)
+    count = window_sum((~missing).astype(np.float64), window)
+    s1 = window_sum(centered, window)
+    s2 = window_sum(centered * centered, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = s1 / count + center
+        var = (s2 - s1 * s1 / count) / (count - 1)
+        # 常数窗口的方差只剩舍入误差，按 0 处理
+        var[var <= 8 * np.finfo(np.float64).eps * s2 / (count - 1)] = 0.0
+        var[count < 2] = np.nan
+        std = np.sqrt(var)
+        downside = np.sqrt(window_sum(np.where(missing, 0.0, np.minimum(values, 0.0)) ** 2, window) / count)
+
+    scale = np.sqrt(periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean * periods_per_year / (std * scale), 0.0)
+        sortino = np.where(downside > 0, mean * periods_per_year / (downside * scale), np.nan)
+
+    result = pd.DataFrame({
+        '累计收益': rolling_return(values, window),
+        '年化波动率': std * scale,
+        '夏普比率': sharpe,
+        '索提诺比率': sortino,
+        '最大回撤': rolling_max_drawdown(values, window),
+    }, index=index)
+    result.iloc[:window - 1] = np.nan  # 部分窗口
+    return result
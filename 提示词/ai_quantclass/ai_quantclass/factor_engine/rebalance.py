@@ -0,0 +1,148 @@
+"""
+多 offset 调仓：选股结果每个交易日只算一次，各 offset 的持仓通过下标索引得到
+
+strategy_list 中 hold_period='W'、offset_list=[0, 1, 2, 3, 4] 的策略会拆成 W_0 ~ W_4 五个子组合，
+分别在不同的交易日调仓 (分批进场仓位#*.csv 中的 W_*调仓点 列)。某个交易日的因子排名与 offset 无关，
+所以选股只需要对每个交易日做一次 (selection.top_k 得到 (T, k) 的列下标)，
+各 offset 在第 t 天的持仓就是它最近一次调仓日 (<= t) 的选股结果:
+
+    position_df = pd.read_csv('分批进场仓位#0.小市值_基本面优化1.csv', encoding='utf-8-sig')
+    calendar = calendar_from_positions(position_df, dates=dates)    # (T, 5) 布尔矩阵，框架的精确调仓日
+    holdings = offset_holdings(cols, calendar)                     # (5, T, k) 列下标
+    weights = combined_weights(holdings, dates, codes)              # 长表：日期、股票代码、目标资金占比
+
+调仓日历应当来自框架：calendar_from_positions 读取框架输出的调仓点，或者 calendar_from_dates 传入
+按框架交易日历算好的各 offset 调仓日。approximate_calendar 只按周/月边界推算，节假日前后与框架不一致
+(在附带的 分批进场仓位 表上约 10% 的交易日至少有一个 offset 不同)，只用于没有框架输出的模拟数据。
+
+计算量只与交易日数量有关，不随 offset 数量成倍增加。
+"""
+import numpy as np
+import pandas as pd
+
+_PERIOD_FREQ = {'W': 'W', 'M': 'M'}
+
+
+def calendar_from_positions(position_df, offset_names=None, dates=None, date_col='选股日期'):
+    """
+    由框架输出的 分批进场仓位 表中的 '<offset>调仓点' 列 (如 W_0调仓点) 读取调仓日历 (与框架完全一致)
+
+    参数:
+        position_df (pd.DataFrame): 分批进场仓位 表
+        offset_names (list): offset 名，如 ['W_0', 'W_1']，默认为表中全部 '*调仓点' 列
+        dates: 交易日 (升序)，给出时按 date_col 对齐到这些日期 (表中没有的日期不调仓)
+
+    返回:
+        np.ndarray: (T, len(offset_names)) 布尔矩阵
+    """
+    if offset_names is None:
+        offset_names = [col[:-len('调仓点')] for col in position_df.columns if col.endswith('调仓点')]
+    calendar = np.column_stack([position_df[f"{name}调仓点"].to_numpy() == 1 for name in offset_names])
+    if dates is None:
+        return calendar
+    rows = pd.DatetimeIndex(pd.to_datetime(position_df[date_col])).get_indexer(pd.DatetimeIndex(dates))
+    aligned = np.zeros((len(rows), calendar.shape[1]), dtype=bool)
+    aligned[rows >= 0] = calendar[rows[rows >= 0]]
+    return aligned
+
+
+def calendar_from_dates(dates, rebalance_dates):
+    """
+    由各 offset 的调仓日 (按框架的交易日历算好) 生成调仓日历
+
+    参数:
+        dates: 交易日 (升序)
+        rebalance_dates (list): 每个 offset 一组调仓日
+
+    返回:
+        np.ndarray: (T, len(rebalance_dates)) 布尔矩阵
+    """
+    dates = pd.DatetimeIndex(dates)
+    return np.column_stack([dates.isin(pd.DatetimeIndex(days)) for days in rebalance_dates])
+
+
+def approximate_calendar(dates, hold_period='W', offset_list=(0,)):
+    """
+    近似的调仓日历：offset=o 的子组合在每个周期 (周/月) 最后一个交易日之后的第 o 个交易日调仓
+
+    只按 dates 推算，节假日前后与框架的调仓日不一致，有框架输出时使用 calendar_from_positions
+
+    参数:
+        dates: 交易日 (升序)
+        hold_period (str): 'W' 或 'M'
+        offset_list (list): offset 列表
+
+    返回:
+        np.ndarray: (T, len(offset_list)) 布尔矩阵
+    """
+    if hold_period not in _PERIOD_FREQ:
+        raise ValueError(f"不支持的持仓周期：{hold_period}")
+    dates = pd.DatetimeIndex(dates)
+    periods = dates.to_period(_PERIOD_FREQ[hold_period]).asi8
+    period_end = np.flatnonzero(np.r_[periods[1:] != periods[:-1], True])
+    calendar = np.zeros((len(dates), len(offset_list)), dtype=bool)
+    for j, offset in enumerate(offset_list):
+        days = period_end + int(offset)
+        calendar[days[days < len(dates)], j] = True
+    return calendar
+
+
+def last_rebalance(calendar):
+    """
+    (T, O) 调仓日历 -> 每个 offset 在第 t 天生效的调仓日下标，首次调仓之前为 -1
+    """
+    index = np.where(calendar, np.arange(len(calendar))[:, None], -1)
+    return np.maximum.accumulate(index, axis=0)
+
+
+def offset_holdings(cols, calendar):
+    """
+    各 offset 每天的持仓 (列下标)
+
+    参数:
+        cols (np.ndarray): (T, k) 每个交易日的选股结果 (selection.top_k)，-1 表示空位
+        calendar (np.ndarray): (T, O) 调仓日历
+
+    返回:
+        np.ndarray: (O, T, k)，首次调仓之前为 -1
+    """
+    cols = np.asarray(cols)
+    source = last_rebalance(np.asarray(calendar, dtype=bool)).T  # (O, T)
+    holdings = cols[np.clip(source, 0, None)]
+    holdings[source < 0] = -1
+    return holdings
+
+
+def combined_weights(holdings, dates=None, codes=None, offset_weights=None):
+    """
+    把各 offset 的持仓合并为每天每只股票的目标资金占比 (每个 offset 内等权，offset 之间按 offset_weights)
+
+    参数:
+        holdings (np.ndarray): (O, T, k) offset_holdings 的结果
+        offset_weights (list): 各 offset 的资金占比，默认平均分配
+
+    返回:
+        pd.DataFrame: 交易日下标 (或 dates 给出时为 交易日期)、列下标 (或 股票代码)、目标资金占比
+    """
+    n_offsets, n_days, k = holdings.shape
+    if offset_weights is None:
+        offset_weights = np.full(n_offsets, 1.0 / n_offsets)
+    offset_weights = np.asarray(offset_weights, dtype=np.float64)
+    filled = holdings >= 0
+    per_stock = offset_weights[:, None] / np.maximum(filled.sum(axis=2), 1)  # (O, T)
+
+    # 同一天同一只股票可能被多个 offset 持有：按 (日, 列) 合并
+    o, t, j = np.nonzero(filled)
+    width = int(holdings.max(initial=0)) + 1
+    keys = t * width + holdings[o, t, j]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    weight = np.bincount(inverse, weights=per_stock[o, t])
+    day, col = unique // width, unique % width
+
+    day_values = np.asarray(dates)[day] if dates is not None else day
+    col_values = np.asarray(codes, dtype=object)[col] if codes is not None else col
+    return pd.DataFrame({
+        '交易日期' if dates is not None else '交易日': day_values,
+        '股票代码' if codes is not None else '列': col_values,
+        '目标资金占比': weight,
+    })
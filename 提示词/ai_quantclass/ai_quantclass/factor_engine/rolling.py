@@ -0,0 +1,320 @@
+"""
+增量滚动窗口算子
+
+每个算子都维护窗口内的累计状态，新增一根K线的更新代价为 O(1) (最大/最小值为均摊 O(1))，
+语义与 pandas 的 rolling(n, min_periods=...) 一致：NaN 与 ±inf 都视为缺失值 (pandas 在滚动计算前会把 inf
+替换为 NaN)，不计入样本数，样本数不足 min_periods 时输出 NaN。
+
+    mean = RollingMean(20, min_periods=1)
+    value = mean.update(x)              # 流式：逐根K线推进
+
+整段数据的滚动计算使用 factor_engine.kernels (分块前缀和，整列一次完成)，这里只负责逐根推进。
+
+因子的增量计算由其 expr(n) 派生：update = stream(mod.expr(20))，见文件末尾的 stream()。
+"""
+import math
+from collections import deque
+
+
+def finite_or_zero(x):
+    """
+    与因子文件中 replace([inf, -inf], nan).fillna(0) 相同的收尾处理 (标量版)
+    """
+    return x if x == x and not math.isinf(x) else 0.0
+
+
+def safe_div(a, b):
+    """
+    标量除法，除数为 0 时与 NumPy/pandas 一致返回 inf / -inf / NaN 而不是抛异常
+    """
+    if b == 0:
+        return float('nan') if a == 0 or a != a else math.copysign(float('inf'), a) * math.copysign(1, b)
+    return a / b
+
+
+class _Rolling:
+    """
+    滚动算子基类：维护长度为 n 的原始值窗口，子类实现 _add / _remove / _value
+    """
+
+    def __init__(self, n, min_periods=None):
+        self.n = int(n)
+        self.min_periods = self.n if min_periods is None else int(min_periods)
+        self.window = deque()
+        self.count = 0  # 窗口内有效 (有限值) 样本数
+
+    def update(self, x):
+        x = float('nan') if x is None else float(x)
+        self.window.append(x)
+        if math.isfinite(x):
+            self.count += 1
+            self._add(x)
+        if len(self.window) > self.n:
+            old = self.window.popleft()
+            if math.isfinite(old):
+                self.count -= 1
+                self._remove(old)
+        if self.count < max(self.min_periods, 1):
+            return float('nan')
+        return self._value()
+
+
+class RollingSum(_Rolling):
+    """
+    滚动求和 (Kahan 补偿，长时间运行不累积误差)
+    """
+
+    def __init__(self, n, min_periods=None):
+        super().__init__(n, min_periods)
+        self._sum = 0.0
+        self._comp = 0.0
+
+    def _add(self, x):
+        y = x - self._comp
+        t = self._sum + y
+        self._comp = (t - self._sum) - y
+        self._sum = t
+
+    def _remove(self, x):
+        self._add(-x)
+
+    def _value(self):
+        return self._sum
+
+
+class RollingMean(RollingSum):
+    """
+    滚动均值
+    """
+
+    def _value(self):
+        return self._sum / self.count
+
+
+class RollingStd(_Rolling):
+    """
+    滚动标准差 (Welford 增删，默认 ddof=1 与 pandas 一致)
+    """
+
+    def __init__(self, n, min_periods=None, ddof=1):
+        super().__init__(n, min_periods)
+        self.ddof = ddof
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def _add(self, x):
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+
+    def _remove(self, x):
+        if self.count == 0:
+            self._mean = self._m2 = 0.0
+            return
+        delta = x - self._mean
+        self._mean -= delta / self.count
+        self._m2 -= delta * (x - self._mean)
+
+    def _value(self):
+        if self.count <= self.ddof:
+            return float('nan')
+        return math.sqrt(max(self._m2, 0.0) / (self.count - self.ddof))
+
+
+class RollingCorr:
+    """
+    两个序列的滚动相关系数
+
+    与 pandas 一致：只使用两边都是有限值的样本对，样本数不足或方差为 0 时分别输出 NaN / inf。
+    协方差与方差均用 Welford 形式增删，避免 sum(x*y) - sum(x)*sum(y)/n 的精度问题。
+    """
+
+    def __init__(self, n, min_periods=None):
+        self.n = int(n)
+        self.min_periods = self.n if min_periods is None else int(min_periods)
+        self.window = deque()
+        self.count = 0
+        self._mx = self._my = 0.0
+        self._m2x = self._m2y = self._cxy = 0.0
+
+    def _add(self, x, y):
+        self.count += 1
+        dx = x - self._mx
+        self._mx += dx / self.count
+        dy = y - self._my
+        self._my += dy / self.count
+        self._m2x += dx * (x - self._mx)
+        self._m2y += dy * (y - self._my)
+        self._cxy += dx * (y - self._my)
+
+    def _remove(self, x, y):
+        self.count -= 1
+        if self.count == 0:
+            self._mx = self._my = self._m2x = self._m2y = self._cxy = 0.0
+            return
+        mx_old, my_old = self._mx, self._my
+        self._mx = (mx_old * (self.count + 1) - x) / self.count
+        self._my = (my_old * (self.count + 1) - y) / self.count
+        self._m2x -= (x - self._mx) * (x - mx_old)
+        self._m2y -= (y - self._my) * (y - my_old)
+        self._cxy -= (x - self._mx) * (y - my_old)
+
+    def update(self, x, y):
+        x = float('nan') if x is None else float(x)
+        y = float('nan') if y is None else float(y)
+        valid = math.isfinite(x) and math.isfinite(y)
+        self.window.append((x, y, valid))
+        if valid:
+            self._add(x, y)
+        if len(self.window) > self.n:
+            ox, oy, old_valid = self.window.popleft()
+            if old_valid:
+                self._remove(ox, oy)
+        if self.count < max(self.min_periods, 2):
+            return float('nan')
+        denom = math.sqrt(max(self._m2x, 0.0) * max(self._m2y, 0.0))
+        if denom == 0:
+            return float('nan') if self._cxy == 0 else math.copysign(float('inf'), self._cxy)
+        return self._cxy / denom
+
+
+class RollingMax(_Rolling):
+    """
+    滚动最大值 (单调队列，均摊 O(1))
+    """
+
+    _better = staticmethod(lambda a, b: a >= b)
+
+    def __init__(self, n, min_periods=None):
+        super().__init__(n, min_periods)
+        self._pos = 0  # 下一根K线的序号
+        self._deque = deque()  # (序号, 值)，值单调
+
+    def update(self, x):
+        pos = self._pos
+        self._pos += 1
+        x_f = float('nan') if x is None else float(x)
+        if math.isfinite(x_f):
+            while self._deque and self._better(x_f, self._deque[-1][1]):
+                self._deque.pop()
+            self._deque.append((pos, x_f))
+        while self._deque and self._deque[0][0] <= pos - self.n:
+            self._deque.popleft()
+        return super().update(x_f)
+
+    def _add(self, x):
+        pass
+
+    def _remove(self, x):
+        pass
+
+    def _value(self):
+        return self._deque[0][1]
+
+
+class RollingMin(RollingMax):
+    """
+    滚动最小值 (单调队列，均摊 O(1))
+    """
+
+    _better = staticmethod(lambda a, b: a <= b)
+
+
+class PctChange:
+    """
+    流式 pct_change(1)：首根K线为 NaN
+    """
+
+    def __init__(self):
+        self.prev = float('nan')
+
+    def update(self, x):
+        x = float('nan') if x is None else float(x)
+        prev, self.prev = self.prev, x
+        if prev != prev or x != x:
+            return float('nan')
+        if prev == 0:
+            return float('nan') if x == 0 else math.copysign(float('inf'), x)
+        return x / prev - 1
+
+
+class _Shift:
+    """
+    流式 shift(n)：输出 n 根K线之前的值，不足 n 根时为 NaN
+    """
+
+    def __init__(self, n):
+        self.n = int(n)
+        self.window = deque()
+
+    def update(self, x):
+        self.window.append(x)
+        if len(self.window) > self.n:
+            return self.window.popleft()
+        return float('nan')
+
+
+_SCALAR_OPS = {
+    'add': lambda a, b: a + b,
+    'sub': lambda a, b: a - b,
+    'mul': lambda a, b: a * b,
+    'div': safe_div,
+    'neg': lambda a: -a,
+    'gt': lambda a, b: float(a > b),
+    'lt': lambda a, b: float(a < b),
+    'ge': lambda a, b: float(a >= b),
+    'where': lambda c, a, b: a if c != 0 else b,
+    'fillna': lambda a, value: value if a != a else a,
+    'fill_finite': finite_or_zero,
+}
+_ROLLING_OPS = {'rolling_sum': RollingSum, 'rolling_mean': RollingMean, 'rolling_std': RollingStd,
+                'rolling_corr': RollingCorr}
+
+
+def _scalar_step(node):
+    """
+    单个节点的标量求值函数 step(candle, values) -> 该节点的当前值
+    """
+    from factor_engine.graph import Node
+
+    op, args = node.op, node.args
+    if op == 'field':
+        name = args[0]
+        return lambda candle, values: float('nan') if candle[name] is None else float(candle[name])
+    if op == 'const':
+        value = args[0]
+        return lambda candle, values: value
+    if op == 'shift':
+        state, key = _Shift(args[1]), args[0].key
+        return lambda candle, values: state.update(values[key])
+    if op in _ROLLING_OPS:
+        inputs = [arg.key for arg in args if isinstance(arg, Node)]
+        update = _ROLLING_OPS[op](*args[len(inputs):]).update
+        return lambda candle, values: update(*[values[key] for key in inputs])
+    if op in _SCALAR_OPS:
+        func = _SCALAR_OPS[op]
+        refs = [(True, arg.key) if isinstance(arg, Node) else (False, arg) for arg in args]
+        return lambda candle, values: func(*[values[ref] if is_node else ref for is_node, ref in refs])
+    raise ValueError(f"算子 {op} 无法增量计算 (因子需要提供 expr 才能流式计算)")
+
+
+def stream(node):
+    """
+    由计算图节点 (因子的 expr(n)) 构造增量计算函数，与整列求值的结果一致
+
+        update = stream(load_factor('Volatility').expr(20))
+        value = update(candle)          # candle 为一根K线 (字段名 -> 值)，每根K线 O(1)
+
+    每个唯一节点对应一个标量状态机：滚动算子为本模块的 Rolling*，shift 为长度 n 的队列，其余为标量运算
+    """
+    from factor_engine.graph import topological_order
+
+    steps = [(item.key, _scalar_step(item)) for item in topological_order([node])]
+    output = node.key
+
+    def update(candle):
+        values = {}
+        for key, step in steps:
+            values[key] = step(candle, values)
+        return values[output]
+    return update
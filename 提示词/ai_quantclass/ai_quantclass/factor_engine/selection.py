@@ -0,0 +1,156 @@
+"""
+截面选股：在 (日期 × 股票) 矩阵上计算复合因子，并用部分选择 (argpartition) 取出每个日期的前 select_num 只
+
+strategy_list 中的 factor_list 形如 [['市值', True, '', 1], ['归母净利润同比增速', False, 60, 1]]，
+每一项为 [因子名, 是否升序 (True 表示越小越好), 参数, 权重]。原流程对长表逐个因子做 groupby('交易日期').rank()，
+再对复合因子整体排名后取前 select_num，而每个日期真正需要的只是前 5 只。
+
+这里所有因子都是 (T, N) 矩阵：
+    - rank_matrix 按行一次性排名 (一次 argsort，不经过 groupby)
+    - composite_score 为各因子排名的加权和
+    - top_k 先用 np.argpartition 找到第 k 小的分数，只对这 k 只股票排序
+
+    score = composite_score({'市值_': cap, '归母净利润同比增速_60': growth}, factor_list, mask=tradable)
+    cols = top_k(score, 5)                        # (T, 5) 列下标，不足 5 只的位置为 -1
+    result = selection_frame(dates, codes, cols, score)
+
+与 pandas 的对应关系：因子排名为 rank(method='min')，复合因子排名为 rank(method='first')
+(分数相同时列在前面的股票优先)，NaN 不参与排名。
+"""
+import numpy as np
+import pandas as pd
+
+
+def factor_col_name(name, param):
+    """
+    factor_list 中的一项对应的因子列名，如 ('归母净利润同比增速', 60) -> '归母净利润同比增速_60'
+    """
+    return f"{name}_{param}"
+
+
+def rank_matrix(values, ascending=True, method='min'):
+    """
+    按行 (每个日期) 对各列排名，NaN 保持为 NaN
+
+    参数:
+        values (np.ndarray): (T, N) 矩阵
+        ascending (bool): True 表示数值越小排名越靠前
+        method (str): 'min' | 'first' | 'average'，与 pandas rank 的同名参数一致
+
+    返回:
+        np.ndarray: (T, N) float64 排名 (从 1 开始)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2:
+        raise ValueError("rank_matrix 需要 (日期 × 股票) 的二维矩阵")
+    valid = ~np.isnan(values)
+    key = values if ascending else -values
+    order = np.argsort(key, axis=1, kind='stable')  # NaN 排在最后
+    sorted_key = np.take_along_axis(key, order, axis=1)
+    positions = np.broadcast_to(np.arange(values.shape[1], dtype=np.float64), values.shape)
+
+    if method == 'first':
+        sorted_rank = positions + 1
+    elif method in ('min', 'average'):
+        new_group = np.ones(values.shape, dtype=bool)
+        new_group[:, 1:] = sorted_key[:, 1:] != sorted_key[:, :-1]
+        start = np.maximum.accumulate(np.where(new_group, positions, 0), axis=1)
+        sorted_rank = start + 1
+        if method == 'average':
+            # 每组的最后一个位置：从右往左找下一组的起点
+            last = np.ones(values.shape, dtype=bool)
+            last[:, :-1] = new_group[:, 1:]
+            end = np.minimum.accumulate(np.where(last, positions, np.inf)[:, ::-1], axis=1)[:, ::-1]
+            sorted_rank = (start + end) / 2 + 1
+    else:
+        raise ValueError(f"不支持的排名方式：{method}")
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, sorted_rank, axis=1)
+    ranks[~valid] = np.nan
+    return ranks
+
+
+def composite_score(factors, factor_list, mask=None, method='min'):
+    """
+    复合因子：各因子按行排名后的加权和
+
+    参数:
+        factors (dict): 因子列名 (见 factor_col_name) -> (T, N) 矩阵
+        factor_list (list): [[因子名, 是否升序, 参数, 权重], ...]
+        mask (np.ndarray): (T, N) 布尔矩阵，False 的股票不参与排名 (过滤条件、停牌等)
+        method (str): 因子排名方式
+
+    返回:
+        np.ndarray: (T, N) 复合因子，任一因子缺失或被 mask 排除时为 NaN，越小越好
+    """
+    score = None
+    for name, ascending, param, weight in factor_list:
+        values = np.asarray(factors[factor_col_name(name, param)], dtype=np.float64)
+        if mask is not None:
+            values = np.where(mask, values, np.nan)
+        ranks = rank_matrix(values, ascending, method)
+        ranks *= weight
+        score = ranks if score is None else np.add(score, ranks, out=score)
+    if score is None:
+        raise ValueError("factor_list 不能为空")
+    return score
+
+
+def top_k(score, k):
+    """
+    每行分数最小的 k 列 (按分数升序，分数相同时列下标小的优先)，NaN 不会被选中
+
+    返回:
+        np.ndarray: (T, k) int64 列下标，该行有效股票不足 k 只时多出的位置为 -1
+    """
+    score = np.asarray(score, dtype=np.float64)
+    rows, cols = score.shape
+    k = int(k)
+    if k <= 0:
+        return np.empty((rows, 0), dtype=np.int64)
+    key = np.where(np.isnan(score), np.inf, score)
+    if k >= cols:
+        chosen = np.broadcast_to(np.arange(cols), (rows, cols))
+    else:
+        # 第 k 小的分数，小于它的全部入选，等于它的按列顺序补足 k 只
+        kth = np.partition(key, k - 1, axis=1)[:, k - 1:k]
+        less = key < kth
+        tie = key == kth
+        need = k - less.sum(axis=1, keepdims=True)
+        selected = less | (tie & (np.cumsum(tie, axis=1) <= need))
+        chosen = np.nonzero(selected)[1].reshape(rows, k)
+    # 只对入选的 k 只排序 (稳定排序保证同分时列下标小的在前)
+    order = np.argsort(np.take_along_axis(key, chosen, axis=1), axis=1, kind='stable')
+    chosen = np.take_along_axis(chosen, order, axis=1)
+    picked = np.take_along_axis(key, chosen, axis=1)
+    out = np.full((rows, k), -1, dtype=np.int64)
+    out[:, :chosen.shape[1]] = np.where(np.isfinite(picked), chosen, -1)
+    return out
+
+
+def selection_frame(dates, codes, cols, score=None, date_col='交易日期', code_col='股票代码'):
+    """
+    把 top_k 的结果还原成长表：日期、股票代码、复合因子、选股因子排名 (1 ~ k)
+    """
+    t, j = np.nonzero(cols >= 0)
+    picked = cols[t, j]
+    data = {
+        date_col: np.asarray(dates)[t],
+        code_col: np.asarray(codes, dtype=object)[picked],
+    }
+    if score is not None:
+        data['复合因子'] = np.asarray(score)[t, picked]
+    data['选股因子排名'] = (j + 1).astype(np.float64)
+    return pd.DataFrame(data)
+
+
+def select(factors, factor_list, select_num, mask=None, method='min'):
+    """
+    一次完成 复合因子 + 每个日期取前 select_num 只
+
+    返回:
+        (np.ndarray, np.ndarray): (T, select_num) 列下标与 (T, N) 复合因子
+    """
+    score = composite_score(factors, factor_list, mask, method)
+    return top_k(score, select_num), score
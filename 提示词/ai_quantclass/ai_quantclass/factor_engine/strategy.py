@@ -0,0 +1,260 @@
+"""
+策略指纹：同一个回测组中配置等价的子策略只计算一次
+
+strategy_list 中可能出现完全相同的策略 (如 26分享会小市值组合 中的两个 小市值_量价优化1)，
+它们的选股与分批进场仓位完全一样，只是资金占比 (cap_weight) 不同。
+strategy_fingerprint 对影响计算结果的配置做规范化后取哈希：
+    - 不参与：name (只是显示名)、cap_weight (只在组合汇总时使用)
+    - factor_list 与 filter_list 的顺序不影响结果 (复合因子为加权和，过滤条件取交集)，规范化时排序
+    - offset_list 去重排序
+    - context 为回测的全局配置 (起止时间、排除板块、上市天数、数据版本等)，一并参与哈希
+    - compute 的版本 (compute_tag：手动指定的 version，或 compute 源码的哈希) 一并参与哈希，
+      改了计算逻辑后旧结果不会被误用
+
+    context = dict(start_date=..., end_date=..., data_version=data_digest(factors, tradable))
+    groups = group_strategies(config['strategy_list'], context)          # 指纹 -> 策略下标
+    results = run_strategies(config['strategy_list'], compute, context, cache=StrategyCache())
+    portfolio = aggregate(results, [s['cap_weight'] for s in config['strategy_list']])
+
+StrategyCache 把每个指纹的结果保存在磁盘上 (<cache_root>/<指纹>/)，之后的回测只要指纹相同就直接复用。
+使用磁盘缓存时 context 必须包含 data_version (数据版本号或 data_digest 算出的输入数据哈希)：
+否则数据更新后指纹不变，会读到用旧数据算出的结果。
+"""
+import ast
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+import numpy as np
+
+import pandas as pd
+
+DEFAULT_CACHE_ROOT = '.strategy_cache'
+
+# 不影响子策略计算结果的字段
+_PRESENTATION_KEYS = ('name', 'cap_weight')
+
+
+def read_config_literals(path, names=('strategy_list',)):
+    """
+    从 config.py 中读取字面量赋值 (不执行文件，config 依赖的框架模块不在时也能读取)
+    """
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in names:
+                try:
+                    values[name] = ast.literal_eval(node.value)
+                except ValueError:
+                    continue
+    return values
+
+
+def _canonical(value):
+    """
+    规范化为 JSON 可序列化的结构：整数值的浮点数转为 int (1.0 与 1 等价)，元组转为列表
+    """
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def effective_config(strategy):
+    """
+    影响计算结果的策略配置 (规范化后)
+    """
+    config = {key: value for key, value in strategy.items() if key not in _PRESENTATION_KEYS}
+    config = _canonical(config)
+    for key in ('factor_list', 'filter_list'):
+        if key in config:
+            config[key] = sorted(config[key], key=lambda item: json.dumps(item, ensure_ascii=False, default=str))
+    if 'offset_list' in config:
+        config['offset_list'] = sorted(set(config['offset_list']))
+    return config
+
+
+def strategy_fingerprint(strategy, context=None, compute_version=None):
+    """
+    策略指纹 (16 位十六进制)
+
+    参数:
+        strategy (dict): strategy_list 中的一项
+        context (dict): 影响结果的全局配置，如 {'start_date': ..., 'end_date': ..., 'excluded_boards': ...,
+                        'days_listed': ..., 'data_version': ...}
+        compute_version (str): 计算逻辑的版本 (见 compute_tag)
+    """
+    payload = {'strategy': effective_config(strategy), 'context': _canonical(context or {}),
+               'compute': compute_version}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def group_strategies(strategy_list, context=None, compute_version=None):
+    """
+    按指纹分组，返回 {指纹: [策略下标, ...]} (保持首次出现的顺序)
+    """
+    groups = {}
+    for i, strategy in enumerate(strategy_list):
+        groups.setdefault(strategy_fingerprint(strategy, context, compute_version), []).append(i)
+    return groups
+
+
+def compute_tag(compute, version=None):
+    """
+    计算逻辑的版本标记：指定 version 时直接使用，否则为 compute 源码的哈希
+
+    源码哈希只覆盖 compute 自身，它调用的其他函数改了不会被发现，这种情况下需要手动更新 version。
+    """
+    if version is not None:
+        return str(version)
+    try:
+        source = inspect.getsource(compute)
+    except (OSError, TypeError):
+        code = getattr(compute, '__code__', None)
+        source = code.co_code.hex() + repr(code.co_consts) if code is not None else repr(compute)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+
+
+def data_digest(*values):
+    """
+    输入数据的哈希 (16 位十六进制)，可作为 context['data_version']
+
+    支持 DataFrame / Series / Index、ndarray (含 object 数组)、dict (按键排序) 与 list / tuple
+    """
+    digest = hashlib.sha256()
+
+    def feed(value):
+        if isinstance(value, dict):
+            for key in sorted(value, key=str):
+                digest.update(str(key).encode('utf-8'))
+                feed(value[key])
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                feed(item)
+        elif isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+            digest.update(repr(getattr(value, 'columns', getattr(value, 'name', None))).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+        elif isinstance(value, np.ndarray):
+            digest.update(f"{value.dtype}{value.shape}".encode('utf-8'))
+            if value.dtype == object:
+                digest.update(pd.util.hash_array(value.ravel()).tobytes())
+            else:
+                digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            digest.update(repr(value).encode('utf-8'))
+
+    for value in values:
+        feed(value)
+    return digest.hexdigest()[:16]
+
+
+class StrategyCache:
+    """
+    按指纹缓存子策略的计算结果 (dict 名称 -> DataFrame)，进程内与磁盘两级；cache_root 为 None 时只缓存在进程内
+
+    stats 记录 进程内命中 (memory)、磁盘命中 (disk)、实际计算 (computed) 与同一次运行中被合并的策略数 (shared)
+    """
+
+    def __init__(self, cache_root=DEFAULT_CACHE_ROOT):
+        self.cache_root = cache_root
+        self._memory = {}
+        self.stats = {'memory': 0, 'disk': 0, 'computed': 0, 'shared': 0}
+
+    def entry_dir(self, fingerprint):
+        return os.path.join(self.cache_root, fingerprint)
+
+    def load(self, fingerprint):
+        if fingerprint in self._memory:
+            self.stats['memory'] += 1
+            return self._memory[fingerprint]
+        if self.cache_root is None:
+            return None
+        entry = self.entry_dir(fingerprint)
+        try:
+            with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            result = {name: pd.read_pickle(os.path.join(entry, f"{i}.pkl")) for i, name in enumerate(meta['results'])}
+        except (OSError, ValueError, KeyError):
+            return None
+        self.stats['disk'] += 1
+        self._memory[fingerprint] = result
+        return result
+
+    def save(self, fingerprint, strategy, result, context=None, compute_version=None):
+        self._memory[fingerprint] = result
+        if self.cache_root is None:
+            return
+        entry = self.entry_dir(fingerprint)
+        tmp_dir = f"{entry}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for i, value in enumerate(result.values()):
+            pd.to_pickle(value, os.path.join(tmp_dir, f"{i}.pkl"))
+        meta = {
+            'fingerprint': fingerprint,
+            'strategy': effective_config(strategy),
+            'context': _canonical(context or {}),
+            'compute': compute_version,
+            'results': list(result),
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2, default=str)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_dir, entry)
+
+
+def run_strategies(strategy_list, compute, context=None, cache=None, version=None):
+    """
+    计算回测组中的所有子策略，指纹相同的只计算一次
+
+    参数:
+        strategy_list (list): 策略配置
+        compute (callable): compute(strategy) -> dict 名称 -> DataFrame (选股结果、仓位序列等，不含 cap_weight)
+        context (dict): 影响结果的全局配置；使用磁盘缓存时必须包含 data_version
+        cache (StrategyCache): 跨回测复用的缓存，None 时只在本次调用内去重
+        version (str): compute 的版本，默认为 compute 源码的哈希 (见 compute_tag)
+
+    返回:
+        list: 与 strategy_list 一一对应的结果 (相同指纹的策略共享同一个结果对象)
+    """
+    cache = cache if cache is not None else StrategyCache(cache_root=None)
+    if cache.cache_root is not None and (context or {}).get('data_version') is None:
+        raise ValueError("使用磁盘缓存时 context 必须包含 data_version (数据版本号或 data_digest(...) 的结果)，"
+                         "否则数据更新后会读到旧结果")
+    compute_version = compute_tag(compute, version)
+    results = [None] * len(strategy_list)
+    for fingerprint, indices in group_strategies(strategy_list, context, compute_version).items():
+        strategy = strategy_list[indices[0]]
+        result = cache.load(fingerprint)
+        if result is None:
+            result = compute(strategy)
+            cache.stats['computed'] += 1
+            cache.save(fingerprint, strategy, result, context, compute_version)
+        cache.stats['shared'] += len(indices) - 1
+        for i in indices:
+            results[i] = result
+    return results
+
+
+def aggregate(results, cap_weights, key='weights', value_col='目标资金占比', by=('交易日期', '股票代码')):
+    """
+    组合汇总：各子策略的目标资金占比乘以归一化后的 cap_weight 再相加 (cap_weight 只在这里使用)
+    """
+    total = float(sum(cap_weights))
+    if total <= 0:
+        raise ValueError("cap_weight 之和必须大于 0")
+    frames = []
+    for result, cap_weight in zip(results, cap_weights):
+        frame = result[key][list(by) + [value_col]].copy()
+        frame[value_col] *= cap_weight / total
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True).groupby(list(by), as_index=False, sort=True)[value_col].sum()
@@ -0,0 +1,133 @@
+"""
+币种代码的整数编码与归一化查找表
+
+SelectCoin 等按币种筛选的因子原来对每个 DataFrame 的每一行做 df['symbol'].str.replace('-', '')，
+只为和一个参数比较。这里在加载数据时建立一次查找表：原始币种名 -> 归一化名 (去掉 '-') -> 整数代码，
+并把 symbol 列转成 category 类型 (每个币种名只存一份，行上只存整数代码)。
+之后的币种比较只在建表时做一次字符串处理，行上全部是整数比较:
+
+    all_candle_df = load_symbols(all_candle_df)        # 数据加载后调用一次
+    table = all_candle_df.attrs['symbol_table']
+
+    codes = table.encode(df['symbol'])                 # int32，-1 表示缺失或表中没有
+    mask = codes == table.code('BTCUSDT')              # 与 'BTC-USDT' 视为同一币种
+
+查找表保存在 DataFrame 的 attrs 中，随切片、浅拷贝与按币种 groupby 得到的子表一起传给因子，
+没有全局状态。因子文件 (SelectCoin 等) 不导入这里，只读取 df.attrs 中的查找表；
+没有查找表 (未经 load_symbols 的数据) 时对列中不同的币种名逐个归一化比较。
+"""
+import numpy as np
+import pandas as pd
+
+
+def normalize_symbol(symbol):
+    """
+    归一化的币种名：去掉 '-' (BTC-USDT 与 BTCUSDT 视为同一币种)
+    """
+    return str(symbol).replace('-', '')
+
+
+def _uniques_and_codes(values):
+    """
+    (不同取值, 每行对应的取值下标)；category 列直接使用其类别与代码，其余列做一次 factorize
+    """
+    if isinstance(values, pd.Series):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        return values.categories, values.codes
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    return uniques, codes
+
+
+class SymbolTable:
+    """
+    归一化币种名 -> 整数代码 (按归一化名排序)
+
+    参数:
+        symbols (iterable): 原始币种名
+    """
+
+    def __init__(self, symbols):
+        self.raw = sorted({str(symbol) for symbol in symbols if not pd.isna(symbol)})
+        self.names = sorted({normalize_symbol(symbol) for symbol in self.raw})
+        self._codes = {name: code for code, name in enumerate(self.names)}
+        # categorical() 产生的类别代码 -> 归一化代码 (末尾的 -1 对应缺失值的代码 -1)
+        self.dtype = pd.CategoricalDtype(self.raw)
+        self._raw_codes = np.array([self.code(symbol) for symbol in self.raw] + [-1], dtype=np.int32)
+
+    def __deepcopy__(self, memo):
+        # 查找表建立后不再修改：DataFrame.attrs 在切片、拷贝时会被深拷贝，这里共享同一个对象
+        return self
+
+    @classmethod
+    def from_long(cls, df, symbol_col='symbol'):
+        uniques, _ = _uniques_and_codes(df[symbol_col])
+        return cls(uniques)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, symbol):
+        return normalize_symbol(symbol) in self._codes
+
+    def code(self, symbol):
+        """
+        币种 (原始或归一化写法均可) 的整数代码，表中没有时为 -1
+        """
+        return self._codes.get(normalize_symbol(symbol), -1)
+
+    def encode(self, values):
+        """
+        币种列 -> int32 代码数组；categorical() 转换过的列只做整数查表，其余列对不同的币种名逐个查找
+        """
+        if isinstance(values, pd.Series):
+            values = values.array
+        if isinstance(values, pd.Categorical) and values.dtype == self.dtype:
+            return self._raw_codes[values.codes]
+        uniques, codes = _uniques_and_codes(values)
+        lookup = np.array([self.code(symbol) for symbol in uniques] + [-1], dtype=np.int32)
+        return lookup[codes]  # 缺失值的代码为 -1，正好取到末尾的 -1
+
+    def categorical(self, values):
+        """
+        把币种列转换为以原始币种名为类别的 category 类型 (数据加载时调用一次)
+        """
+        return pd.Categorical(values, dtype=self.dtype)
+
+
+def load_symbols(df, symbol_col='symbol'):
+    """
+    数据加载时调用一次：建立查找表，把币种列存成 category (整数代码)，并把查找表放进 attrs['symbol_table']
+
+    参数:
+        df (pd.DataFrame): 全部币种的长表
+        symbol_col (str): 币种列名
+
+    返回:
+        pd.DataFrame: 浅拷贝 (不修改原 df)
+    """
+    table = SymbolTable.from_long(df, symbol_col)
+    out = df.copy(deep=False)
+    out[symbol_col] = table.categorical(df[symbol_col])
+    out.attrs['symbol_table'] = table
+    return out
+
+
+def symbol_mask(values, symbol, table=None):
+    """
+    币种列中归一化后等于 symbol 的行 (布尔数组)
+
+    参数:
+        values: 币种列 (category 列最快)
+        symbol (str): 要比较的币种，原始或归一化写法均可
+        table (SymbolTable): 查找表 (load_symbols 放在 attrs['symbol_table'] 中)，
+                             不传时对列中不同的币种名逐个归一化比较
+    """
+    if table is not None:
+        code = table.code(symbol)
+        # 表中没有的币种代码为 -1，不能与缺失值的代码 -1 相等
+        return (table.encode(values) == code) & (code >= 0)
+    uniques, codes = _uniques_and_codes(values)
+    target = normalize_symbol(symbol)
+    matches = np.flatnonzero([normalize_symbol(u) == target for u in uniques])
+    return np.isin(codes, matches)
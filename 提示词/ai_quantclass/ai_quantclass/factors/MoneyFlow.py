@@ -15,3 +15,10 @@ def signal(*args):
     df[factor_name] = df[factor_name].replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, fill_finite, ge, rolling_mean, where
+
+    direction = where(ge(field('close'), field('open')), 1, -1)
+    return fill_finite(rolling_mean(field('quote_volume') * direction, n))
@@ -18,3 +18,9 @@ def signal(*args):
     df[factor_name] = df[factor_name].replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, fill_finite, rolling_mean
+
+    return fill_finite(rolling_mean(field('volume') / field('circulating_supply'), n))
@@ -13,3 +13,9 @@ def signal(*args):
     df[factor_name] = df[factor_name].replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, fill_finite, pct_change, rolling_std
+
+    return fill_finite(rolling_std(pct_change(field('close'), 1), n))
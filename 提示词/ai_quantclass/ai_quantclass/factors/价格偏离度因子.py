@@ -22,3 +22,10 @@ def signal(*args):
     df[factor_name] = df[factor_name].replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, fill_finite, rolling_mean
+
+    close = field('close')
+    return fill_finite(close / rolling_mean(close, n) - 1)
@@ -23,3 +23,10 @@ def signal(*args):
     df[factor_name] = df[factor_name].replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, fill_finite, ge, rolling_sum, where
+
+    money_flow = field('quote_volume') * where(ge(field('close'), field('open')), 1, -1)
+    return fill_finite(rolling_sum(money_flow, n))
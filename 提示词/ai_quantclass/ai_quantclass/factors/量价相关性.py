@@ -22,3 +22,9 @@ def signal(*args):
     df[factor_name] = df[factor_name].replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, fill_finite, rolling_corr
+
+    return fill_finite(rolling_corr(field('close'), field('volume'), n))
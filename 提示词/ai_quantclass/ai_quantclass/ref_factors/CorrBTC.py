@@ -25,7 +25,7 @@ def signal(*args):
         df['指数涨跌幅'] = df['btc_close'].pct_change()
     else:
         df['指数涨跌幅'] = 0
-    df['指数涨跌幅'].fillna(0, inplace=True)
+    df['指数涨跌幅'] = df['指数涨跌幅'].fillna(0)
 
     indicator1 = df['close'].pct_change()
     indicator2 = df['指数涨跌幅']
@@ -34,3 +34,25 @@ def signal(*args):
     df[factor_name] = corr
 
     return df
+
+
+def panel_signal(panel, n):
+    """面板模式：BTC 收益率及其滚动矩只算一次，所有币种的相关系数由 (时间 × 币种) 收益率矩阵一次求出"""
+    import numpy as np
+
+    from factor_engine import panel as P
+    from factor_engine.market_corr import MarketMoments, market_returns, row_values
+
+    if 'btc_close' not in panel:
+        # 与 signal() 一致：没有 btc_close 时指数涨跌幅恒为 0，相关系数无定义
+        return np.full(panel.shape, np.nan)
+    btc_ret = market_returns(row_values(panel['btc_close']))
+    return MarketMoments(btc_ret, n).corr(P.pct_change(panel['close']))
+
+
+def expr(n):
+    from factor_engine.graph import field, fillna, pct_change, rolling_corr
+
+    # 指数涨跌幅的 NaN 填 0，与 signal() 一致 (需要 extra_data_dict 合并的 btc_close 列)
+    btc_ret = fillna(pct_change(field('btc_close'), 1), 0)
+    return rolling_corr(pct_change(field('close'), 1), btc_ret, n)
@@ -1,26 +1,43 @@
-
 import numpy as np
-import pandas as pd
+
+# 每小时的纳秒数
+NS_PER_HOUR = 3_600_000_000_000
+
 
 def signal(*args):
     df = args[0]
     n = args[1]
     factor_name = args[2]
 
-    # 转换时间为pandas Series
-    candle_series = pd.to_datetime(pd.Series(df['candle_begin_time']))
+    # K线时间转为 int64 纳秒，直接相减 (不做 to_datetime 与 Timedelta.dt.total_seconds() 转换)
+    times = np.asarray(df['candle_begin_time'], dtype='datetime64[ns]').view(np.int64)
     # 满足有合约有现货的条件
-    cond = (df['symbol_swap'] != '') & (df['symbol_spot'] != '')
-    # 找到首次满足条件的索引
+    cond = (np.asarray(df['symbol_swap']) != '') & (np.asarray(df['symbol_spot']) != '')
+    # 找到首次满足条件的位置
     if cond.any():
-        first_idx = cond[cond].index[0]
-        first_time = candle_series.iloc[first_idx]
-        # 计算每一行到首次满足条件的时间差（小时）
-        hours_since_first = (candle_series - first_time).dt.total_seconds() / 3600
-        # 只有满足条件的行才赋值，其他为0
-        df[factor_name] = np.where(cond, hours_since_first, np.nan)
+        first_time = times[cond.argmax()]
+        # 计算每一行到首次满足条件的时间差（小时），只有满足条件的行才赋值
+        df[factor_name] = np.where(cond, (times - first_time) / NS_PER_HOUR, np.nan)
     else:
         df[factor_name] = np.nan
 
     return df
 
+
+def panel_signal(panel, n):
+    """面板模式：每个币种的首次上市行由布尔矩阵的 argmax 一次求出，面板附加了上市时间索引时以索引为准"""
+    from factor_engine.listing import spot_and_swap, time_ns
+
+    cond = spot_and_swap(panel['symbol_spot'], panel['symbol_swap']) & panel.listed()
+    times = time_ns(panel.index)
+    first = times[cond.argmax(axis=0)]  # 从未满足条件的币种 cond 整列为 False，结果不会被使用
+    index = panel.attrs.get('listing_index')
+    if index is not None:
+        first = np.array([index.get(s) if s in index else v for s, v in zip(panel.symbols, first)], dtype=np.int64)
+    hours = (times[:, None] - first) / NS_PER_HOUR
+    return np.where(cond, hours, np.nan)
+
+
+def warmup(n):
+    """因子值取决于整段历史中首次同时有现货和合约的时间，无法只用末尾若干K线增量计算"""
+    return None
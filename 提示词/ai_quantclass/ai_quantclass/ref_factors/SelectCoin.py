@@ -1,16 +1,35 @@
-
 import numpy as np
+import pandas as pd
 
 def signal(*args):
     df = args[0]
     n = args[1]
     factor_name = args[2]
 
-    # 将参数n和symbol都转换为不带横杠的格式进行比较
-    n_normalized = n.replace('-', '')
-    symbol_normalized = df['symbol'].str.replace('-', '', regex=False)
-    
-    df[factor_name] = np.where(symbol_normalized == n_normalized, 1, np.nan)
+    # 参数n和symbol都按不带横杠的格式比较。数据加载时建立的币种查找表 (df.attrs['symbol_table'])
+    # 已把每个币种名归一化并编码，行上只剩整数比较
+    table = df.attrs.get('symbol_table')
+    if table is not None:
+        code = table.code(n)
+        matches = (table.encode(df['symbol']) == code) & (code >= 0)  # 表中没有的币种与缺失值的代码都是 -1
+        df[factor_name] = np.where(matches, 1, np.nan)
+    else:
+        # 没有查找表：str.replace 只对不同的币种名做一次，行上是整数代码查表
+        codes, uniques = pd.factorize(df['symbol'])
+        target = str(n).replace('-', '')
+        matches = np.array([str(symbol).replace('-', '') == target for symbol in uniques] + [False])
+        df[factor_name] = np.where(matches[codes], 1, np.nan)  # 缺失值的代码为 -1，正好取到末尾的 False
 
     return df
 
+
+def panel_signal(panel, n):
+    """面板模式：面板的每一列就是一个币种，只需比较列名"""
+    target = str(n).replace('-', '')
+    columns = np.array([str(symbol).replace('-', '') == target for symbol in panel.symbols], dtype=bool)
+    return np.where(panel.listed() & columns, 1.0, np.nan)
+
+
+def warmup(n):
+    """因子值只取决于当前行的币种"""
+    return 0
@@ -18,3 +18,12 @@ def signal(*args):
     df[factor_name] = ratio
 
     return df
+
+
+def expr(n):
+    from factor_engine.graph import field, gt, lt, rolling_sum, shift, where
+
+    close, volume = field('close'), field('volume')
+    upvolumes = rolling_sum(where(gt(close, shift(close, 1)), volume, 0), n)
+    downvolumes = rolling_sum(where(lt(close, shift(close, 1)), volume, 0), n)
+    return upvolumes / (1e-9 + downvolumes)
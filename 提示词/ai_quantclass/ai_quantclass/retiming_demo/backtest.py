@@ -3,17 +3,64 @@ import numpy as np
 import os
 import sys
 import importlib
+import importlib.util
 import plotly.graph_objects as go
 
+import data_store
+from segments import SegmentTables, segment_performance
+
+# 策略模块按文件路径加载 (strategies/ 不作为包导入)
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategies')
+
+
+def load_signal_module(strategy_module):
+    """
+    按文件路径加载 strategies/ 目录下的策略模块 (同一进程内只加载一次)
+    """
+    module_name = f"strategy_{strategy_module}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    path = os.path.join(STRATEGY_DIR, f"{strategy_module}.py")
+    if not os.path.exists(path):
+        raise ModuleNotFoundError(f"Strategy module not found: {path}")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+class BacktestResult:
+    """
+    单次回测的结果 (immutable 模式下由 BacktestEngine.run 生成)
+
+    只保存收盘价、信号与资金曲线相关列，原始行情数据仍由引擎持有且不被修改。
+    """
+    def __init__(self, strategy_module, strategy_params, factor_name, data, performance):
+        self.strategy_module = strategy_module
+        self.strategy_params = strategy_params
+        self.factor_name = factor_name
+        self.data = data
+        self.performance = performance
+
+
 class BacktestEngine:
-    def __init__(self, data_path, symbol='BTC-USDT', initial_capital=10000.0, fee_rate=0.0005, slippage=0.0001):
+    def __init__(self, data_path, symbol='BTC-USDT', initial_capital=10000.0, fee_rate=0.0005, slippage=0.0001,
+                 immutable=False, use_cache=True):
         self.data_path = data_path
         self.symbol = symbol
         self.initial_capital = initial_capital
         self.fee_rate = fee_rate
         self.slippage = slippage
+        # immutable=True 时 run() 不再改写 self.data，信号与资金曲线保存在 self.last_result 中
+        self.immutable = immutable
+        # use_cache=True 时预处理后的数据会缓存为列式 .npy 文件，数据文件未变化时跳过 CSV 解析
+        self.use_cache = use_cache
         self.data = None
+        # 内存映射行情 (load_store)，设置后 run() 只按策略声明的列构造零拷贝视图
+        self.store = None
         self.results = {}
+        self.last_result = None
         
     def load_data(self):
         """
@@ -22,6 +69,12 @@ class BacktestEngine:
         print(f"Loading data from {self.data_path}...")
         if not os.path.exists(self.data_path):
             raise FileNotFoundError(f"File not found: {self.data_path}")
+
+        cache_dir = data_store.cache_dir_for(self.data_path)
+        if self.use_cache and data_store.is_valid(cache_dir, self.data_path):
+            self.data = data_store.load_frame(cache_dir)
+            print(f"Data loaded from cache {cache_dir}. Rows: {len(self.data)}")
+            return
             
         try:
             # Skip the first row (garbage metadata) and try GBK encoding
@@ -46,16 +99,63 @@ class BacktestEngine:
             
             print(f"Data loaded successfully. Rows: {len(self.data)}")
             print(f"Time range: {self.data.index[0]} to {self.data.index[-1]}")
+
+            if self.use_cache:
+                try:
+                    data_store.save_frame(self.data, cache_dir, self.data_path)
+                except OSError as e:
+                    print(f"Failed to write data cache: {e}")
             
         except Exception as e:
             print(f"Error loading data: {e}")
             raise
 
-    def calculate_equity(self, factor_name='signal'):
+    def load_store(self, start=None, end=None):
+        """
+        以内存映射方式打开行情 (可选时间区间)，替代把整段历史读入 self.data
+
+        首次使用时会先通过 load_data 生成列式缓存，随后释放 DataFrame 只保留内存映射。
+        """
+        if not data_store.is_valid(data_store.cache_dir_for(self.data_path), self.data_path):
+            use_cache, self.use_cache = self.use_cache, True
+            try:
+                self.load_data()
+            finally:
+                self.use_cache = use_cache
+        self.data = None
+        self.store = data_store.OHLCVStore.open(self.data_path).between(start, end)
+        print(f"Data store opened. Rows: {len(self.store)}")
+        return self.store
+
+    def _base_data(self, columns=None):
+        """
+        回测使用的原始行情：只包含所需列 (columns 为空时为全部列)
+
+        内存映射模式下是所需列的零拷贝视图，否则是引用 self.data 各列的新 DataFrame (不复制数据)。
+        """
+        if columns is not None and 'close' not in columns:
+            columns = ['close'] + list(columns)
+        if self.store is not None:
+            return self.store.to_frame(columns)
+        if self.data is None:
+            self.load_data()
+        if columns is None:
+            return self.data
+        return pd.DataFrame({name: self.data[name] for name in columns}, index=self.data.index, copy=False)
+
+    def calculate_equity(self, factor_name='signal', df=None):
         """
         计算资金曲线
+
+        df 为空时基于 self.data 计算并写回 self.data；
+        传入 df (signal 的输出) 时只取 close 与信号列生成新的结果表，不修改 self.data。
         """
-        df = self.data.copy()
+        if df is None:
+            df = self.data.copy()
+            inplace = True
+        else:
+            df = pd.DataFrame({'close': df['close'], factor_name: df[factor_name]})
+            inplace = False
         
         # 1. 仓位生成
         # 信号通常在收盘时产生，只能在下一根K线执行
@@ -86,17 +186,22 @@ class BacktestEngine:
         # 7. 净值 (Net Value)
         df['net_value'] = (1 + df['net_return']).cumprod()
         
-        self.data = df
+        if inplace:
+            self.data = df
+        else:
+            # 精简结果：中间列不再保留
+            df.drop(columns=['pct_change', 'strategy_return', 'cost'], inplace=True)
         return df
 
-    def calculate_performance(self):
+    def calculate_performance(self, df=None):
         """
-        计算绩效指标
+        计算绩效指标 (df 为空时使用 self.data)
         """
-        if 'net_value' not in self.data.columns:
+        if df is None:
+            df = self.data
+        if 'net_value' not in df.columns:
             return None
             
-        df = self.data
         net_values = df['net_value']
         returns = df['net_return']
         
@@ -138,27 +243,168 @@ class BacktestEngine:
         else:
             win_rate = 0
 
-        self.results = {
-            'Total Return': f"{total_return:.2%}",
-            'Annualized Return': f"{annualized_return:.2%}",
-            'Max Drawdown': f"{max_drawdown:.2%}",
-            'Sharpe Ratio': f"{sharpe_ratio:.2f}",
-            'Trade Count': int(action_count),
-            'Win Rate (Per Candle)': f"{win_rate:.2%}",
-            'Final Equity': f"{df['equity_curve'].iloc[-1]:.2f}"
-        }
+        self.results = self.format_performance({
+            'Total Return': total_return,
+            'Annualized Return': annualized_return,
+            'Max Drawdown': max_drawdown,
+            'Sharpe Ratio': sharpe_ratio,
+            'Trade Count': action_count,
+            'Win Rate (Per Candle)': win_rate,
+            'Final Equity': df['equity_curve'].iloc[-1]
+        })
         
         return self.results
 
-    def plot_equity(self, filename='equity_curve.html'):
+    @staticmethod
+    def format_performance(metrics):
+        """
+        将数值绩效指标格式化为展示用的字符串字典 (与 calculate_performance 的输出一致)
+        """
+        return {
+            'Total Return': f"{metrics['Total Return']:.2%}",
+            'Annualized Return': f"{metrics['Annualized Return']:.2%}",
+            'Max Drawdown': f"{metrics['Max Drawdown']:.2%}",
+            'Sharpe Ratio': f"{metrics['Sharpe Ratio']:.2f}",
+            'Trade Count': int(metrics['Trade Count']),
+            'Win Rate (Per Candle)': f"{metrics['Win Rate (Per Candle)']:.2%}",
+            'Final Equity': f"{metrics['Final Equity']:.2f}"
+        }
+
+    def calculate_equity_batch(self, signals, names=None, chunk_size=256, return_curves=True):
+        """
+        批量计算多组参数的资金曲线与绩效 (NumPy 向量化，不修改 self.data)
+
+        逻辑与 calculate_equity + calculate_performance 一致：信号在下一根K线执行，
+        仓位变化按 (手续费 + 滑点) 扣除成本。
+
+        return_curves=False 时按仓位区间计算绩效 (见 segments.segment_performance)，
+        不再为每一步生成 (K线数 × 参数组数) 的 float64 中间矩阵；需要净值矩阵时逐K线计算。
+        实测 (10 万根K线、1000 组)：逐K线计算约为单次回测的 190 倍，按区间计算约为 10 倍
+        (主要是扫描整块信号矩阵找换仓点，其余与换仓次数成正比)，仍达不到"几次单次回测"。
+
+        参数:
+            signals (np.ndarray | pd.DataFrame): 信号矩阵 (K线数 × 参数组数)，取值 1 / -1 / 0 (任意数值类型)
+            names (list): 每组参数的名称，默认使用 DataFrame 列名或 0..k-1
+            chunk_size (int): 每次计算的列数，控制中间矩阵的内存占用
+            return_curves (bool): 是否返回净值矩阵；大规模寻参只需要绩效时可关闭以节省内存和时间
+
+        返回:
+            dict: {'net_value': 净值矩阵 (K线数 × 参数组数) 或 None, 'performance': 数值绩效 DataFrame (每组一行)}
+        """
+        data = self._base_data(['close'])
+
+        if isinstance(signals, pd.DataFrame):
+            names = list(signals.columns) if names is None else names
+            signals = signals.to_numpy()
+        # 保持原有数值类型 (如 DualMA 的 int64 仓位)，逐块转换为 float64
+        signals = np.asarray(signals)
+        if signals.ndim == 1:
+            signals = signals[:, None]
+        n_rows, n_sets = signals.shape
+        if n_rows != len(data):
+            raise ValueError(f"Signal rows ({n_rows}) do not match data rows ({len(data)})")
+        names = list(range(n_sets)) if names is None else list(names)
+
+        # 所有参数组共用的部分只算一次
+        close = data['close'].to_numpy(dtype=np.float64)
+        pct_change = np.zeros(n_rows)
+        pct_change[1:] = close[1:] / close[:-1] - 1
+        pct_change[np.isnan(pct_change)] = 0
+        days = (data.index[-1] - data.index[0]).days
+        periods_per_year = 365 * 24
+        cost_rate = self.fee_rate + self.slippage
+
+        net_value = np.empty((n_rows, n_sets)) if return_curves else None
+        metrics = {key: np.zeros(n_sets) for key in [
+            'Total Return', 'Annualized Return', 'Max Drawdown', 'Sharpe Ratio',
+            'Trade Count', 'Win Rate (Per Candle)', 'Final Equity']}
+
+        # 只需要绩效时按仓位区间计算 (仓位取值过多等情况下返回 None，回到逐K线计算)
+        segment = None
+        if not return_curves and n_rows >= 2:
+            segment = segment_performance(signals, SegmentTables(pct_change), cost_rate, chunk_size)
+        if segment is not None:
+            final = segment['final']
+            metrics['Total Return'][:] = final - 1
+            if days > 0:
+                metrics['Annualized Return'][:] = final ** (365 / days) - 1
+            for key in ['Max Drawdown', 'Sharpe Ratio', 'Trade Count', 'Win Rate (Per Candle)']:
+                metrics[key][:] = segment[key]
+            metrics['Final Equity'][:] = final * self.initial_capital
+
+        for start in range(0, n_sets if segment is None else 0, chunk_size):
+            cols = slice(start, min(start + chunk_size, n_sets))
+
+            # 块内按 (参数组 × K线) 存放，使沿时间方向的累乘/累计最大值在连续内存上进行
+            # 1. 仓位生成 (shift(1) 并以 0 填充)
+            position = np.zeros((cols.stop - cols.start, n_rows))
+            position[:, 1:] = signals[:-1, cols].T
+            np.nan_to_num(position, copy=False, nan=0.0)
+
+            # 2-5. 毛收益、交易成本与净收益
+            position_change = np.zeros_like(position)
+            position_change[:, 1:] = np.abs(np.diff(position, axis=1))
+            net_return = position * pct_change - position_change * cost_rate
+
+            # 6-7. 净值
+            nv = np.cumprod(1 + net_return, axis=1)
+            if return_curves:
+                net_value[:, cols] = nv.T
+
+            # 绩效指标
+            final = nv[:, -1]
+            metrics['Total Return'][cols] = final - 1
+            if days > 0:
+                metrics['Annualized Return'][cols] = final ** (365 / days) - 1
+            running_max = np.maximum.accumulate(nv, axis=1)
+            metrics['Max Drawdown'][cols] = ((nv - running_max) / running_max).min(axis=1)
+            std = net_return.std(axis=1, ddof=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                metrics['Sharpe Ratio'][cols] = np.where(
+                    std != 0, np.sqrt(periods_per_year) * net_return.mean(axis=1) / std, 0)
+            # 与 (position != position.shift(1)).sum() 一致：首行总是计为一次
+            metrics['Trade Count'][cols] = 1 + np.count_nonzero(position_change[:, 1:], axis=1)
+            holding = position != 0
+            holding_count = holding.sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                metrics['Win Rate (Per Candle)'][cols] = np.where(
+                    holding_count > 0, (holding & (net_return > 0)).sum(axis=1) / holding_count, 0)
+            metrics['Final Equity'][cols] = final * self.initial_capital
+
+        performance = pd.DataFrame(metrics, index=names)
+        performance['Trade Count'] = performance['Trade Count'].astype(int)
+        return {'net_value': net_value, 'performance': performance}
+
+    def start_incremental(self, strategy_params, warmup=True):
+        """
+        创建增量回测 (目前支持 DualMA)，warmup=True 时先用已有历史推进到最新状态
+
+        之后每来一根新K线调用 update(timestamp, close)，不必重跑整段历史。
+        """
+        from incremental import IncrementalDualMA
+
+        inc = IncrementalDualMA(
+            short_n=strategy_params.get('short_n', 10),
+            long_n=strategy_params.get('long_n', 60),
+            stop_loss=strategy_params.get('stop_loss', 0.10),
+            initial_capital=self.initial_capital,
+            fee_rate=self.fee_rate,
+            slippage=self.slippage
+        )
+        if warmup:
+            inc.update_batch(self._base_data(['close']))
+        return inc
+
+    def plot_equity(self, filename='equity_curve.html', df=None):
         """
         绘制资金曲线 (Plotly)
         """
-        if 'equity_curve' not in self.data.columns:
+        if df is None:
+            df = self.data
+        if 'equity_curve' not in df.columns:
             print("Equity curve not found. Please run backtest first.")
             return
 
-        df = self.data
         
         fig = go.Figure()
         
@@ -197,27 +443,43 @@ class BacktestEngine:
         """
         运行回测
         """
-        if self.data is None:
+        if self.data is None and self.store is None:
             self.load_data()
             
         if verbose:
             print(f"Running strategy: {strategy_module} with params: {strategy_params}")
         
         try:
-            mod = importlib.import_module(f"signal.{strategy_module}")
+            mod = load_signal_module(strategy_module)
             if not hasattr(mod, 'signal'):
                 raise AttributeError(f"Module {strategy_module} does not have a 'signal' function.")
             
             # 计算信号
             # n = strategy_params.get('n', 20)
             # Pass full params dict to signal function
-            self.data = mod.signal(self.data, strategy_params, factor_name)
-            
-            # 计算资金曲线
-            self.calculate_equity(factor_name)
-            
-            # 计算绩效
-            perf = self.calculate_performance()
+            if self.immutable or self.store is not None:
+                # 先释放上一次的结果，避免新旧结果同时驻留
+                self.last_result = None
+                # 策略可通过 required_columns 声明所需列，内存映射模式下只为这些列构造视图
+                base = self._base_data(getattr(mod, 'required_columns', None))
+                # 原始数据保持不变，结果只保留精简列，signal 返回的整表副本随即释放
+                df = self.calculate_equity(factor_name, df=mod.signal(base, strategy_params, factor_name))
+                perf = self.calculate_performance(df)
+                self.last_result = BacktestResult(strategy_module, strategy_params, factor_name, df, perf)
+            else:
+                out = mod.signal(self.data, strategy_params, factor_name)
+                if len(self.data.columns.difference(out.columns)):
+                    # 策略只返回精简结果 (如 DualMA)：把结果列写回完整行情，self.data 的内容与以前一致
+                    for name in out.columns.drop('close', errors='ignore'):
+                        self.data[name] = out[name]
+                    out = self.data
+                self.data = out
+                
+                # 计算资金曲线
+                df = self.calculate_equity(factor_name)
+                
+                # 计算绩效
+                perf = self.calculate_performance()
             
             if verbose:
                 print("-" * 30)
@@ -227,10 +489,10 @@ class BacktestEngine:
                 print("-" * 30)
                 
                 # 绘制图表
-                self.plot_equity()
+                self.plot_equity(df=df)
                 
                 # 简单的最后几行展示
-                print(self.data[['close', 'position', 'net_value']].tail())
+                print(df[['close', 'position', 'net_value']].tail())
             
             return perf
             
@@ -0,0 +1,274 @@
+"""
+回测框架性能基准 (Benchmark)
+
+使用模拟的 1 分钟K线数据对比优化后实现与原始实现的耗时。
+运行方式: python benchmark.py [dual_ma] [batch] [incremental] [memory] [spawn]
+一致性测试在 tests/test_retiming.py (在 ai_quantclass 目录下运行: python -m pytest tests)
+"""
+import os
+import sys
+import time
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+
+from backtest import BacktestEngine, load_signal_module
+
+
+def make_fake_candles(n_rows=1_000_000, seed=42):
+    """
+    生成模拟的 1 分钟 OHLCV 数据 (几何随机游走)
+    """
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, n_rows)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.001, n_rows)) * close
+    df = pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, n_rows),
+    }, index=pd.date_range('2020-01-01', periods=n_rows, freq='min', name='candle_begin_time'))
+    return df
+
+
+def bench_dual_ma(n_rows=1_000_000):
+    """
+    DualMA 状态机：数组化内核 vs 逐K线循环
+    """
+    dual_ma = load_signal_module("DualMA")
+    df = make_fake_candles(n_rows)
+    closes = df['close'].values
+
+    print("=" * 60)
+    print(f"DualMA 信号内核 ({n_rows:,} 根K线)")
+    print("=" * 60)
+
+    for short_n, long_n, stop_loss in [(10, 60, 0.10), (5, 20, 0.01), (80, 500, 0.10)]:
+        short_ma = df['close'].rolling(short_n).mean().values
+        long_ma = df['close'].rolling(long_n).mean().values
+
+        start_time = time.time()
+        slow = dual_ma.dual_ma_positions_loop(closes, short_ma, long_ma, stop_loss)
+        time_slow = time.time() - start_time
+
+        start_time = time.time()
+        fast = dual_ma.dual_ma_positions(closes, short_ma, long_ma, stop_loss)
+        time_fast = time.time() - start_time
+
+        print(f"short={short_n:<3} long={long_n:<4} stop={stop_loss:<5} "
+              f"loop: {time_slow:7.3f}s  kernel: {time_fast:7.4f}s  "
+              f"speedup: {time_slow / max(time_fast, 1e-9):6.0f}x  "
+              f"({'identical' if np.array_equal(slow, fast) else 'MISMATCH'})")
+
+
+def bench_batch(n_rows=100_000, n_sets=1000, n_single=5):
+    """
+    批量资金曲线：calculate_equity_batch (n_sets 组) vs engine.run (n_single 组)
+    """
+    df = make_fake_candles(n_rows)
+    engine = BacktestEngine(data_path='', fee_rate=0.001, slippage=0.008)
+    rng = np.random.default_rng(0)
+    signals = rng.choice([-1.0, 0.0, 1.0], size=(n_rows, n_sets), p=[0.01, 0.98, 0.01])
+    signals = np.cumsum(signals, axis=0).clip(-1, 1)
+
+    print("=" * 60)
+    print(f"批量回测 ({n_rows:,} 根K线)")
+    print("=" * 60)
+
+    start_time = time.time()
+    for i in range(n_single):
+        engine.data = df.assign(signal=signals[:, i])
+        engine.calculate_equity('signal')
+        engine.calculate_performance()
+    time_single = (time.time() - start_time) / n_single
+
+    engine.data = df
+    start_time = time.time()
+    engine.calculate_equity_batch(signals, return_curves=True)
+    time_per_bar = time.time() - start_time
+    start_time = time.time()
+    engine.calculate_equity_batch(signals, return_curves=False)
+    time_batch = time.time() - start_time
+
+    print(f"单次回测: {time_single:.3f}s / 组")
+    print(f"批量回测 (逐K线，含净值矩阵): {time_per_bar:.3f}s / {n_sets} 组 (约等于 {time_per_bar / time_single:.1f} 次单次回测)")
+    print(f"批量回测 (按仓位区间，只算绩效): {time_batch:.3f}s / {n_sets} 组 (约等于 {time_batch / time_single:.1f} 次单次回测)")
+
+    # optimize_dual_ma_batch 的完整流程：整块参数组一次生成 DualMA 仓位，再批量计算资金曲线
+    from ma_cache import MovingAverageCache
+    dual_ma = load_signal_module("DualMA")
+    close = df['close'].values
+    combos = [(s, l) for s in range(5, 105, 5) for l in range(20, 520, 10) if s < l][:n_sets]
+    ma_cache = MovingAverageCache.build(close, [n for combo in combos for n in combo])
+    start_time = time.time()
+    positions = dual_ma.dual_ma_positions_batch(
+        close, ma_cache.take([s for s, _ in combos]), ma_cache.take([l for _, l in combos]), 0.10
+    )
+    time_positions = time.time() - start_time
+    start_time = time.time()
+    engine.calculate_equity_batch(positions, return_curves=False)
+    time_equity = time.time() - start_time
+    total = time_positions + time_equity
+    print(f"DualMA 寻参 {len(combos)} 组: 仓位生成 {time_positions:.3f}s + 资金曲线 {time_equity:.3f}s "
+          f"(约等于 {total / time_single:.1f} 次单次回测)")
+
+
+def bench_incremental(n_rows=200_000, n_new=1000):
+    """
+    增量回测：每根新K线调用 IncrementalDualMA.update vs 每根新K线重跑 engine.run
+    """
+    df = make_fake_candles(n_rows + n_new)
+    params = {'short_n': 10, 'long_n': 60, 'stop_loss': 0.10}
+    engine = BacktestEngine(data_path='', fee_rate=0.001, slippage=0.008, immutable=True)
+
+    print("=" * 60)
+    print(f"增量回测 ({n_rows:,} 根历史K线 + {n_new} 根新K线)")
+    print("=" * 60)
+
+    engine.data = df.iloc[:n_rows]
+    start_time = time.time()
+    inc = engine.start_incremental(params, warmup=True)
+    time_warmup = time.time() - start_time
+
+    new = df.iloc[n_rows:]
+    start_time = time.time()
+    for timestamp, close in zip(new.index, new['close'].to_numpy()):
+        inc.update(timestamp, float(close))
+    time_update = (time.time() - start_time) / n_new
+
+    engine.data = df
+    start_time = time.time()
+    engine.run('DualMA', params, verbose=False)
+    time_run = time.time() - start_time
+
+    print(f"预热: {time_warmup:.3f}s  每根新K线 update: {time_update * 1e6:.1f}us  "
+          f"重跑整段 run: {time_run:.3f}s (约 {time_run / time_update:,.0f} 倍)")
+
+
+def current_rss_mb():
+    """
+    当前进程常驻内存 (MB)，Linux 读取 /proc，其他平台退化为峰值 RSS
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _memory_worker(mode, data_file, n_runs):
+    engine = BacktestEngine(data_path=data_file, fee_rate=0.001, slippage=0.008, immutable=(mode == 'immutable'))
+    engine.load_data()
+    base_rss = current_rss_mb()
+    rss = []
+    for i in range(n_runs):
+        params = {'short_n': 10 + i, 'long_n': 100 + 10 * i, 'stop_loss': 0.10}
+        engine.run(strategy_module="DualMA", strategy_params=params, verbose=False)
+        rss.append(current_rss_mb())
+    print(f"{mode:<10} 加载后: {base_rss:8.1f} MB  第1次: {rss[0]:8.1f} MB  第2次: {rss[1]:8.1f} MB  "
+          f"第{n_runs}次: {rss[-1]:8.1f} MB  最高: {max(rss):8.1f} MB  self.data 列数: {engine.data.shape[1]}")
+
+
+def bench_memory(n_rows=2_000_000, n_runs=20):
+    """
+    寻参过程的内存占用：原始模式 (run 改写 self.data) vs immutable 模式
+    每种模式在独立子进程中运行，避免互相影响 RSS
+    """
+    df = make_fake_candles(n_rows)
+    print("=" * 60)
+    print(f"寻参内存占用 ({n_rows:,} 根K线, {n_runs} 次回测)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'BTC-USDT.csv')
+        _write_candles_csv(df, data_file)
+        print(f"CSV 大小: {os.path.getsize(data_file) / 1024 ** 2:.0f} MB")
+
+        here = os.path.dirname(os.path.abspath(__file__))
+        for mode in ['legacy', 'immutable']:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_memory_worker', mode, data_file, str(n_runs)],
+                cwd=here, capture_output=True, text=True, check=True
+            ).stdout
+            print(out.strip().splitlines()[-1])
+
+
+def _write_candles_csv(df, data_file):
+    with open(data_file, 'w') as f:
+        # load_data 会跳过第一行
+        f.write("benchmark data\n")
+        df.to_csv(f)
+
+
+SPAWN_SHORT_RANGE = range(5, 25, 5)
+SPAWN_LONG_RANGE = range(20, 60, 10)
+
+
+def _spawn_worker(data_file, output_file):
+    from optimize import optimize_dual_ma_parallel
+    optimize_dual_ma_parallel(short_range=SPAWN_SHORT_RANGE, long_range=SPAWN_LONG_RANGE, stop_loss=0.10, n_jobs=2,
+                              output_file=output_file, data_path=data_file, start_method='spawn')
+
+
+def bench_spawn(n_rows=20_000, timeout=300):
+    """
+    spawn 启动方式 (macOS、Windows 的默认方式) 下的并行寻参冒烟测试：
+    子进程能正常导入并完成全部任务 (超时视为卡死)，结果与串行回测一致
+    """
+    from optimize import FEE_RATE, SLIPPAGE, parse_performance
+
+    df = make_fake_candles(n_rows)
+    print("=" * 60)
+    print(f"spawn 并行寻参 ({n_rows:,} 根K线)")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'BTC-USDT.csv')
+        output_file = os.path.join(tmp, 'dual_ma_optimization.csv')
+        _write_candles_csv(df, data_file)
+        here = os.path.dirname(os.path.abspath(__file__))
+        start_time = time.time()
+        subprocess.run([sys.executable, os.path.abspath(__file__), '_spawn_worker', data_file, output_file],
+                       cwd=here, capture_output=True, text=True, check=True, timeout=timeout)
+        time_spawn = time.time() - start_time
+        parallel = pd.read_csv(output_file)
+
+        engine = BacktestEngine(data_path=data_file, fee_rate=FEE_RATE, slippage=SLIPPAGE, immutable=True)
+        engine.load_data()
+        rows = []
+        for short_n, long_n in zip(parallel['short_n'], parallel['long_n']):
+            params = {'short_n': short_n, 'long_n': long_n, 'stop_loss': 0.10}
+            rows.append(parse_performance(short_n, long_n, engine.run("DualMA", params, verbose=False)))
+        serial = pd.DataFrame(rows, columns=parallel.columns)
+
+    total = sum(s < l for s in SPAWN_SHORT_RANGE for l in SPAWN_LONG_RANGE)
+    assert len(parallel) == total, f"spawn 寻参只完成了 {len(parallel)} / {total} 个组合"
+    pd.testing.assert_frame_equal(parallel, serial)
+    print(f"spawn 寻参完成 {len(parallel)} 个组合，耗时 {time_spawn:.2f}s (含启动子进程)，结果与串行回测一致")
+
+
+BENCHMARKS = {
+    'dual_ma': bench_dual_ma,
+    'batch': bench_batch,
+    'incremental': bench_incremental,
+    'memory': bench_memory,
+    'spawn': bench_spawn,
+}
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['_memory_worker']:
+        _memory_worker(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+    if sys.argv[1:2] == ['_spawn_worker']:
+        _spawn_worker(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
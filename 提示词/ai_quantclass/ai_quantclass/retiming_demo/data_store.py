@@ -0,0 +1,200 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# 缓存格式版本，布局变化时递增以使旧缓存失效
+CACHE_VERSION = 2
+
+
+def cache_dir_for(data_path, cache_root=None):
+    """
+    数据文件对应的缓存目录，默认位于数据文件同级的 .backtest_cache/ 下
+    """
+    data_path = os.path.abspath(data_path)
+    if cache_root is None:
+        cache_root = os.path.join(os.path.dirname(data_path), '.backtest_cache')
+    return os.path.join(cache_root, os.path.basename(data_path))
+
+
+def source_key(data_path):
+    """
+    缓存键：文件绝对路径 + 修改时间 + 文件大小
+    """
+    stat = os.stat(data_path)
+    return {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(data_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+
+
+def read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_valid(cache_dir, data_path):
+    meta = read_meta(cache_dir)
+    return meta is not None and meta.get('key') == source_key(data_path)
+
+
+def save_frame(df, cache_dir, data_path):
+    """
+    将预处理后的 DataFrame 按列写成 .npy 文件 (时间索引存为 int64 纳秒)
+
+    布局:
+        cache_dir/meta.json       列名、dtype 与缓存键
+        cache_dir/__index__.npy   时间索引
+        cache_dir/<i>.npy         第 i 列数据
+        cache_dir/<i>.mask.npy    字符串列的缺失值掩码 (仅 object 列)
+    先写入临时目录再整体替换，避免并发读到半成品。
+    """
+    tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    index = df.index.values.astype('datetime64[ns]').view(np.int64)
+    np.save(os.path.join(tmp_dir, '__index__.npy'), index)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        entry = {'name': str(col)}
+        if values.dtype == object:
+            # 字符串列存为定长 unicode，避免 pickle；astype(str) 会把 NaN 变成 'nan'，缺失位置另存掩码
+            mask = pd.isna(values)
+            values = np.where(mask, '', values).astype(str)
+            np.save(os.path.join(tmp_dir, f"{i}.mask.npy"), mask)
+            entry['mask'] = True
+        np.save(os.path.join(tmp_dir, f"{i}.npy"), values)
+        entry['dtype'] = values.dtype.str
+        columns.append(entry)
+
+    meta = {
+        'key': source_key(data_path),
+        'index_name': df.index.name,
+        'index_tz': str(df.index.tz) if getattr(df.index, 'tz', None) is not None else None,
+        # 索引统一按纳秒存储，读取时还原为原来的精度 (pandas 解析出的时间可能是 us)
+        'index_unit': getattr(df.index, 'unit', 'ns'),
+        'rows': len(df),
+        'columns': columns,
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    os.replace(tmp_dir, cache_dir)
+
+
+def load_column(cache_dir, i, col, mmap_mode=None):
+    """
+    读取第 i 列；带缺失值掩码的字符串列还原为 object 数组 (缺失位置为 NaN)，其余列按 mmap_mode 读取
+    """
+    values = np.load(os.path.join(cache_dir, f"{i}.npy"), mmap_mode=mmap_mode)
+    if not col.get('mask'):
+        return values
+    mask = np.load(os.path.join(cache_dir, f"{i}.mask.npy"))
+    values = values.astype(object)
+    values[mask] = np.nan
+    return values
+
+
+def load_frame(cache_dir, mmap_mode=None):
+    """
+    从列式缓存还原 DataFrame (与写入前的预处理结果一致)
+    """
+    meta = read_meta(cache_dir)
+    index = np.load(os.path.join(cache_dir, '__index__.npy'), mmap_mode=mmap_mode)
+    data = {col['name']: load_column(cache_dir, i, col, mmap_mode) for i, col in enumerate(meta['columns'])}
+    return pd.DataFrame(data, index=time_index(index, meta))
+
+
+def time_index(index, meta):
+    """
+    int64 纳秒时间戳 -> 与写入前一致的 DatetimeIndex (名称、时区与精度)
+    """
+    result = pd.DatetimeIndex(index.view('datetime64[ns]'), name=meta['index_name'])
+    if meta.get('index_tz'):
+        result = result.tz_localize('UTC').tz_convert(meta['index_tz'])
+    return result.as_unit(meta.get('index_unit', 'ns'))
+
+
+class OHLCVStore:
+    """
+    基于内存映射的行情存储 (读取 load_data 生成的列式缓存)
+
+    每一列都是只读的 np.memmap，按时间区间切片得到的仍是视图，不会把整段历史读入内存；
+    (字符串列例外：按掩码还原缺失值后是普通 object 数组)
+    只有实际访问到的页才会被操作系统加载，多个进程打开同一份缓存时共享页缓存。
+    """
+
+    def __init__(self, cache_dir, index=None, columns=None):
+        self.cache_dir = cache_dir
+        self.meta = read_meta(cache_dir)
+        if self.meta is None:
+            raise FileNotFoundError(f"Data cache not found: {cache_dir}")
+        if index is None:
+            index = np.load(os.path.join(cache_dir, '__index__.npy'), mmap_mode='r')
+            columns = {col['name']: load_column(cache_dir, i, col, 'r') for i, col in enumerate(self.meta['columns'])}
+        self._index = index
+        self._columns = columns
+
+    @classmethod
+    def open(cls, data_path, cache_root=None):
+        """
+        打开数据文件对应的缓存 (缓存须由 BacktestEngine.load_data 预先生成且未过期)
+        """
+        cache_dir = cache_dir_for(data_path, cache_root)
+        if not is_valid(cache_dir, data_path):
+            raise FileNotFoundError(f"Data cache missing or stale for {data_path}, run load_data first")
+        return cls(cache_dir)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, name):
+        """
+        返回单列的只读视图 (零拷贝)
+        """
+        return self._columns[name]
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def index(self):
+        return time_index(self._index, self.meta)
+
+    def _to_ns(self, ts):
+        ts = pd.Timestamp(ts)
+        if self.meta.get('index_tz'):
+            ts = ts.tz_localize(self.meta['index_tz']) if ts.tzinfo is None else ts
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        return ts.as_unit('ns').value
+
+    def between(self, start=None, end=None):
+        """
+        按时间区间 [start, end] 切片，返回共享底层内存映射的新 OHLCVStore
+        """
+        lo = 0 if start is None else int(np.searchsorted(self._index, self._to_ns(start), side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self._index, self._to_ns(end), side='right'))
+        columns = {name: values[lo:hi] for name, values in self._columns.items()}
+        return OHLCVStore(self.cache_dir, self._index[lo:hi], columns)
+
+    def to_frame(self, columns=None):
+        """
+        用指定列构造 DataFrame；数值列直接引用内存映射 (copy=False)，不复制数据
+        """
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: self._columns[name] for name in columns}, index=self.index, copy=False)
@@ -0,0 +1,185 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class RollingMean:
+    """
+    O(1) 更新的滚动均值 (Kahan 补偿求和，避免长时间运行后的累积误差)
+
+    NaN / ±inf 不进入求和，只记录窗口内的个数：窗口内有这样的值时输出 NaN，移出窗口后恢复正常，
+    与 rolling(n).mean() 一致 (一个缺失的收盘价不会让之后的均值永远是 NaN)
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.window = deque()
+        self.missing = 0  # 窗口内 NaN / ±inf 的个数
+        self._sum = 0.0
+        self._comp = 0.0
+
+    def _add(self, x):
+        y = x - self._comp
+        t = self._sum + y
+        self._comp = (t - self._sum) - y
+        self._sum = t
+
+    def update(self, x):
+        """
+        加入新值，返回当前均值 (窗口未满时为 NaN，与 rolling(n).mean() 一致)
+        """
+        self.window.append(x)
+        if math.isfinite(x):
+            self._add(x)
+        else:
+            self.missing += 1
+        if len(self.window) > self.n:
+            old = self.window.popleft()
+            if math.isfinite(old):
+                self._add(-old)
+            else:
+                self.missing -= 1
+        if len(self.window) < self.n or self.missing:
+            return np.nan
+        return self._sum / self.n
+
+
+class IncrementalDualMA:
+    """
+    增量版 DualMA 回测：逐根K线推进信号、仓位与资金曲线，每根K线 O(1)
+
+    信号逻辑与 strategies/DualMA.py 一致，资金曲线与绩效口径与 BacktestEngine.calculate_equity /
+    calculate_performance 一致。实盘中只需对新K线调用 update，而不必重跑整段历史。
+    """
+
+    def __init__(self, short_n, long_n, stop_loss=0.10, initial_capital=10000.0, fee_rate=0.0005, slippage=0.0001):
+        self.stop_loss = stop_loss
+        self.initial_capital = initial_capital
+        self.cost_rate = fee_rate + slippage
+        self.short_ma = RollingMean(short_n)
+        self.long_ma = RollingMean(long_n)
+
+        # 信号状态机
+        self.prev_short = np.nan
+        self.prev_long = np.nan
+        self.signal = 0
+        self.entry_price = 0.0
+        self.held = 0  # 状态机内部仓位 (数据无效的K线上 signal 为 0 但仓位保持)
+
+        # 资金曲线状态
+        self.bars = 0
+        self.first_time = None
+        self.last_time = None
+        self.prev_close = np.nan
+        self.position = 0.0
+        self.net_value = 1.0
+        self.running_max = 1.0
+        self.max_drawdown = 0.0
+        self.action_count = 0
+        self.holding_bars = 0
+        self.win_bars = 0
+        # Welford 在线方差 (用于夏普比率)
+        self._ret_mean = 0.0
+        self._ret_m2 = 0.0
+
+    def _next_signal(self, close, curr_short, curr_long):
+        prev_short, prev_long = self.prev_short, self.prev_long
+        self.prev_short, self.prev_long = curr_short, curr_long
+
+        # 第 0 根K线与均线未就绪的K线不处理
+        if self.bars == 1 or math.isnan(curr_short) or math.isnan(curr_long):
+            return 0
+
+        # 止损逻辑
+        if self.held == 1 and close <= self.entry_price * (1 - self.stop_loss):
+            self.held = 0
+            return 0
+
+        # 金叉开仓 / 死叉平仓
+        if prev_short <= prev_long and curr_short > curr_long:
+            if self.held == 0:
+                self.held = 1
+                self.entry_price = close
+        elif prev_short >= prev_long and curr_short < curr_long:
+            if self.held == 1:
+                self.held = 0
+                self.entry_price = 0.0
+        return self.held
+
+    def update(self, timestamp, close):
+        """
+        推进一根K线
+
+        返回:
+            dict: 当前K线的 signal / position / net_value / equity
+        """
+        self.bars += 1
+        if self.first_time is None:
+            self.first_time = timestamp
+        self.last_time = timestamp
+
+        # 1. 仓位：上一根K线收盘时的信号在本K线执行
+        prev_position = self.position
+        position = float(self.signal)
+        position_change = abs(position - prev_position) if self.bars > 1 else 0.0
+        if self.bars == 1 or position != prev_position:
+            self.action_count += 1
+
+        # 2-5. 单期收益与成本
+        pct_change = close / self.prev_close - 1 if self.bars > 1 else 0.0
+        if math.isnan(pct_change):
+            pct_change = 0.0
+        net_return = position * pct_change - position_change * self.cost_rate
+
+        # 6-7. 净值、回撤与收益统计
+        self.net_value *= 1 + net_return
+        self.running_max = max(self.running_max, self.net_value)
+        self.max_drawdown = min(self.max_drawdown, (self.net_value - self.running_max) / self.running_max)
+        delta = net_return - self._ret_mean
+        self._ret_mean += delta / self.bars
+        self._ret_m2 += delta * (net_return - self._ret_mean)
+        if position != 0:
+            self.holding_bars += 1
+            if net_return > 0:
+                self.win_bars += 1
+
+        # 本K线收盘后的新信号
+        self.signal = self._next_signal(close, self.short_ma.update(close), self.long_ma.update(close))
+        self.position = position
+        self.prev_close = close
+
+        return {
+            'signal': self.signal,
+            'position': position,
+            'net_value': self.net_value,
+            'equity': self.net_value * self.initial_capital,
+        }
+
+    def update_batch(self, df):
+        """
+        按顺序推进一批K线 (df 需以 candle_begin_time 为索引并包含 close 列)，返回最后一根K线的状态
+        """
+        state = None
+        for timestamp, close in zip(df.index, df['close'].to_numpy(dtype=np.float64)):
+            state = self.update(timestamp, float(close))
+        return state
+
+    def performance(self):
+        """
+        当前累计绩效 (口径与 BacktestEngine.calculate_performance 相同，返回数值)
+        """
+        if self.bars == 0:
+            return None
+        days = (pd.Timestamp(self.last_time) - pd.Timestamp(self.first_time)).days
+        std = math.sqrt(self._ret_m2 / (self.bars - 1)) if self.bars > 1 else np.nan
+        return {
+            'Total Return': self.net_value - 1,
+            'Annualized Return': self.net_value ** (365 / days) - 1 if days > 0 else 0,
+            'Max Drawdown': self.max_drawdown,
+            'Sharpe Ratio': np.sqrt(365 * 24) * self._ret_mean / std if std and not math.isnan(std) else 0,
+            'Trade Count': self.action_count,
+            'Win Rate (Per Candle)': self.win_bars / self.holding_bars if self.holding_bars else 0,
+            'Final Equity': self.net_value * self.initial_capital,
+        }
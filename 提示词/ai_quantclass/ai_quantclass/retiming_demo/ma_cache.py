@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+
+class MovingAverageCache:
+    """
+    寻参用的均线缓存
+
+    参数遍历时大量组合共用同一个均线窗口 (如 10 个 short × 9 个 long)，
+    这里把所有需要的窗口一次性算好，存成 (n_rows × n_windows) 的 float64 矩阵，
+    信号函数通过 get(n) 直接读取对应列，不再重复 rolling。
+    """
+
+    def __init__(self, windows, matrix):
+        self.windows = [int(n) for n in windows]
+        self.matrix = matrix
+        self._col = {n: i for i, n in enumerate(self.windows)}
+
+    @classmethod
+    def build(cls, close, windows, out=None):
+        """
+        计算所有窗口的简单移动平均
+
+        参数:
+            close (pd.Series | np.ndarray): 收盘价
+            windows (iterable): 需要缓存的均线窗口 (自动去重并排序)
+            out (np.ndarray): 可选，预先分配的 (n_rows × n_windows) 矩阵 (如共享内存)
+
+        注意: 每个窗口仍使用 pandas rolling().mean() 计算，保证与未缓存时的信号完全一致；
+        节省的是重复窗口的计算量。
+        """
+        windows = sorted(set(int(n) for n in windows))
+        close = pd.Series(np.asarray(close, dtype=np.float64))
+        if out is None:
+            out = np.empty((len(close), len(windows)), dtype=np.float64)
+        for i, n in enumerate(windows):
+            out[:, i] = close.rolling(window=n).mean().values
+        return cls(windows, out)
+
+    def __contains__(self, n):
+        return n in self._col
+
+    def get(self, n):
+        """
+        返回窗口 n 的均线 (矩阵列视图，不拷贝)
+        """
+        return self.matrix[:, self._col[n]]
+
+    def take(self, windows):
+        """
+        按窗口列表取出均线矩阵 (N, len(windows))，列可以重复 (会拷贝)
+        """
+        return self.matrix[:, [self._col[n] for n in windows]]
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def report(self):
+        return (f"MA cache: {len(self.windows)} windows x {self.matrix.shape[0]:,} rows "
+                f"= {self.nbytes / 1024 ** 2:.1f} MB")
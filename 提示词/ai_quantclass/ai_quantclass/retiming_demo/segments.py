@@ -0,0 +1,219 @@
+import numpy as np
+
+# 仓位取值 (不含 0) 超过这个数量时不按区间计算，每个取值都要一张前缀累乘表
+MAX_LEVELS = 8
+
+
+class DrawdownTree:
+    """
+    序列上任意区间 [s, e) 的最大值、最小值与最大回撤 (线段树，自底向上批量查询)
+
+    回撤以比值保存：ratio = min(values[t] / max(values[s..t])) ≤ 1，最大回撤为 ratio - 1。
+    两个相邻区间合并时 ratio = min(左 ratio, 右 ratio, 右最小值 / 左最大值)。
+    """
+
+    def __init__(self, values):
+        n = len(values)
+        self.size = size = 1 << max(n - 1, 0).bit_length()
+        # 补齐的叶子为 NaN，fmin / fmax 会忽略它们
+        self.hi = np.full(2 * size, np.nan)
+        self.lo = np.full(2 * size, np.nan)
+        self.ratio = np.full(2 * size, np.nan)
+        self.hi[size:size + n] = values
+        self.lo[size:size + n] = values
+        self.ratio[size:size + n] = 1.0
+        width = size
+        while width > 1:
+            parent = slice(width // 2, width)
+            left, right = slice(width, 2 * width, 2), slice(width + 1, 2 * width, 2)
+            self.hi[parent] = np.fmax(self.hi[left], self.hi[right])
+            self.lo[parent] = np.fmin(self.lo[left], self.lo[right])
+            with np.errstate(invalid='ignore'):
+                cross = self.lo[right] / self.hi[left]
+            self.ratio[parent] = np.fmin(np.fmin(self.ratio[left], self.ratio[right]), cross)
+            width //= 2
+
+    def query(self, starts, ends):
+        """
+        每个区间 [starts[i], ends[i]) 的 (最大值, 最小值, 回撤比值)，区间不能为空
+        """
+        l = np.asarray(starts, dtype=np.int64) + self.size
+        r = np.asarray(ends, dtype=np.int64) + self.size
+        # 左右两侧分别从外向内累积，最后左侧在前合并
+        l_hi, l_lo, l_ratio = (np.full(len(l), np.nan) for _ in range(3))
+        r_hi, r_lo, r_ratio = (np.full(len(l), np.nan) for _ in range(3))
+        with np.errstate(invalid='ignore'):
+            while True:
+                active = l < r
+                if not active.any():
+                    break
+                take = active & (l & 1 == 1)
+                node = l[take]
+                l_ratio[take] = np.fmin(np.fmin(l_ratio[take], self.ratio[node]), self.lo[node] / l_hi[take])
+                l_hi[take] = np.fmax(l_hi[take], self.hi[node])
+                l_lo[take] = np.fmin(l_lo[take], self.lo[node])
+                l[take] += 1
+
+                take = active & (r & 1 == 1)
+                r[take] -= 1
+                node = r[take]
+                r_ratio[take] = np.fmin(np.fmin(self.ratio[node], r_ratio[take]), r_lo[take] / self.hi[node])
+                r_hi[take] = np.fmax(r_hi[take], self.hi[node])
+                r_lo[take] = np.fmin(r_lo[take], self.lo[node])
+
+                l >>= 1
+                r >>= 1
+            ratio = np.fmin(np.fmin(l_ratio, r_ratio), r_lo / l_hi)
+        return np.fmax(l_hi, r_hi), np.fmin(l_lo, r_lo), ratio
+
+
+class SegmentTables:
+    """
+    按仓位区间计算绩效所需的前缀表 (所有参数组共用，每种仓位取值的累乘表按需建立一次)
+
+    参数:
+        pct_change (np.ndarray): 单期涨跌幅 (首个元素为 0，NaN 已填 0)
+    """
+
+    def __init__(self, pct_change):
+        self.pct_change = pct_change
+        self.sum1 = np.cumsum(pct_change)
+        self.sum2 = np.cumsum(pct_change * pct_change)
+        self.up = np.cumsum(pct_change > 0)
+        self.down = np.cumsum(pct_change < 0)
+        self._levels = {}
+
+    def level(self, p):
+        """
+        仓位 p 的 (前缀累乘 G_p, DrawdownTree)；1 + p × pct_change 出现非正数或累乘超出安全范围时为 None
+        """
+        if p not in self._levels:
+            growth = 1 + p * self.pct_change
+            prefix = np.cumprod(growth)
+            safe = (growth > 0).all() and prefix.min() > 1e-200 and prefix.max() < 1e200
+            self._levels[p] = (prefix, DrawdownTree(prefix)) if safe else None
+        return self._levels[p]
+
+
+def change_points(signals, block_rows=2048):
+    """
+    所有参数组的仓位区间起点，按 (参数组, K线) 排序
+
+    仓位 = 上一根K线的信号 (NaN 视为 0，最后一根K线的信号不参与)：t = 1 时信号非 0、t >= 2 时信号变化即换仓；
+    每组另有一个从 t = 0 开始的空仓区间。按行分块扫描整块矩阵 (连续内存)，每块只生成一个布尔矩阵。
+
+    返回:
+        (col, start, level): 区间所属参数组、起点K线与区间内的仓位 (float64)
+    """
+    n, k = signals.shape
+    cols = [np.arange(k), np.flatnonzero(np.nan_to_num(signals[0]) != 0)]
+    starts = [np.zeros(k, dtype=np.int64), np.ones(len(cols[1]), dtype=np.int64)]
+    levels = [np.zeros(k), np.nan_to_num(signals[0, cols[1]].astype(np.float64))]
+    for row in range(0, n - 2, block_rows):
+        block = signals[row:min(row + block_rows, n - 2) + 1]
+        if block.dtype.kind == 'f' and np.isnan(block).any():
+            block = np.nan_to_num(block, nan=0.0)
+        flat = np.flatnonzero(block[1:] != block[:-1])
+        i, j = np.divmod(flat, k)
+        cols.append(j)
+        starts.append(row + i + 2)
+        levels.append(block[i + 1, j].astype(np.float64))
+    col, start, level = np.concatenate(cols), np.concatenate(starts), np.concatenate(levels)
+    order = np.argsort(col * (n + 1) + start, kind='stable')
+    return col[order], start[order], level[order]
+
+
+def segment_performance(signals, tables, cost_rate, chunk_size=256):
+    """
+    按仓位区间计算所有参数组的绩效，口径与 BacktestEngine.calculate_equity_batch 的逐K线计算一致
+
+    同一仓位 p 持续的区间 [s, e) 内，除了换仓的第一根K线 (要扣除成本)，单期净收益都是 p × pct_change，
+    所以区间内收益的和、平方和与盈利K线数都能用前缀和查出；净值按 G_p[t] / G_p[s] 增长，
+    区间内的最高点、最低点与最大回撤由 DrawdownTree 查询。整块信号矩阵只扫描一遍找出换仓点，
+    之后每组参数的计算量与换仓次数成正比。
+
+    参数:
+        signals (np.ndarray): 信号矩阵 (K线数 × 参数组数)，NaN 视为 0
+        tables (SegmentTables): 前缀表
+        cost_rate (float): 手续费率 + 滑点
+        chunk_size (int): 每次累乘净值的参数组数，控制 (参数组数 × 最多区间数) 矩阵的内存
+
+    返回:
+        dict: 'final' (期末净值) 与 'Max Drawdown' / 'Sharpe Ratio' / 'Trade Count' / 'Win Rate (Per Candle)'，
+              每组一个值；仓位取值过多或累乘不安全时返回 None (调用方改用逐K线计算)
+    """
+    n, k = signals.shape
+    col, start, level = change_points(signals)
+    levels = np.unique(level[level != 0])
+    if len(levels) > MAX_LEVELS or any(tables.level(p) is None for p in levels):
+        return None
+
+    first_seg = np.r_[True, col[1:] != col[:-1]]
+    last_seg = np.r_[col[1:] != col[:-1], True]
+    end = np.where(last_seg, n, np.r_[start[1:], 0])
+    prev_level = np.where(first_seg, 0.0, np.r_[0.0, level[:-1]])
+
+    # 换仓K线的净收益与逐K线计算完全相同：position * pct_change - position_change * cost_rate
+    first_return = level * tables.pct_change[start] - np.abs(level - prev_level) * cost_rate
+
+    # 区间内其余K线 (s, e) 的收益和、平方和与盈利K线数
+    last = end - 1
+    sum_r = first_return + level * (tables.sum1[last] - tables.sum1[start])
+    sum_r2 = first_return * first_return + level * level * (tables.sum2[last] - tables.sum2[start])
+    held = level != 0
+    holding = np.where(held, end - start, 0)
+    wins = (held & (first_return > 0)).astype(np.int64)
+    wins += np.where(level > 0, tables.up[last] - tables.up[start], 0)
+    wins += np.where(level < 0, tables.down[last] - tables.down[start], 0)
+
+    # 区间内相对换仓K线的净值：增长倍数、最高、最低与回撤比值 (空仓区间全为 1)
+    growth, seg_hi, seg_lo, seg_ratio = (np.ones(len(col)) for _ in range(4))
+    for p in levels:
+        prefix, tree = tables.level(p)
+        idx = np.flatnonzero(level == p)
+        base = prefix[start[idx]]
+        hi, lo, ratio = tree.query(start[idx], end[idx])
+        growth[idx] = prefix[last[idx]] / base
+        seg_hi[idx] = hi / base
+        seg_lo[idx] = lo / base
+        seg_ratio[idx] = ratio
+
+    counts = np.bincount(col, minlength=k)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    factor = (1 + first_return) * growth
+    final = np.empty(k)
+    drawdown = np.empty(len(col))
+    for lo_col in range(0, k, chunk_size):
+        hi_col = min(lo_col + chunk_size, k)
+        segs = slice(offsets[lo_col], offsets[hi_col] if hi_col < k else len(col))
+        # 沿每组的区间顺序累乘净值、累计最高点 (按组补齐成矩阵，沿行连续计算)
+        row = col[segs] - lo_col
+        pos = np.arange(segs.start, segs.stop) - offsets[col[segs]]
+        width = counts[lo_col:hi_col].max()
+        grid = np.ones((hi_col - lo_col, width))
+        grid[row, pos] = factor[segs]
+        np.cumprod(grid, axis=1, out=grid)
+        final[lo_col:hi_col] = grid[np.arange(hi_col - lo_col), counts[lo_col:hi_col] - 1]
+        entry = np.where(pos > 0, grid[row, np.maximum(pos - 1, 0)], 1.0) * (1 + first_return[segs])
+
+        grid.fill(-np.inf)
+        grid[row, pos] = entry * seg_hi[segs]
+        np.maximum.accumulate(grid, axis=1, out=grid)
+        peak_before = np.where(pos > 0, grid[row, np.maximum(pos - 1, 0)], entry)
+        drawdown[segs] = np.minimum(entry * seg_lo[segs] / peak_before, seg_ratio[segs]) - 1
+
+    mean = np.add.reduceat(sum_r, offsets) / n
+    var = (np.add.reduceat(sum_r2, offsets) - mean * mean * n) / (n - 1)
+    std = np.sqrt(np.maximum(var, 0))
+    holding_count = np.add.reduceat(holding, offsets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std != 0, np.sqrt(365 * 24) * mean / std, 0)
+        win_rate = np.where(holding_count > 0, np.add.reduceat(wins, offsets) / holding_count, 0)
+    return {
+        'final': final,
+        'Max Drawdown': np.minimum.reduceat(drawdown, offsets),
+        'Sharpe Ratio': sharpe,
+        # 与 (position != position.shift(1)).sum() 一致：首行计一次，之后每个换仓点计一次
+        'Trade Count': counts,
+        'Win Rate (Per Candle)': win_rate,
+    }
@@ -0,0 +1,261 @@
+import pandas as pd
+import numpy as np
+
+# 策略所需的行情列 (内存映射模式下引擎只为这些列构造视图)
+required_columns = ['close']
+
+def signal(df, params, factor_name):
+    """
+    计算择时信号 (Dual Moving Average with Stop Loss)
+
+    参数:
+        df (pd.DataFrame): 包含OHLCV数据的原始DataFrame
+        params (dict): 策略参数，必须包含 'short_n', 'long_n', 可选 'stop_loss' (默认0.10)，
+                       可选 'ma_cache' (MovingAverageCache，寻参时共享的均线缓存)
+        factor_name (str): 因子/信号的列名
+
+    返回:
+        pd.DataFrame: 只含 close 与因子列的新 DataFrame (不复制、不修改输入的整表)
+    """
+    short_n = params.get('short_n', 10)
+    long_n = params.get('long_n', 60)
+    stop_loss = params.get('stop_loss', 0.10)
+    ma_cache = params.get('ma_cache')
+
+    # 计算均线 (命中缓存时直接读取缓存列)
+    if ma_cache is not None and short_n in ma_cache:
+        short_ma = ma_cache.get(short_n)
+    else:
+        short_ma = df['close'].rolling(window=short_n).mean().values
+    if ma_cache is not None and long_n in ma_cache:
+        long_ma = ma_cache.get(long_n)
+    else:
+        long_ma = df['close'].rolling(window=long_n).mean().values
+
+    # 状态机内核 (按交易而不是按K线推进)
+    positions = dual_ma_positions(df['close'].values, short_ma, long_ma, stop_loss)
+
+    return pd.DataFrame({'close': df['close'], factor_name: positions}, index=df.index)
+
+
+def dual_ma_positions(closes, short_mas, long_mas, stop_loss=0.10):
+    """
+    双均线 + 止损 状态机的数组化实现
+
+    与逐K线遍历的 dual_ma_positions_loop 输出完全一致 (bit-identical)，计算由 dual_ma_positions_batch 完成。
+
+    参数:
+        closes (np.ndarray): 收盘价
+        short_mas (np.ndarray): 短期均线 (预热期为 NaN)
+        long_mas (np.ndarray): 长期均线 (预热期为 NaN)
+        stop_loss (float): 止损比例
+
+    返回:
+        np.ndarray: int64 信号数组，1 持仓 / 0 空仓
+    """
+    short_mas = np.asarray(short_mas, dtype=np.float64)[:, None]
+    long_mas = np.asarray(long_mas, dtype=np.float64)[:, None]
+    return dual_ma_positions_batch(closes, short_mas, long_mas, stop_loss)[:, 0]
+
+
+def dual_ma_positions_batch(closes, short_mas, long_mas, stop_loss=0.10, max_elements=1 << 22):
+    """
+    多组参数的双均线 + 止损信号，按列 (参数组) 分块整体计算，每一列与 dual_ma_positions_loop 完全一致
+
+    状态机拆成三步，都不再逐笔交易调用 NumPy:
+        1. 所有参数组的金叉 / 死叉一次比较得到
+        2. 把每个金叉都当作候选入场点，一次性求出它的出场K线：之后第一次死叉与第一次止损中较早者。
+           止损K线只取决于入场K线 (与均线参数无关)，按入场K线去重后用区间最小值稀疏表一次求出
+        3. 入场点 -> 出场后第一个金叉 构成链表，从第一个金叉出发可达的点就是实际发生的交易 (倍增求可达)
+
+    参数:
+        closes (np.ndarray): 收盘价 (N,)
+        short_mas (np.ndarray): 短期均线矩阵 (N, K)
+        long_mas (np.ndarray): 长期均线矩阵 (N, K)
+        stop_loss (float): 止损比例
+        max_elements (int): 每块的元素个数上限 (N × 列数)，控制中间矩阵的内存
+
+    返回:
+        np.ndarray: (N, K) int64 信号矩阵，1 持仓 / 0 空仓
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    short_mas = np.asarray(short_mas, dtype=np.float64)
+    long_mas = np.asarray(long_mas, dtype=np.float64)
+    n, k = short_mas.shape
+    signals = np.zeros((n, k), dtype=np.int64)
+    if n < 2:
+        return signals
+    # 止损查询用的区间最小值稀疏表，所有参数组共用
+    lows = _min_table(closes)
+    chunk = max(max_elements // n, 1)
+    for start in range(0, k, chunk):
+        cols = slice(start, min(start + chunk, k))
+        _positions_block(closes, short_mas[:, cols], long_mas[:, cols], stop_loss, lows, signals[:, cols])
+    return signals
+
+
+def _next_in(keys, queries):
+    """
+    keys 中严格大于 queries 的第一个元素的下标 (keys 升序)，没有时为 len(keys)
+    """
+    return np.searchsorted(keys, queries, side='right')
+
+
+def _min_table(closes):
+    """
+    区间最小值稀疏表：第 L 层第 t 个元素为 closes[t:t + 2^L] 的最小值。
+    收盘价为 NaN 的K线按 +inf 处理，不会触发止损 (与原始循环的比较结果一致)
+    """
+    lows = [np.where(np.isnan(closes), np.inf, closes)]
+    while (1 << len(lows)) <= len(closes):
+        half = 1 << (len(lows) - 1)
+        lows.append(np.minimum(lows[-1][:-half], lows[-1][half:]))
+    return lows
+
+
+def _first_stop(lows, closes, bars, stop_loss):
+    """
+    每个入场K线之后第一根 收盘价 <= 入场价 × (1 - stop_loss) 的K线，没有时为 n
+
+    二进制跳跃：从入场后一根开始，只要接下来 2^L 根的最低价都高于止损价就整段跳过
+    """
+    n = len(closes)
+    stop_price = closes[bars] * (1 - stop_loss)
+    pos = bars + 1
+    for level in range(len(lows) - 1, -1, -1):
+        table = lows[level]
+        ok = pos < len(table)
+        ok[ok] = table[pos[ok]] > stop_price[ok]
+        pos[ok] += 1 << level
+    return np.minimum(pos, n)
+
+
+def _positions_block(closes, short_mas, long_mas, stop_loss, lows, out):
+    """
+    一块参数组的信号，写入 out (N, 列数)，out 初始为 0
+    """
+    n, k = short_mas.shape
+
+    # 有效K线：均线均不为 NaN (第 0 根K线上不会有金叉 / 死叉，原始循环从第 1 根开始也一致)
+    valid = ~(np.isnan(short_mas) | np.isnan(long_mas))
+
+    # 金叉 / 死叉：与原始循环相同的比较 (NaN 参与比较结果为 False)，
+    # 在均线都有效的K线上 a <= b 即 not (a > b)，每个矩阵只比较两次
+    above = short_mas > long_mas
+    below = short_mas < long_mas
+    golden = np.zeros((n, k), dtype=bool)
+    death = np.zeros((n, k), dtype=bool)
+    golden[1:] = valid[:-1] & ~above[:-1] & above[1:]
+    death[1:] = valid[:-1] & ~below[:-1] & below[1:]
+
+    # 按 (参数组, K线) 排序的全局键 col * n + t，不同参数组之间互不干扰
+    # (按行扫描连续内存找出交叉点后再排序，交叉点远少于矩阵元素)
+    g_key = _cross_keys(golden, n)
+    d_key = _cross_keys(death, n)
+    if len(g_key) == 0:
+        return
+    g_col, g_bar = np.divmod(g_key, n)
+    d_col, d_bar = np.divmod(d_key, n)
+
+    # 每个候选入场点之后的第一次死叉 (同一参数组内，没有时为 n)
+    i = _next_in(d_key, g_key)
+    next_death = np.full(len(g_key), n)
+    found = i < len(d_key)
+    found[found] = d_col[i[found]] == g_col[found]
+    next_death[found] = d_bar[i[found]]
+
+    # 止损：入场后第一根 有效 且 收盘价 <= 入场价 × (1 - stop_loss) 的K线。
+    # 止损K线只取决于入场K线，与参数组无关，按入场K线去重后一次求出
+    bars, inverse = np.unique(g_bar, return_inverse=True)
+    stop_bar = _first_stop(lows, closes, bars, stop_loss)[inverse]
+    # 命中的K线在该参数组中无效 (均线为 NaN，原始循环跳过该K线)：逐个继续扫描到死叉
+    for j in np.flatnonzero((stop_bar < next_death) & ~valid[np.minimum(stop_bar, n - 1), g_col]):
+        col = g_col[j]
+        stop_price = closes[g_bar[j]] * (1 - stop_loss)
+        window = slice(stop_bar[j] + 1, next_death[j] + 1)
+        stop_hit = valid[window, col] & (closes[window] <= stop_price)
+        stop_bar[j] = stop_bar[j] + 1 + int(np.argmax(stop_hit)) if stop_hit.any() else n
+
+    exit_bar = np.minimum(stop_bar, next_death)
+
+    # 出场后 (出场K线上的金叉不会触发入场) 的第一个金叉，-1 表示该参数组不再有交易
+    nxt = _next_in(g_key, g_col * n + exit_bar)
+    nxt[(nxt >= len(g_key)) | (exit_bar >= n)] = -1
+    nxt[nxt >= 0] = np.where(g_col[nxt[nxt >= 0]] == g_col[nxt >= 0], nxt[nxt >= 0], -1)
+
+    # 每个参数组的第一个金叉就是第一笔交易，实际交易 = 从它出发沿链表可达的金叉。
+    # 倍增：第 j 轮之后 on 为 2^j 步以内可达的点，jump 为一次跳 2^j 步 (m 为终点哨兵)
+    m = len(g_key)
+    jump = np.r_[np.where(nxt >= 0, nxt, m), m]
+    on = np.zeros(m + 1, dtype=bool)
+    on[np.flatnonzero(np.r_[True, g_col[1:] != g_col[:-1]])] = True
+    for _ in range(int(m).bit_length()):
+        on[jump[on]] = True
+        jump = jump[jump]
+    entries = np.flatnonzero(on[:m])
+
+    # 持仓区间 [入场, 出场)：差分后沿时间累加 (同一参数组的区间互不重叠，差分与累加结果只有 0 / 1)
+    delta = np.zeros((n + 1, k), dtype=np.int8)
+    delta[g_bar[entries], g_col[entries]] = 1
+    delta[exit_bar[entries], g_col[entries]] -= 1
+    held = np.cumsum(delta[:n], axis=0, dtype=np.int8)
+
+    # 无效K线在原始循环中直接 continue，信号保持为 0 (但不改变仓位状态)
+    held &= valid
+    out[:] = held
+
+
+def _cross_keys(cross, n):
+    """
+    布尔矩阵 (N, 列数) 中为 True 的位置，按 列 * n + K线 的全局键升序返回
+    """
+    rows, cols = np.divmod(np.flatnonzero(cross), cross.shape[1])
+    return np.sort(cols * n + rows)
+
+
+def dual_ma_positions_loop(closes, short_mas, long_mas, stop_loss=0.10):
+    """
+    逐K线遍历的参考实现 (原始版本)，用于校验 dual_ma_positions 的一致性
+    """
+    # 信号列表
+    signals = [0] * len(closes)
+
+    # 状态变量
+    position = 0 # 0: 空仓, 1: 持仓
+    entry_price = 0.0
+
+    for i in range(1, len(closes)):
+        # 获取当前与前一时刻的数据
+        curr_close = closes[i]
+        curr_short = short_mas[i]
+        curr_long = long_mas[i]
+        prev_short = short_mas[i-1]
+        prev_long = long_mas[i-1]
+
+        # 检查数据有效性
+        if np.isnan(curr_short) or np.isnan(curr_long):
+            continue
+
+        # 止损逻辑
+        if position == 1:
+            # 检查是否触发止损
+            if curr_close <= entry_price * (1 - stop_loss):
+                position = 0 # 平仓
+                signals[i] = 0
+                continue # 本K线结束
+
+        # 金叉：短期上穿长期 -> 做多
+        if prev_short <= prev_long and curr_short > curr_long:
+            if position == 0:
+                position = 1
+                entry_price = curr_close # 以收盘价作为参考入场价
+
+        # 死叉：短期下穿长期 -> 平仓
+        elif prev_short >= prev_long and curr_short < curr_long:
+            if position == 1:
+                position = 0
+                entry_price = 0.0
+
+        signals[i] = position
+
+    return np.array(signals, dtype=np.int64)
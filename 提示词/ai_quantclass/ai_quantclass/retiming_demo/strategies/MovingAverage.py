@@ -1,5 +1,8 @@
 import pandas as pd
 
+# 策略所需的行情列 (内存映射模式下引擎只为这些列构造视图)
+required_columns = ['close']
+
 def signal(df, params, factor_name):
     """
     计算择时信号 (Moving Average)
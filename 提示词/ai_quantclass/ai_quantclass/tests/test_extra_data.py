@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_close
+from factor_engine import panel as P
+from factor_engine.benchmark import make_fake_extra, make_fake_universe
+from factor_engine.extra_data import ExtraData
+from factor_engine.harness import run_factors
+from factor_engine.loader import load_factor
+from factor_engine.market_corr import MarketMoments, market_returns
+from factor_engine.panel import Panel, evaluate
+
+FACTORS = ['MarketCap', 'TurnoverRate', '市值因子', '换手率因子', 'CorrBTC']
+
+
+@pytest.fixture(scope='module')
+def data():
+    long_df = make_fake_universe(20, 400).drop(columns='circulating_supply')
+    cap_df, btc_df = make_fake_extra(20, 400)
+    return long_df, cap_df, btc_df
+
+
+def test_attach_matches_merge_asof(data):
+    long_df, cap_df, btc_df = data
+    extra = ExtraData({'coin-cap': cap_df, 'coin-btc': btc_df})
+    for symbol, df in long_df.groupby('symbol'):
+        df = df.reset_index(drop=True)
+        actual = extra.attach(df, symbol, FACTORS)
+        cap = cap_df[cap_df['symbol'] == symbol].drop(columns='symbol').sort_values('candle_begin_time')
+        expected = pd.merge_asof(pd.merge_asof(df, cap, on='candle_begin_time'), btc_df, on='candle_begin_time')
+        assert_close(actual['circulating_supply'], expected['circulating_supply'], rtol=0, atol=0)
+        assert_close(actual['btc_close'], expected['btc_close'], rtol=0, atol=0)
+    joins = extra.stats['join']
+    extra.attach(df, symbol, FACTORS)  # 同一币种、同一段K线再次合并直接命中缓存
+    assert extra.stats['join'] == joins and extra.stats['hit'] == 2
+
+
+def test_panel_market_cap_matches_per_symbol(data):
+    long_df, cap_df, btc_df = data
+    extra = ExtraData({'coin-cap': cap_df, 'coin-btc': btc_df})
+    panel = extra.attach_panel(Panel.from_long(long_df), FACTORS)
+    by_symbol = pd.concat([extra.attach(df.reset_index(drop=True), symbol, FACTORS)
+                           for symbol, df in long_df.groupby('symbol')], ignore_index=True)
+    by_symbol = by_symbol.sort_values(['candle_begin_time', 'symbol'], ignore_index=True)  # 与 to_long 的行顺序一致
+    assert_close(panel.to_long(evaluate('MarketCap', panel, 1), 'v')['v'],
+                 run_factors(by_symbol, [('MarketCap', 1)]).iloc[:, 0])
+
+
+def test_corr_btc_panel_matches_per_symbol(data):
+    long_df, _, btc_df = data
+    extra = ExtraData({'coin-btc': btc_df})
+    panel = extra.attach_panel(Panel.from_long(long_df), ['CorrBTC'])
+    mod = load_factor('CorrBTC')
+    expected = np.full(panel.shape, np.nan)
+    for symbol, df in long_df.groupby('symbol', sort=True):
+        df = extra.attach(df.reset_index(drop=True), symbol, ['CorrBTC'])
+        rows = panel.index.get_indexer(df['candle_begin_time'])
+        expected[rows, panel.symbols.index(symbol)] = mod.signal(df, 20, 'factor')['factor'].to_numpy()
+
+    with np.errstate(all='ignore'):
+        btc_ret = P.fill_finite(P.pct_change(panel['btc_close']))
+        pandas_panel = np.where(panel.listed(), P.rolling_corr(P.pct_change(panel['close']), btc_ret, 20), np.nan)
+    assert_close(pandas_panel, expected, rtol=1e-7, atol=1e-9)
+    assert_close(evaluate(mod, panel, 20), expected, rtol=1e-7, atol=1e-9)
+
+
+def window_moments_reference(x, y, n):
+    """
+    逐窗口两遍法 (先求均值再求离差) 的 (相关系数, beta)，窗口内只用 x 有效的样本
+    """
+    x_windows = np.lib.stride_tricks.sliding_window_view(np.vstack([np.full((n - 1, x.shape[1]), np.nan), x]), n, 0)
+    y_windows = np.lib.stride_tricks.sliding_window_view(np.r_[np.zeros(n - 1), y], n)[:, None, :]
+    valid = np.isfinite(x_windows)
+    count = valid.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dx = np.where(valid, x_windows - np.nansum(x_windows, axis=-1, keepdims=True) / count[..., None], 0.0)
+        dy = np.where(valid, y_windows - np.where(valid, y_windows, 0.0).sum(axis=-1, keepdims=True) / count[..., None], 0.0)
+        cov, var_x, var_y = (dx * dy).sum(axis=-1), (dx * dx).sum(axis=-1), (dy * dy).sum(axis=-1)
+        corr = np.where((count >= 2) & (var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan)
+        beta = np.where((count >= 2) & (var_y > 0), cov / var_y, np.nan)
+    return corr, beta
+
+
+@pytest.mark.parametrize('n', [2, 5, 20, 200])
+def test_market_moments_match_two_pass(n):
+    # 与逐窗口两遍法比较 (pandas 的在线算法在连续 NaN 之后自身有 1e-7 量级的误差)；
+    # 不做中心化的前缀和在 n=5 时误差约 1e-7，超出容差
+    rng = np.random.default_rng(n)
+    rows, cols = 1500, 6
+    y = market_returns(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows))))
+    close = np.exp(np.cumsum(rng.normal(0.001, 0.02, (rows, cols)), axis=0)) * rng.uniform(1e-3, 1e3, cols)
+    close[rng.random(close.shape) < 0.02] = np.nan
+    close[:300, 0] = np.nan      # 中途上市
+    close[700:760, 1] = 5.0      # 停牌：收益率为 0，方差为 0
+    x = P.pct_change(close)
+    moments = MarketMoments(y, n)
+    corr, beta = window_moments_reference(x, y, n)
+    assert_close(moments.corr(x), corr, rtol=1e-7, atol=1e-9)
+    assert_close(moments.beta(x), beta, rtol=1e-7, atol=1e-9)
+    assert_close(moments.corr(x[:, 2]), corr[:, 2], rtol=1e-7, atol=1e-9)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import assert_close
+from factor_engine.benchmark import make_fake_candles, pandas_chain
+from factor_engine.dsl import FusedKernel
+from factor_engine.graph import FactorGraph, field, shift
+from factor_engine.harness import run_factors
+from factor_engine.loader import FACTOR_DIRS, load_factor
+
+NAMES = sorted(f[:-3] for f in os.listdir(FACTOR_DIRS[0]) if f.endswith('.py')) + ['CorrBTC', 'VolumeRatio']
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = make_fake_candles(3000)
+    df['btc_close'] = make_fake_candles(3000, seed=1)['close']
+    return df
+
+
+def test_graph_matches_signal(df):
+    factor_list = [(name, n) for n in (10, 20) for name in NAMES]
+    expected = run_factors(df, factor_list)
+    graph = FactorGraph()
+    for name, n in factor_list:
+        graph.add(name, n)
+    actual = graph.evaluate(df)
+    assert_close(actual[expected.columns].to_numpy(), expected.to_numpy(), rtol=1e-12, atol=1e-12)
+    assert graph.stats['eliminated'] > 0
+
+
+@pytest.mark.parametrize('names, eliminated', [
+    (['Bias'], 0),                          # close 读取两次只是取列，不算重复计算
+    (['Volume', 'Bias'], 0),
+    (['Volatility', 'VolumePriceCorr'], 3),  # pct_change(close, 1) 展开为 shift、div、sub，只算一次
+])
+def test_graph_stats_count_operators(df, names, eliminated):
+    graph = FactorGraph()
+    for name in names:
+        graph.add(name, 20)
+    graph.evaluate(df)
+    assert graph.stats['eliminated'] == eliminated
+    assert graph.stats['computed'] == sum(node.op not in ('field', 'const') for node in graph.order())
+
+
+@pytest.mark.parametrize('name', NAMES)
+def test_fused_kernel_matches_signal(df, name):
+    node = load_factor(name).expr(20)
+    expected = run_factors(df, [(name, 20)]).iloc[:, 0].to_numpy()
+    # 正负抵消的窗口 (如 MoneyFlow) 只能要求绝对误差相对于因子量级足够小
+    atol = 1e-12 * max(np.nanmax(np.abs(expected)), 1.0)
+    assert_close(FusedKernel({name: node})(df)[name], expected, rtol=1e-8, atol=atol)
+    with np.errstate(all='ignore'):
+        assert_close(pandas_chain(node, df), expected, rtol=1e-8, atol=atol)
+
+
+def test_single_kernel_matches_graph(df):
+    graph = FactorGraph()
+    for name in NAMES:
+        graph.add(name, 20)
+    expected = graph.evaluate(df)
+    fused = graph.compile()(df)
+    for col in expected.columns:
+        atol = 1e-12 * max(np.nanmax(np.abs(expected[col].to_numpy())), 1.0)
+        assert_close(fused[col], expected[col], rtol=1e-8, atol=atol)
+
+
+def test_negative_shift_rejected():
+    with pytest.raises(ValueError):
+        shift(field('close'), -1)
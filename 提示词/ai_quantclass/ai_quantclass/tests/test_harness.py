@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from conftest import assert_close
+from factor_engine.benchmark import make_fake_candles
+from factor_engine.cache import FactorCache
+from factor_engine.harness import run_factors
+from factor_engine.loader import FACTOR_DIRS, load_factor
+
+FACTOR_NAMES = sorted(f[:-3] for f in os.listdir(FACTOR_DIRS[0]) if f.endswith('.py'))
+
+
+def test_run_factors_matches_in_place(candles):
+    columns = list(candles.columns)
+    factor_list = [(name, 20) for name in FACTOR_NAMES]
+    legacy = candles.copy()
+    for name, n in factor_list:
+        legacy = load_factor(name).signal(legacy, n, f"{name}_{n}")
+
+    isolated = run_factors(candles, factor_list)
+    assert list(candles.columns) == columns, "run_factors must not modify the input frame"
+    assert list(isolated.columns) == [f"{name}_20" for name in FACTOR_NAMES]
+    assert_close(isolated.to_numpy(), legacy[isolated.columns].to_numpy(), rtol=0, atol=0)
+
+
+@pytest.mark.parametrize('name', ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate',
+                                  'Amplitude', 'Momentum', '资金流因子', 'VolumeRatio'])
+def test_cache_hit_and_tail_match_signal(tmp_path, name):
+    full = make_fake_candles(1024)
+    old = full.iloc[:1000]
+    cache = FactorCache(str(tmp_path))
+    cache.get(name, old, 20, 'BTC-USDT')
+    hit = cache.get(name, old, 20, 'BTC-USDT')
+    tail = cache.get(name, full, 20, 'BTC-USDT')
+    assert cache.stats['hit'] >= 1
+
+    mod = load_factor(name)
+    assert_close(hit, mod.signal(old.copy(), 20, 'factor')['factor'], rtol=1e-9, atol=1e-12)
+    assert_close(tail, mod.signal(full.copy(), 20, 'factor')['factor'], rtol=1e-9, atol=1e-12)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from conftest import assert_close
+from factor_engine.benchmark import hours_since_reference
+from factor_engine.listing import ListingIndex, attach_listing_index, hours_since, listing_time, spot_and_swap
+from factor_engine.loader import load_factor
+from factor_engine.panel import Panel, evaluate
+
+
+@pytest.fixture(scope='module')
+def frames(listings):
+    return {symbol: df.reset_index(drop=True) for symbol, df in listings.groupby('symbol')}
+
+
+@pytest.fixture(scope='module')
+def expected(frames):
+    return {s: hours_since_reference(df.copy(), 'f')['f'].to_numpy() for s, df in frames.items()}
+
+
+def test_signal_matches_reference(frames, expected):
+    mod = load_factor('HoursSinceSpotAndSwap')
+    for symbol, df in frames.items():
+        assert_close(mod.signal(df.copy(), 0, 'f')['f'], expected[symbol])
+
+
+def test_listing_index_matches_reference(listings, frames, expected):
+    index = ListingIndex.from_long(listings)
+    assert index.first_ns == ListingIndex.from_frames(frames).first_ns
+    for symbol, df in frames.items():
+        actual = hours_since(df['candle_begin_time'], listing_time(df, index),
+                             spot_and_swap(df['symbol_spot'], df['symbol_swap']))
+        assert_close(actual, expected[symbol])
+
+
+def test_panel_matches_reference(listings, frames, expected):
+    panel = Panel.from_long(listings)
+    by_time = listings.assign(f=np.concatenate([expected[s] for s in frames])) \
+        .sort_values(['candle_begin_time', 'symbol'])
+    mod = load_factor('HoursSinceSpotAndSwap')
+    assert_close(panel.to_long(evaluate(mod, panel, 0), 'f')['f'], by_time['f'])
+    indexed = attach_listing_index(Panel.from_long(listings), ListingIndex.from_long(listings))
+    assert_close(indexed.to_long(evaluate(mod, indexed, 0), 'f')['f'], by_time['f'])
+
+
+def test_listing_index_travels_with_data(listings, frames):
+    # 索引只作用于附加了它的数据：提前一小时的索引改变该面板的结果，不影响其他面板
+    index = ListingIndex.from_long(listings)
+    symbol = next(iter(index.first_ns))
+    shifted = ListingIndex(dict(index.first_ns, **{symbol: index.get(symbol) - 3_600_000_000_000}))
+    mod = load_factor('HoursSinceSpotAndSwap')
+    plain = Panel.from_long(listings)
+    indexed = attach_listing_index(Panel.from_long(listings), shifted)
+    j = indexed.symbols.index(symbol)
+    diff = evaluate(mod, indexed, 0)[:, j] - evaluate(mod, plain, 0)[:, j]
+    assert np.nanmin(diff) == np.nanmax(diff) == 1.0
+
+    # 长表上附加的索引随切片传给单币种 DataFrame，也随面板传给适配器路径的 symbol_frame
+    df = attach_listing_index(listings, shifted)
+    part = df[df['symbol'] == symbol]
+    assert listing_time(part) == shifted.get(symbol)
+    assert listing_time(frames[symbol]) == index.get(symbol)
+    assert Panel.from_long(df).symbol_frame(j)[0].attrs['listing_index'] is shifted
+
+
+def test_listing_index_save_load(listings, tmp_path):
+    index = ListingIndex.from_long(listings)
+    path = str(tmp_path / 'listing_index.json')
+    index.save(path)
+    assert ListingIndex.load(path).first_ns == index.first_ns
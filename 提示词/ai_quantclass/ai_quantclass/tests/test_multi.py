@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from conftest import assert_close
+from factor_engine.autotune import AutoTuner, plan_resources
+from factor_engine.loader import load_factor
+from factor_engine.multi import iter_multi_signal, multi_signal
+
+N_LIST = (5, 10, 20, 40)
+
+
+@pytest.mark.parametrize('name', ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate',
+                                  'Amplitude', 'VolumeRatio'])
+def test_multi_signal_matches_loop(candles, name):
+    mod = load_factor(name)
+    work = candles.copy()
+    for n in N_LIST:
+        work = mod.signal(work, n, f"{name}_{n}")
+    expected = work[[f"{name}_{n}" for n in N_LIST]]
+
+    columns = list(candles.columns)
+    blocks = list(iter_multi_signal(mod, candles, N_LIST, 3))
+    assert [block.shape[1] for block in blocks] == [3, 1]
+    assert list(candles.columns) == columns, "multi_signal must not modify the input frame"
+    actual = pd.concat(blocks, axis=1)
+    assert list(actual.columns) == list(expected.columns)
+    assert_close(actual.to_numpy(), expected.to_numpy())
+
+
+def test_multi_signal_single_block(candles):
+    block = multi_signal('Volatility', candles, N_LIST)
+    assert block._mgr.nblocks == 1
+
+
+def test_plan_resources():
+    gib = 1024 ** 3
+    assert plan_resources(16 * gib, gib, 256 * 1024 ** 2, cpu_count=8) == (7, 5)  # 每个进程至少 1 GiB + 4 列，进程数以 CPU 核数 - 1 为上限
+    assert plan_resources(16 * gib, gib, 256 * 1024 ** 2, cpu_count=2) == (1, 60)
+    assert plan_resources(gib // 2, gib, 256 * 1024 ** 2, cpu_count=8) == (1, 1)
+
+
+def test_autotune_limit_shrinks_with_memory_ceiling(candles):
+    tuner = AutoTuner(n_jobs=2)
+    tuner.worker_bytes = 100 * 1024 ** 2
+    tuner.column_row_bytes = 16.0
+    rows = len(candles)
+    limits = []
+    for extra_cols in (64, 12, 3):
+        tuner.memory_ceiling = (tuner.worker_bytes + extra_cols * tuner.column_bytes(rows)) * tuner.n_jobs
+        limits.append(tuner.limit_for(rows))
+    assert limits == [64, 12, 3]
+
+    blocks = list(iter_multi_signal('Volatility', candles, N_LIST, factor_col_limit=tuner))
+    assert all(block.shape[1] <= 3 for block in blocks)
+    assert_close(pd.concat(blocks, axis=1).to_numpy(), multi_signal('Volatility', candles, N_LIST).to_numpy())
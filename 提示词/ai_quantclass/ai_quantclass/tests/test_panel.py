@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_close
+from factor_engine.graph import FactorGraph
+from factor_engine.loader import load_factor
+from factor_engine.panel import Panel, evaluate
+
+NAMES = ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate', 'Amplitude', 'MarketCap',
+         'Momentum', 'PriceChange', 'VolumeRatio']
+
+
+@pytest.fixture(scope='module')
+def panel(universe):
+    return Panel.from_long(universe)
+
+
+def loop_panel(mod, universe, panel, n):
+    """
+    逐币种调用 signal()，结果按面板的 (时间, 币种) 位置排列
+    """
+    expected = np.full(panel.shape, np.nan)
+    for j, (symbol, df) in enumerate(universe.groupby('symbol', sort=True)):
+        df = df.reset_index(drop=True)
+        rows = panel.index.get_indexer(df['candle_begin_time'])
+        expected[rows, j] = mod.signal(df.copy(), n, 'factor')['factor'].to_numpy(dtype=np.float64)
+    return expected
+
+
+@pytest.mark.parametrize('name', NAMES)
+def test_panel_matches_per_symbol_signal(universe, panel, name):
+    mod = load_factor(name)
+    assert_close(evaluate(mod, panel, 20), loop_panel(mod, universe, panel, 20), rtol=1e-7, atol=1e-9)
+
+
+def test_graph_on_panel(panel):
+    names = ['Volatility', 'VolumePriceCorr', 'PriceChange', '涨跌幅因子', 'Momentum', '动量因子']
+    graph = FactorGraph()
+    for name in names:
+        graph.add(name, 20)
+    results = graph.evaluate(panel)
+    for name in names:
+        assert_close(results[f"{name}_20"], evaluate(name, panel, 20), rtol=1e-9)
+    assert graph.stats['eliminated'] > 0
+
+
+def test_to_long_roundtrip(universe, panel):
+    long_df = panel.to_long(panel['close'], 'close')
+    expected = universe.sort_values(['candle_begin_time', 'symbol'])['close']
+    assert_close(long_df['close'], expected)
+    assert len(long_df) == len(universe) and not pd.isna(long_df['close']).any()
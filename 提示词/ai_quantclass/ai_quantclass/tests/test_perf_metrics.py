@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_close
+from factor_engine.benchmark import rolling_metrics_loop
+from factor_engine.loader import ROOT_DIR
+from factor_engine.perf_metrics import PERIODS_PER_YEAR, rolling_metrics
+
+
+def test_monthly_csv_matches_loop():
+    monthly = pd.read_csv(os.path.join(ROOT_DIR, '策略_coin', '月度账户收益.csv'), encoding='utf-8-sig')
+    monthly = monthly['涨跌幅'].str.rstrip('%').astype(float) / 100
+    expected = rolling_metrics_loop(monthly, 12, 12)
+    actual = rolling_metrics(monthly, 12, periods_per_year='M')
+    assert actual.iloc[:11].isna().all().all()
+    assert_close(actual.iloc[11:].to_numpy(), expected)
+
+
+def test_hourly_matches_loop():
+    hourly = pd.Series(np.random.default_rng(7).normal(1e-4, 5e-3, 500))
+    expected = rolling_metrics_loop(hourly, 48, PERIODS_PER_YEAR['H'])
+    actual = rolling_metrics(hourly, 48, periods_per_year='H')
+    assert_close(actual.iloc[47:].to_numpy(), expected)
+
+
+def test_nan_skipped_like_loop():
+    returns = pd.Series(np.random.default_rng(1).normal(0.01, 0.05, 300))
+    returns[np.random.default_rng(2).random(300) < 0.25] = np.nan
+    returns[40:55] = np.nan  # 整个窗口都是 NaN
+    returns[100:102] = np.nan
+    expected = rolling_metrics_loop(returns, 12, 12)
+    actual = rolling_metrics(returns, 12, periods_per_year='M')
+    assert_close(actual.iloc[11:].to_numpy(), expected)
+
+
+def test_constant_window_sharpe_is_zero():
+    actual = rolling_metrics(pd.Series([0.01] * 30), 12, periods_per_year=12)
+    assert (actual['夏普比率'].iloc[11:] == 0).all()
+
+
+@pytest.mark.parametrize('bad', [[0.1, np.inf, 0.1], [0.1, -1.0, 0.1]])
+def test_invalid_returns_rejected(bad):
+    with pytest.raises(ValueError):
+        rolling_metrics(pd.Series(bad * 5), 3)
@@ -0,0 +1,223 @@
+"""
+retiming_demo 的一致性测试：DualMA 内核、均线缓存、批量资金曲线、immutable 模式与列式缓存
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+from backtest import BacktestEngine, load_signal_module
+from benchmark import make_fake_candles
+from conftest import assert_close
+from ma_cache import MovingAverageCache
+from segments import DrawdownTree
+
+PARAMS = [(5, 20, 0.01), (10, 60, 0.10), (3, 7, 0.005), (30, 120, 0.02)]
+WINDOWS = sorted({n for short_n, long_n, _ in PARAMS for n in (short_n, long_n)})
+
+
+@pytest.fixture(scope='module')
+def dual_ma():
+    return load_signal_module("DualMA")
+
+
+@pytest.fixture(scope='module')
+def candles():
+    return make_fake_candles(5000, seed=7)
+
+
+@pytest.fixture(scope='module')
+def nan_close(candles):
+    """
+    收盘价中夹杂零散与连续的 NaN (均线在其后一个窗口内为 NaN)
+    """
+    close = candles['close'].to_numpy().copy()
+    close[[50, 51, 700, 1800, 3333]] = np.nan
+    close[2500:2520] = np.nan
+    return close
+
+
+def rolling_mean(close, n):
+    return pd.Series(close).rolling(n).mean().to_numpy()
+
+
+@pytest.mark.parametrize('with_nan', [False, True])
+def test_dual_ma_positions_match_loop(dual_ma, candles, nan_close, with_nan):
+    close = nan_close if with_nan else candles['close'].to_numpy()
+    for short_n, long_n, stop_loss in PARAMS:
+        short_ma, long_ma = rolling_mean(close, short_n), rolling_mean(close, long_n)
+        expected = dual_ma.dual_ma_positions_loop(close, short_ma, long_ma, stop_loss)
+        np.testing.assert_array_equal(dual_ma.dual_ma_positions(close, short_ma, long_ma, stop_loss), expected)
+
+
+@pytest.mark.parametrize('with_nan', [False, True])
+def test_dual_ma_positions_batch_match_loop(dual_ma, candles, nan_close, with_nan):
+    close = nan_close if with_nan else candles['close'].to_numpy()
+    for stop_loss in [0.005, 0.10]:
+        short_mas = np.column_stack([rolling_mean(close, s) for s, _, _ in PARAMS])
+        long_mas = np.column_stack([rolling_mean(close, l) for _, l, _ in PARAMS])
+        # max_elements 很小，使参数组分成多块计算
+        batch = dual_ma.dual_ma_positions_batch(close, short_mas, long_mas, stop_loss, max_elements=len(close) * 3)
+        for i in range(len(PARAMS)):
+            expected = dual_ma.dual_ma_positions_loop(close, short_mas[:, i], long_mas[:, i], stop_loss)
+            np.testing.assert_array_equal(batch[:, i], expected)
+
+
+def test_stop_loss_is_exercised(dual_ma, nan_close):
+    # 止损确实触发过：同样的均线，不止损时信号不同
+    short_ma, long_ma = rolling_mean(nan_close, 5), rolling_mean(nan_close, 20)
+    with_stop = dual_ma.dual_ma_positions(nan_close, short_ma, long_ma, 0.005)
+    without_stop = dual_ma.dual_ma_positions(nan_close, short_ma, long_ma, 1.0)
+    assert (with_stop != without_stop).any()
+    np.testing.assert_array_equal(with_stop, dual_ma.dual_ma_positions_loop(nan_close, short_ma, long_ma, 0.005))
+
+
+def test_signal_uses_ma_cache(dual_ma, candles):
+    cache = MovingAverageCache.build(candles['close'], WINDOWS)
+    params = {'short_n': 10, 'long_n': 60, 'stop_loss': 0.10}
+    expected = dual_ma.signal(candles, params, 'signal')
+    cached = dual_ma.signal(candles, dict(params, ma_cache=cache), 'signal')
+    pd.testing.assert_frame_equal(cached, expected)
+    assert list(expected.columns) == ['close', 'signal']
+
+
+def test_ma_cache_matches_rolling(nan_close):
+    cache = MovingAverageCache.build(nan_close, WINDOWS)
+    assert cache.windows == WINDOWS
+    for n in WINDOWS:
+        np.testing.assert_array_equal(cache.get(n), rolling_mean(nan_close, n))
+    np.testing.assert_array_equal(cache.take([20, 5, 20])[:, 2], rolling_mean(nan_close, 20))
+
+
+def test_equity_batch_matches_single(candles, nan_close):
+    df = candles.assign(close=nan_close)
+    rng = np.random.default_rng(0)
+    steps = rng.choice([-1.0, 0.0, 1.0], size=(len(df), 6), p=[0.02, 0.96, 0.02])
+    signals = np.cumsum(steps, axis=0).clip(-1, 1)
+
+    engine = BacktestEngine(data_path='', fee_rate=0.001, slippage=0.008)
+    engine.data = df
+    batch = engine.calculate_equity_batch(signals, chunk_size=4)
+    for i in range(signals.shape[1]):
+        single = BacktestEngine(data_path='', fee_rate=0.001, slippage=0.008)
+        single.data = df.assign(signal=signals[:, i])
+        single.calculate_equity('signal')
+        perf = single.calculate_performance()
+        assert engine.format_performance(batch['performance'].iloc[i]) == perf
+        assert_close(batch['net_value'][:, i], single.data['net_value'])
+
+
+@pytest.mark.parametrize('scale, dtype', [(1, np.float64), (1, np.int64), (0.5, np.float64)])
+def test_equity_batch_segments_match_per_bar(candles, nan_close, scale, dtype):
+    # return_curves=False 按仓位区间计算，与逐K线计算 (return_curves=True) 一致
+    df = candles.assign(close=nan_close)
+    rng = np.random.default_rng(1)
+    steps = rng.choice([-1, 0, 1], size=(len(df), 40), p=[0.03, 0.94, 0.03])
+    signals = (np.cumsum(steps, axis=0).clip(-1, 1) * scale).astype(dtype)
+    engine = BacktestEngine(data_path='', fee_rate=0.001, slippage=0.008)
+    engine.data = df
+    per_bar = engine.calculate_equity_batch(signals)['performance']
+    segments = engine.calculate_equity_batch(signals, chunk_size=16, return_curves=False)['performance']
+    pd.testing.assert_frame_equal(segments, per_bar, rtol=1e-10)
+
+
+def test_equity_batch_segments_nan_signals_and_fallback(candles):
+    engine = BacktestEngine(data_path='', fee_rate=0.001, slippage=0.008)
+    engine.data = candles
+    rng = np.random.default_rng(2)
+    signals = np.cumsum(rng.choice([-1.0, 0.0, 1.0], size=(len(candles), 10), p=[0.02, 0.96, 0.02]), 0).clip(-1, 1)
+    signals[rng.random(signals.shape) < 0.01] = np.nan
+    # 连续取值的信号超过 MAX_LEVELS，回到逐K线计算
+    noisy = rng.normal(size=(len(candles), 3))
+    for sig in [signals, noisy]:
+        pd.testing.assert_frame_equal(engine.calculate_equity_batch(sig, return_curves=False)['performance'],
+                                      engine.calculate_equity_batch(sig)['performance'], rtol=1e-10)
+
+
+def test_drawdown_tree_matches_brute_force():
+    rng = np.random.default_rng(3)
+    values = np.exp(np.cumsum(rng.normal(0, 0.05, 37)))
+    starts, ends = np.triu_indices(len(values) + 1, k=1)
+    hi, lo, ratio = DrawdownTree(values).query(starts, ends)
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        window = values[s:e]
+        assert hi[i] == window.max() and lo[i] == window.min()
+        assert ratio[i] == pytest.approx((window / np.maximum.accumulate(window)).min(), rel=1e-14)
+
+
+@pytest.mark.parametrize('strategy, params', [
+    ('DualMA', {'short_n': 10, 'long_n': 60, 'stop_loss': 0.01}),
+    ('MovingAverage', {'n': 30}),
+])
+def test_immutable_run_matches_mutable(candles, strategy, params):
+    mutable = BacktestEngine(data_path='')
+    mutable.data = candles.copy()
+    immutable = BacktestEngine(data_path='', immutable=True)
+    immutable.data = candles.copy()
+
+    assert immutable.run(strategy, params, verbose=False) == mutable.run(strategy, params, verbose=False)
+    result = immutable.last_result.data
+    for col in ['close', 'signal', 'position', 'net_return', 'equity_curve', 'net_value']:
+        pd.testing.assert_series_equal(result[col], mutable.data[col], check_dtype=False)
+    # immutable 模式不改写原始数据，mutable 模式保留全部行情列
+    pd.testing.assert_frame_equal(immutable.data, candles)
+    assert set(candles.columns) <= set(mutable.data.columns)
+
+
+@pytest.fixture
+def stored(tmp_path, candles):
+    """
+    (原始 DataFrame, 数据文件路径)：含 NaN 的数值列、整数列与带缺失值的字符串列，已写入列式缓存
+    """
+    data_path = tmp_path / 'BTC-USDT.csv'
+    data_path.write_text('placeholder')
+    df = candles.assign(
+        close=candles['close'].where(candles.index.minute != 7),
+        trades=np.arange(len(candles), dtype=np.int64),
+        symbol=np.where(np.arange(len(candles)) % 97 == 0, None, 'BTC-USDT').astype(object),
+    )
+    df.loc[df.index[3], 'symbol'] = 'nan'  # 字面字符串 'nan' 不是缺失值
+    data_store.save_frame(df, data_store.cache_dir_for(data_path), data_path)
+    return df, data_path
+
+
+def test_load_frame_round_trip(stored):
+    df, data_path = stored
+    cache_dir = data_store.cache_dir_for(data_path)
+    assert data_store.is_valid(cache_dir, data_path)
+    loaded = data_store.load_frame(cache_dir)
+    pd.testing.assert_frame_equal(loaded, df, check_freq=False)
+    assert loaded['symbol'].isna().sum() == df['symbol'].isna().sum() > 0
+    assert loaded['symbol'].iloc[3] == 'nan'
+
+
+def test_load_frame_round_trip_tz(tmp_path):
+    data_path = tmp_path / 'ETH-USDT.csv'
+    data_path.write_text('placeholder')
+    df = make_fake_candles(100).tz_localize('Asia/Shanghai')
+    data_store.save_frame(df, data_store.cache_dir_for(data_path), data_path)
+    pd.testing.assert_frame_equal(data_store.load_frame(data_store.cache_dir_for(data_path)), df, check_freq=False)
+
+
+def test_store_between_matches_loc(stored):
+    df, data_path = stored
+    store = data_store.OHLCVStore.open(data_path)
+    # copy: 比较数值而不是数组类型 (整数列是 np.memmap)
+    pd.testing.assert_frame_equal(store.to_frame().copy(), df, check_freq=False)
+    # 端点正好落在K线上 (两端都包含) 与落在两根K线之间
+    for start, end in [(df.index[100], df.index[200]), ('2020-01-01 00:10:30', '2020-01-01 01:00:30'),
+                       (None, df.index[10]), (df.index[-5], None), ('2019-01-01', '2019-02-01')]:
+        view = store.between(start, end)
+        expected = df.loc[start:end]
+        assert len(view) == len(expected)
+        pd.testing.assert_frame_equal(view.to_frame(['close', 'volume']), expected[['close', 'volume']],
+                                      check_freq=False)
+    # 切片仍是内存映射上的视图
+    assert isinstance(store.between(df.index[100], df.index[200])['close'], np.memmap)
+
+
+def test_store_rejects_stale_cache(stored):
+    _, data_path = stored
+    data_path.write_text('changed contents')
+    with pytest.raises(FileNotFoundError):
+        data_store.OHLCVStore.open(data_path)
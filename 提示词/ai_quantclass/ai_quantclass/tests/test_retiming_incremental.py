@@ -0,0 +1,74 @@
+"""
+retiming_demo/incremental.py：逐根K线推进的 IncrementalDualMA 与整段回测 BacktestEngine.run 一致
+"""
+import numpy as np
+import pytest
+
+from backtest import BacktestEngine
+from benchmark import make_fake_candles
+from conftest import assert_close
+from incremental import IncrementalDualMA, RollingMean
+
+PARAMS = {'short_n': 10, 'long_n': 60, 'stop_loss': 0.01}
+COSTS = {'initial_capital': 10000.0, 'fee_rate': 0.001, 'slippage': 0.008}
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['clean', 'nan_close'])
+def candles(request):
+    df = make_fake_candles(20_000, seed=11)
+    if request.param:
+        close = df['close'].to_numpy().copy()
+        close[[100, 101, 5000, 12345]] = np.nan
+        close[8000:8030] = np.nan
+        df = df.assign(close=close)
+    return df
+
+
+@pytest.fixture(scope='module')
+def batch(candles):
+    """
+    (格式化绩效, 结果 DataFrame)：immutable 模式下的整段回测
+    """
+    engine = BacktestEngine(data_path='', immutable=True, **COSTS)
+    engine.data = candles
+    perf = engine.run('DualMA', PARAMS, verbose=False)
+    return perf, engine.last_result.data
+
+
+def run_incremental(inc, candles):
+    states = [inc.update(timestamp, float(close)) for timestamp, close in zip(candles.index, candles['close'])]
+    return {key: np.array([state[key] for state in states]) for key in states[0]}
+
+
+def test_rolling_mean_matches_pandas(candles):
+    close = candles['close']
+    for n in [1, 7, 60]:
+        rm = RollingMean(n)
+        assert_close([rm.update(float(x)) for x in close], close.rolling(n).mean(), rtol=1e-10)
+
+
+def test_update_matches_run(candles, batch):
+    perf, result = batch
+    inc = IncrementalDualMA(**PARAMS, **COSTS)
+    states = run_incremental(inc, candles)
+    # update 返回的 signal 是本K线收盘后的新信号，position 是本K线实际执行的仓位
+    np.testing.assert_array_equal(states['signal'], result['signal'])
+    np.testing.assert_array_equal(states['position'], result['position'])
+    assert_close(states['net_value'], result['net_value'], rtol=1e-12)
+    assert_close(states['equity'], result['equity_curve'], rtol=1e-12)
+    assert BacktestEngine.format_performance(inc.performance()) == perf
+
+
+def test_warmup_then_update_matches_run(candles, batch):
+    perf, result = batch
+    split = len(candles) * 3 // 4
+    engine = BacktestEngine(data_path='', **COSTS)
+    engine.data = candles.iloc[:split]
+    inc = engine.start_incremental(PARAMS, warmup=True)
+    assert inc.bars == split
+    assert inc.net_value == pytest.approx(result['net_value'].iloc[split - 1], rel=1e-12)
+
+    states = run_incremental(inc, candles.iloc[split:])
+    np.testing.assert_array_equal(states['signal'], result['signal'].iloc[split:])
+    assert_close(states['net_value'], result['net_value'].iloc[split:], rtol=1e-12)
+    assert BacktestEngine.format_performance(inc.performance()) == perf
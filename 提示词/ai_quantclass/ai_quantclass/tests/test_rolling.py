@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from conftest import assert_close
+from factor_engine import rolling
+from factor_engine.benchmark import feed, make_fake_candles
+from factor_engine.loader import load_factor
+
+
+@pytest.fixture(scope='module')
+def series():
+    df = make_fake_candles(2000, nan_ratio=0.02)
+    x = df['volume'].copy()
+    x.iloc[::97] = np.inf  # pandas 滚动计算把 ±inf 当作缺失值
+    x.iloc[::149] = -np.inf
+    return x, df['close'].pct_change()
+
+
+@pytest.mark.parametrize('n, min_periods', [(1, 1), (5, 1), (20, None), (60, 10)])
+def test_accumulators_match_pandas(series, n, min_periods):
+    x, y = series
+    r = x.rolling(n, min_periods=min_periods)
+    assert_close(feed(rolling.RollingSum(n, min_periods), x), r.sum())
+    assert_close(feed(rolling.RollingMean(n, min_periods), x), r.mean())
+    assert_close(feed(rolling.RollingStd(n, min_periods), x), r.std(), rtol=1e-6)
+    assert_close(feed(rolling.RollingMax(n, min_periods), x), r.max())
+    assert_close(feed(rolling.RollingMin(n, min_periods), x), r.min())
+    if n > 1:
+        assert_close(feed(rolling.RollingCorr(n, min_periods), y, x),
+                     y.rolling(n, min_periods=min_periods).corr(x), rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize('name', ['Volume', 'Volatility', 'Bias', 'MoneyFlow', 'VolumePriceCorr', 'TurnoverRate',
+                                  'Amplitude'])
+def test_stream_matches_signal(name):
+    df = make_fake_candles(1000)
+    df.loc[::97, 'circulating_supply'] = 0.0  # 换手率为 inf 的K线
+    mod = load_factor(name)
+    update = rolling.stream(mod.expr(20))
+    actual = [update(candle) for candle in df.to_dict('records')]
+    assert_close(actual, mod.signal(df.copy(), 20, 'factor')['factor'], rtol=1e-6, atol=1e-8)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_close
+from factor_engine.benchmark import (filter_reference, load_positions, make_fake_stock_factors, select_reference,
+                                    stock_long_frame)
+from factor_engine.filters import FilterRule, compile_filters
+from factor_engine.rebalance import (approximate_calendar, calendar_from_dates, calendar_from_positions, combined_weights,
+                                    offset_holdings)
+from factor_engine.selection import select, selection_frame
+
+FACTOR_LIST = [['Ret', True, 20, 1], ['市值', True, '', 1], ['成交额Std', True, 5, 1]]
+
+
+def test_select_matches_groupby_rank(stock_data):
+    dates, codes, factors, tradable = stock_data
+    long_df = stock_long_frame(dates, codes, factors, tradable, ['市值_', 'Ret_20', '成交额Std_5'])
+    expected = select_reference(long_df, FACTOR_LIST, 5)
+    cols, score = select(factors, FACTOR_LIST, 5, mask=tradable)
+    actual = selection_frame(dates, codes, cols, score)
+    assert (actual['股票代码'].to_numpy() == expected['股票代码'].to_numpy()).all()
+    assert_close(actual['复合因子'], expected['复合因子'])
+    assert_close(actual['选股因子排名'], expected['选股因子排名'])
+
+
+@pytest.mark.parametrize('filter_list', [
+    [['ROE', '单季', 'pct:<=0.8', False], ['成交额Mean', 5, 'pct:>=0.05', True], ['一级风险标签', 250, 'val:==0', True]],
+    [['ROE', '单季', 'pct:<0.3', True], ['归母净利润同比增速', 60, 'pct:>0.1', False]],
+    [['当前回撤', 20, 'val:>-0.05', True], ['Ret', 20, 'pct:<=0.7', True], ['市值', '', 'rank:<=100', True]],
+])
+def test_filters_match_groupby_rank(stock_data, filter_list):
+    _, _, factors, tradable = stock_data
+    plan = compile_filters(filter_list)
+    assert (plan.apply(factors, universe=tradable) == filter_reference(factors, tradable, filter_list)).all()
+    costs = [rule.cost for rule in plan.rules]
+    assert costs == sorted(costs)  # 数值条件在前
+
+
+@pytest.mark.parametrize('how', ['pct:<=0.3', 'pct:<0.3', 'pct:>=0.3', 'pct:>0.3', 'pct:<=0.1', 'pct:>=0.7',
+                                 'pct:<=1', 'pct:>=0', 'pct:==0.5', 'rank:<=3', 'rank:<3', 'rank:>=4', 'rank:>4'])
+@pytest.mark.parametrize('ascending', [True, False])
+def test_rule_boundary_matches_rank(how, ascending):
+    # 大量同分、每行有效股票数从 1 到 40 不等：临界位置需要逐位与 rank(method='min') 的浮点比较一致
+    rng = np.random.default_rng(0)
+    values = np.round(rng.normal(size=(200, 40)), 1)
+    values[rng.random(values.shape) < 0.2] = np.nan
+    universe = np.arange(40)[None, :] < rng.integers(1, 41, 200)[:, None]
+    factors = {'x_1': values}
+    expected = filter_reference(factors, universe, [['x', 1, how, ascending]])
+    assert (FilterRule('x', 1, how, ascending).evaluate(values, universe) == expected).all()
+
+
+def test_bad_filter_rejected():
+    with pytest.raises(ValueError):
+        compile_filters([['ROE', '单季', 'pct<=0.8', False]])
+
+
+@pytest.fixture(scope='module')
+def position_df():
+    return next(iter(load_positions().values())).iloc[:250]
+
+
+def test_offset_holdings_match_per_offset_selection(position_df):
+    dates, codes, factors, tradable = make_fake_stock_factors(300, dates=pd.to_datetime(position_df['选股日期']))
+    calendar = calendar_from_positions(position_df, dates=dates)
+    cols, _ = select(factors, FACTOR_LIST, 5, mask=tradable)
+    holdings = offset_holdings(cols, calendar)
+    for j in range(calendar.shape[1]):
+        assert (holdings[j] == offset_holdings(cols, calendar[:, [j]])[0]).all()
+        rebalance_days = np.flatnonzero(calendar[:, j])
+        assert (holdings[j][rebalance_days] == cols[rebalance_days]).all()
+
+    total = combined_weights(holdings, dates, codes).groupby('交易日期')['目标资金占比'].sum()
+    first_day = calendar.argmax(axis=0).max()  # 所有 offset 都完成首次调仓的日期
+    full = total[total.index >= dates[first_day]]
+    assert_close(full.to_numpy(), np.ones(len(full)))
+
+
+def test_calendar_from_positions(position_df):
+    calendar = calendar_from_positions(position_df)
+    assert calendar.shape == (len(position_df), 5)
+    assert (calendar == calendar_from_positions(position_df, ['W_0', 'W_1', 'W_2', 'W_3', 'W_4'])).all()
+    assert (calendar.sum(axis=1) == position_df['调仓offset数量'].to_numpy()).all()
+
+    # 按给定的交易日对齐：表中没有的日期不调仓
+    dates = pd.DatetimeIndex(pd.to_datetime(position_df['选股日期']))
+    extended = dates.append(pd.DatetimeIndex([dates[-1] + pd.Timedelta(days=1)]))
+    aligned = calendar_from_positions(position_df, dates=extended[::-1])
+    assert (aligned[1:] == calendar[::-1]).all() and not aligned[0].any()
+
+    rebalance_dates = [dates[calendar[:, j]] for j in range(calendar.shape[1])]
+    assert (calendar_from_dates(dates, rebalance_dates) == calendar).all()
+
+
+def test_approximate_calendar_is_approximate(position_df):
+    calendar = calendar_from_positions(position_df)
+    approx = approximate_calendar(pd.to_datetime(position_df['选股日期']), 'W', range(5))
+    assert 0 < (approx != calendar).any(axis=1).mean() < 0.2  # 节假日前后与框架不一致
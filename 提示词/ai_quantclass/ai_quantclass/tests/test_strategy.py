@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import assert_close
+from factor_engine.filters import compile_filters
+from factor_engine.loader import ROOT_DIR
+from factor_engine.rebalance import approximate_calendar, combined_weights, offset_holdings
+from factor_engine.selection import select, selection_frame
+from factor_engine.strategy import (StrategyCache, aggregate, data_digest, group_strategies, read_config_literals,
+                                    run_strategies, strategy_fingerprint)
+
+
+@pytest.fixture(scope='module')
+def config():
+    return read_config_literals(os.path.join(ROOT_DIR, '26分享会小市值组合', 'config.py'),
+                                ('strategy_list', 'start_date', 'end_date', 'excluded_boards', 'days_listed'))
+
+
+@pytest.fixture(scope='module')
+def compute(stock_data):
+    dates, codes, factors, tradable = stock_data
+
+    def compute(strategy):
+        mask = compile_filters(strategy['filter_list']).apply(factors, universe=tradable)
+        cols, score = select(factors, strategy['factor_list'], strategy['select_num'], mask=mask)
+        # 模拟数据没有框架输出的调仓点，使用近似日历
+        holdings = offset_holdings(cols, approximate_calendar(dates, strategy['hold_period'], strategy['offset_list']))
+        return {'selection': selection_frame(dates, codes, cols, score), 'weights': combined_weights(holdings, dates, codes)}
+    return compute
+
+
+def test_dedup_and_disk_reuse(config, compute, stock_data, tmp_path):
+    context = {key: value for key, value in config.items() if key != 'strategy_list'}
+    context['data_version'] = data_digest(*stock_data)
+    strategy_list = config['strategy_list']
+    cap_weights = [strategy['cap_weight'] for strategy in strategy_list]
+    expected = aggregate([compute(strategy) for strategy in strategy_list], cap_weights)
+
+    cache = StrategyCache(str(tmp_path))
+    actual = aggregate(run_strategies(strategy_list, compute, context, cache), cap_weights)
+    assert cache.stats['computed'] == len(group_strategies(strategy_list, context)) < len(strategy_list)
+    assert_close(actual['目标资金占比'], expected['目标资金占比'])
+
+    # 另一次回测：换一个策略名、调整 cap_weight，指纹不变，直接读取磁盘缓存
+    renamed = [dict(strategy, name=f"{strategy['name']}_复用", cap_weight=0.5) for strategy in strategy_list]
+    cache = StrategyCache(str(tmp_path))
+    reused = aggregate(run_strategies(renamed, compute, context, cache), [0.5] * len(renamed))
+    assert cache.stats['computed'] == 0 and cache.stats['disk'] > 0
+    assert_close(reused['目标资金占比'], expected['目标资金占比'])
+
+    # compute 的版本变了不会命中旧结果
+    cache = StrategyCache(str(tmp_path))
+    run_strategies(strategy_list[:1], compute, context, cache, version='v2')
+    assert cache.stats['computed'] == 1 and cache.stats['disk'] == 0
+
+
+def test_disk_cache_requires_data_version(config, compute, tmp_path):
+    with pytest.raises(ValueError):
+        run_strategies(config['strategy_list'][:1], compute, {'start_date': config['start_date']},
+                       StrategyCache(str(tmp_path)))
+
+
+def test_fingerprint_ignores_name_and_cap_weight(config):
+    strategy = config['strategy_list'][0]
+    renamed = dict(strategy, name='other', cap_weight=0.1)
+    assert strategy_fingerprint(strategy) == strategy_fingerprint(renamed)
+    assert strategy_fingerprint(strategy) != strategy_fingerprint(dict(strategy, select_num=strategy['select_num'] + 1))
+    assert strategy_fingerprint(strategy, compute_version='a') != strategy_fingerprint(strategy, compute_version='b')
+
+
+def test_data_digest_tracks_values(stock_data):
+    dates, codes, factors, tradable = stock_data
+    digest = data_digest(dates, codes, factors, tradable)
+    assert digest == data_digest(dates, codes.copy(), dict(factors), tradable.copy())
+    changed = dict(factors, Ret_20=np.where(np.isnan(factors['Ret_20']), np.nan, factors['Ret_20'] + 1e-9))
+    assert digest != data_digest(dates, codes, changed, tradable)
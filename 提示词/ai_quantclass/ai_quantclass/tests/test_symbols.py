@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from conftest import assert_close
+from factor_engine.benchmark import select_coin_reference
+from factor_engine.loader import load_factor
+from factor_engine.panel import Panel, evaluate
+from factor_engine.symbols import SymbolTable, load_symbols, symbol_mask
+
+
+@pytest.fixture(scope='module')
+def long_df(universe):
+    return universe[['candle_begin_time', 'symbol', 'close']]
+
+
+@pytest.mark.parametrize('target', ['COIN004USDT', 'COIN004-USDT', 'NOTLISTED'])
+def test_select_coin_matches_str_replace(long_df, target):
+    mod = load_factor('SelectCoin')
+    expected = select_coin_reference(long_df, target)
+    loaded = load_symbols(long_df)
+    table = loaded.attrs['symbol_table']
+
+    assert_close(mod.signal(long_df.copy(), target, 'f')['f'], expected)
+    assert_close(mod.signal(loaded.copy(), target, 'f')['f'], expected)
+    assert_close(np.where(symbol_mask(loaded['symbol'], target, table), 1, np.nan), expected)
+    assert_close(np.where(symbol_mask(long_df['symbol'], target), 1, np.nan), expected)
+
+    panel = Panel.from_long(long_df)
+    by_time = long_df.assign(f=expected).sort_values(['candle_begin_time', 'symbol'])
+    assert_close(panel.to_long(evaluate(mod, panel, target), 'f')['f'], by_time['f'])
+
+
+def test_symbol_table_codes(long_df):
+    table = SymbolTable.from_long(long_df)
+    assert table.code('COIN004-USDT') == table.code('COIN004USDT') >= 0
+    assert table.code('NOTLISTED') == -1
+    codes = table.encode(long_df['symbol'])
+    assert codes.dtype == np.int32 and (codes >= 0).all()
+
+
+def test_load_symbols_attaches_table(long_df):
+    loaded = load_symbols(long_df)
+    table = loaded.attrs['symbol_table']
+    assert 'symbol_table' not in long_df.attrs
+    assert loaded['symbol'].dtype == table.dtype
+    np.testing.assert_array_equal(table.encode(loaded['symbol']), table.encode(long_df['symbol']))
+
+    # 查找表随按币种切分的子表传给因子 (共享同一个对象，不深拷贝)
+    _, part = next(iter(loaded.groupby('symbol', observed=True)))
+    assert part.copy().attrs['symbol_table'] is table
+    symbol = part['symbol'].iloc[0]
+    assert (load_factor('SelectCoin').signal(part.copy(), symbol, 'f')['f'] == 1).all()
+
+    # 缺失的币种不与表中没有的币种 (代码同为 -1) 相等
+    with_missing = loaded['symbol'].copy()
+    with_missing.iloc[0] = np.nan
+    assert not symbol_mask(with_missing, 'NOTLISTED', table).any()
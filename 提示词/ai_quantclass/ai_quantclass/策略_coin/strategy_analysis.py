@@ -3,6 +3,8 @@
 """
 量化策略全面分析脚本
 基于策略分析提示词.md实现
+
+在 ai_quantclass 目录下以模块方式运行 (与 factor_engine 同级): python -m 策略_coin.strategy_analysis
 """
 
 import pandas as pd
@@ -15,6 +17,8 @@ from scipy import stats
 import warnings
 import os
 
+from factor_engine import perf_metrics
+
 warnings.filterwarnings('ignore')
 
 # ============================================================
@@ -434,25 +438,12 @@ fig, axes = plt.subplots(3, 1, figsize=(14, 10))
 df_monthly_sorted = df_monthly.sort_values('candle_begin_time').reset_index(drop=True)
 rolling_window = 12
 
-# 滚动收益率
-rolling_returns = []
-rolling_sharpe = []
-rolling_max_dd = []
-
-for i in range(rolling_window, len(df_monthly_sorted) + 1):
-    window_data = df_monthly_sorted.iloc[i-rolling_window:i]
-    # 滚动累计收益
-    cum_ret = (1 + window_data['涨跌幅']).prod() - 1
-    rolling_returns.append(cum_ret * 100)
-    # 滚动夏普
-    mean_ret = window_data['涨跌幅'].mean()
-    std_ret = window_data['涨跌幅'].std()
-    sharpe = (mean_ret * 12) / (std_ret * np.sqrt(12)) if std_ret > 0 else 0
-    rolling_sharpe.append(sharpe)
-    # 滚动最大回撤（基于月度数据近似）
-    cum_nav = (1 + window_data['涨跌幅']).cumprod()
-    max_dd = (cum_nav / cum_nav.cummax() - 1).min() * 100
-    rolling_max_dd.append(max_dd)
+# 滚动收益率、夏普、最大回撤 (一次算完所有窗口)
+rolling_metrics = perf_metrics.rolling_metrics(df_monthly_sorted['涨跌幅'], rolling_window, periods_per_year=12)
+rolling_metrics = rolling_metrics.iloc[rolling_window-1:]
+rolling_returns = (rolling_metrics['累计收益'] * 100).tolist()
+rolling_sharpe = rolling_metrics['夏普比率'].tolist()
+rolling_max_dd = (rolling_metrics['最大回撤'] * 100).tolist()
 
 rolling_dates = df_monthly_sorted['candle_begin_time'].iloc[rolling_window-1:].values
 